@@ -0,0 +1,286 @@
+# benchmark.py
+# 性能基准：环境 reset/step、观察计算、开火射线、ActorCritic 前向/反向、一次完整的训练迭代，
+# 以及 Ursina 渲染后端的 reset/step (需要显示器，没有时跳过，无法在无显示器的机器上检查渲染环境的加速比)
+# 结果保存为 JSON，可以和之前保存的基准比较，慢于阈值的项目标记为回归 (退出码 1)
+#
+#   python src/benchmark.py --out bench.json
+#   python src/benchmark.py --quick --compare bench.json
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import torch
+
+from game_env import HideAndSeekEnv, NUM_HIDERS
+from level import default_level, generate_office_layout, compile_level, save_level, load_level
+from sim_core import NumpySim, OBSERVATION_N, ACTION_N, FIRE_RANGE, EYE_HEIGHT
+from ray_kernel import raycast_aabbs
+from model import ActorCritic
+from rollout import RolloutBuffer
+from vec_env import VecHideAndSeekEnv
+from ppo import collect_rollout, ppo_update
+
+# 关卡规模 (道具数)：None 是默认的办公室关卡 (24 个道具)，其余用 level.generate_office_layout 生成后编译
+LEVEL_SIZES = (None, 1000, 10000)
+QUICK_LEVEL_SIZES = (None, 1000)
+BATCH_SIZES = (1, 64, 1024, 8192)
+NUM_ENVS = (1, 256)
+RAYS = (1, 1024)
+REGRESSION_THRESHOLD = 0.15 # 比基准慢 15% 以上算回归
+
+
+def measure(fn, min_time=0.2, repeats=5, items=1):
+    """多次调用 fn，返回每次调用耗时的统计 (毫秒) 和每秒处理的 items 数
+
+    先估计一次调用的耗时，让每一轮至少运行 min_time 秒，共 repeats 轮。
+    """
+    fn() # 预热
+    start = time.perf_counter()
+    fn()
+    once = max(time.perf_counter() - start, 1e-7)
+    number = max(1, math.ceil(min_time / once))
+    per_call = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - start) / number)
+    per_call = np.array(per_call) * 1000
+    median = float(np.median(per_call))
+    return {'median_ms': median, 'min_ms': float(per_call.min()), 'max_ms': float(per_call.max()),
+            'calls': number * repeats, 'items': items, 'per_sec': items * 1000 / median}
+
+
+def _bench_env_steps(results, args, env, prefix):
+    env.reset()
+    results[f'{prefix}.reset'] = measure(env.reset, args.min_time, args.repeats)
+
+    rng = np.random.default_rng(0)
+    actions = rng.integers(0, ACTION_N - 1, size=4096) # 不开火，避免弹药耗尽提前结束
+    counter = [0]
+
+    def step():
+        counter[0] += 1
+        _, _, done, _ = env.step(int(actions[counter[0] % len(actions)]))
+        if done:
+            env.reset()
+    results[f'{prefix}.step'] = measure(step, args.min_time, args.repeats)
+
+
+def bench_env(results, args):
+    _bench_env_steps(results, args, HideAndSeekEnv(headless=True, seed=0), 'env')
+
+
+def has_display():
+    """Linux 上没有 DISPLAY 时 Ursina 打不开窗口 (与 test/conftest.py 的判断相同)"""
+    return not (sys.platform.startswith('linux') and not os.environ.get('DISPLAY'))
+
+
+def bench_env_ursina(results, args):
+    """渲染后端 (headless=False，每一步 app.step() 渲染一帧) 的 reset/step，用来和 env.step 比较；
+    需要显示器，没有时跳过。Ursina 窗口会一直开着，所以这一项放在最后"""
+    if not has_display():
+        print('--- ursina: skipped (no display) ---')
+        return
+    _bench_env_steps(results, args, HideAndSeekEnv(headless=False, seed=0), 'env.ursina')
+    if 'env.step' in results:
+        speedup = results['env.ursina.step']['median_ms'] / results['env.step']['median_ms']
+        print(f'--- headless env.step is {speedup:.0f}x faster than the Ursina backend ---')
+
+
+def make_level(n_props):
+    return default_level() if n_props is None else compile_level(generate_office_layout(n_props, seed=0))
+
+
+def bench_level(results, args):
+    """关卡编译 (布局 -> 数组) 和加载编译好的文件 (memmap)"""
+    with tempfile.TemporaryDirectory() as tmp:
+        for n_props in args.level_sizes + ((100000,) if not args.quick else ()):
+            if n_props is None:
+                continue
+            layout = generate_office_layout(n_props, seed=0)
+            level = compile_level(layout)
+            path = save_level(level, os.path.join(tmp, f'{n_props}.level'))
+            results[f'level.compile/props={n_props}'] = measure(lambda: compile_level(layout), args.min_time, args.repeats)
+            results[f'level.load/props={n_props}'] = measure(lambda: load_level(path), args.min_time, args.repeats)
+
+
+def bench_sim(results, args):
+    for n_props in args.level_sizes:
+        level = make_level(n_props)
+        for n in NUM_ENVS:
+            sim = NumpySim(level, NUM_HIDERS, num_envs=n, seed=0)
+            sim.reset()
+            tag = f'props={sim.n_props}/envs={n}'
+            rng = np.random.default_rng(0)
+            actions = rng.integers(0, ACTION_N, size=(64, n))
+            counter = [0]
+
+            def step():
+                counter[0] += 1
+                _, done = sim.step(actions[counter[0] % len(actions)])
+                if done.any():
+                    sim.reset(np.flatnonzero(done))
+            results[f'sim.step/{tag}'] = measure(step, args.min_time, args.repeats, items=n)
+
+            # 观察的耗时和已检查道具的比例有关：标记一半道具后再测
+            sim.reset()
+            half = np.zeros((n, sim.n_props), dtype=bool)
+            half[:, ::2] = True
+            sim.index.mark_checked(*np.nonzero(half))
+            results[f'observation/{tag}'] = measure(sim.observe, args.min_time, args.repeats, items=n)
+
+
+def bench_raycast(results, args):
+    for n_props in args.level_sizes:
+        level = make_level(n_props)
+        lo, hi = level.lo, level.hi
+        for n in RAYS:
+            rng = np.random.default_rng(0)
+            angle = rng.uniform(0, 2 * np.pi, n)
+            origins = np.column_stack([rng.uniform(lo[:, 0].min(), hi[:, 0].max(), n), np.full(n, 0.5 + EYE_HEIGHT),
+                                       rng.uniform(lo[:, 2].min(), hi[:, 2].max(), n)])
+            directions = np.column_stack([np.sin(angle), np.zeros(n), np.cos(angle)])
+            results[f'raycast/props={level.n_props}/rays={n}'] = measure(
+                lambda: raycast_aabbs(origins, directions, lo, hi, FIRE_RANGE), args.min_time, args.repeats, items=n)
+
+
+def bench_model(results, args):
+    torch.manual_seed(0)
+    model = ActorCritic(OBSERVATION_N, ACTION_N)
+    optimizer = torch.optim.Adam(model.parameters(), lr=1e-4)
+    for batch in BATCH_SIZES:
+        obs = torch.randn(batch, OBSERVATION_N)
+
+        def forward():
+            with torch.no_grad():
+                model(obs)
+
+        def forward_backward():
+            probs, values = model(obs)
+            loss = probs.log().mean() + values.pow(2).mean()
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+        results[f'model.forward/batch={batch}'] = measure(forward, args.min_time, args.repeats, items=batch)
+        results[f'model.train_step/batch={batch}'] = measure(forward_backward, args.min_time, args.repeats, items=batch)
+
+
+def bench_train_iteration(results, args, num_envs=64, rollout_steps=128):
+    """一次 PPO 迭代：采样 num_envs×rollout_steps 步 + GAE + 4 轮小批量更新 (与 train.py 默认值一致)"""
+    torch.manual_seed(0)
+    env = VecHideAndSeekEnv(num_envs, seed=0)
+    model = ActorCritic(OBSERVATION_N, ACTION_N)
+    optimizer = torch.optim.Adam(model.parameters(), lr=5e-4)
+    buffer = RolloutBuffer(rollout_steps, num_envs, OBSERVATION_N)
+    state = [env.reset()]
+
+    def iteration():
+        state[0], _ = collect_rollout(env, model, buffer, state[0])
+        with torch.no_grad():
+            _, last_value = model(torch.as_tensor(state[0], dtype=torch.float32))
+        buffer.compute_gae(0.99, 0.95, last_value.squeeze(-1).numpy())
+        ppo_update(model, optimizer, buffer, 4, 1024, 0.2, 0.2, 0.01, 0.5, 0.5)
+    results[f'train.ppo_iteration/envs={num_envs}/steps={rollout_steps}'] = measure(
+        iteration, args.min_time, max(1, args.repeats // 2), items=num_envs * rollout_steps)
+
+
+def environment_info():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ''
+    return {'python': platform.python_version(), 'numpy': np.__version__, 'torch': torch.__version__,
+            'platform': platform.platform(), 'processor': platform.processor(), 'torch_threads': torch.get_num_threads(),
+            'commit': commit, 'time': time.strftime('%Y-%m-%d %H:%M:%S')}
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """按中位数耗时和基准比较，返回 (行列表, 回归的项目名)"""
+    rows, regressions = [], []
+    for name, current in results.items():
+        if name not in baseline:
+            rows.append((name, None, current['median_ms'], None, 'new'))
+            continue
+        base = baseline[name]['median_ms']
+        ratio = current['median_ms'] / base
+        status = 'REGRESSION' if ratio > 1 + threshold else 'faster' if ratio < 1 - threshold else 'ok'
+        if status == 'REGRESSION':
+            regressions.append(name)
+        rows.append((name, base, current['median_ms'], ratio, status))
+    return rows, regressions
+
+
+def print_results(results):
+    width = max(len(name) for name in results)
+    for name, r in results.items():
+        print(f"{name:<{width}}  {r['median_ms']:10.4f} ms  {r['per_sec']:14,.0f} /s")
+
+
+def print_comparison(rows):
+    width = max(len(row[0]) for row in rows)
+    print(f"{'benchmark':<{width}}  {'baseline ms':>12}  {'current ms':>12}  {'ratio':>7}  status")
+    for name, base, current, ratio, status in rows:
+        base_s = f'{base:12.4f}' if base is not None else f"{'-':>12}"
+        ratio_s = f'{ratio:7.2f}' if ratio is not None else f"{'-':>7}"
+        print(f'{name:<{width}}  {base_s}  {current:12.4f}  {ratio_s}  {status}')
+
+
+SUITES = {
+    'level': bench_level,
+    'env': bench_env,
+    'sim': bench_sim,
+    'raycast': bench_raycast,
+    'model': bench_model,
+    'train': bench_train_iteration,
+    'ursina': bench_env_ursina, # 没有显示器时跳过
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Hide & Seek performance benchmarks')
+    parser.add_argument('--out', help='write results to this JSON file')
+    parser.add_argument('--compare', metavar='BASELINE', help='compare against a saved results JSON')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='relative slowdown that counts as a regression (default: %(default)s)')
+    parser.add_argument('--only', nargs='+', choices=sorted(SUITES), help='run only these suites')
+    parser.add_argument('--quick', action='store_true', help='smaller levels and shorter timing runs')
+    parser.add_argument('--min-time', type=float, default=None, help='seconds per timing round')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args(argv)
+    args.level_sizes = QUICK_LEVEL_SIZES if args.quick else LEVEL_SIZES
+    if args.min_time is None:
+        args.min_time = 0.05 if args.quick else 0.2
+
+    results = {}
+    for name in args.only or SUITES:
+        print(f'--- {name} ---', flush=True)
+        SUITES[name](results, args)
+    print_results(results)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump({'environment': environment_info(), 'results': results}, f, indent=2)
+        print(f'--- Results saved to {args.out} ---')
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        rows, regressions = compare(results, baseline, args.threshold)
+        print_comparison(rows)
+        if regressions:
+            print(f'--- {len(regressions)} regression(s) over {args.threshold:.0%}: {", ".join(regressions)} ---')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,140 @@
+# checkpoint.py
+# 检查点管理：后台线程写盘 (临时文件 + rename，写到一半崩溃也不会损坏已有文件)，
+# 保留最近 K 个和成功率最好的一个，读取时使用 mmap + weights_only 快速恢复
+import os
+import glob
+import queue
+import random
+import threading
+
+import numpy as np
+import torch
+
+BEST_SUFFIX = 'best.pth'  # 每个前缀各有一个 <prefix>_best.pth，不同算法的运行互不覆盖
+
+
+def snapshot(obj):
+    """深拷贝一份 state dict (张量复制到CPU)，之后训练线程继续修改参数也不会影响它"""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {k: snapshot(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(snapshot(v) for v in obj)
+    return obj
+
+
+def capture_rng_state():
+    """python / numpy / torch 的全局随机数状态 (都是 weights_only 可以读取的类型)"""
+    numpy_state = np.random.get_state(legacy=False)
+    numpy_state['state']['key'] = numpy_state['state']['key'].tolist() # ndarray 不能用 weights_only 读取
+    return {
+        'python': random.getstate(),
+        'numpy': numpy_state,
+        'torch': torch.get_rng_state(),
+    }
+
+
+def restore_rng_state(state):
+    random.setstate(_as_tuple(state['python']))
+    numpy_state = dict(state['numpy'], state=dict(state['numpy']['state']))
+    numpy_state['state']['key'] = np.array(numpy_state['state']['key'], dtype=np.uint32)
+    np.random.set_state(numpy_state)
+    torch.set_rng_state(state['torch'])
+
+
+def _as_tuple(obj):
+    # random.setstate 需要嵌套的 tuple
+    return tuple(_as_tuple(v) for v in obj) if isinstance(obj, (list, tuple)) else obj
+
+
+def atomic_save(obj, path):
+    """先写临时文件再 os.replace，保证 path 要么是旧文件要么是完整的新文件"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        torch.save(obj, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path, map_location='cpu'):
+    """mmap 方式读取，只加载张量和基础类型 (不执行任意 pickle 代码)"""
+    return torch.load(path, map_location=map_location, mmap=True, weights_only=True)
+
+
+class CheckpointManager:
+    """在 directory 中保存 <prefix>_<step>.pth，保留最近 keep_last 个，另外维护 <prefix>_best.pth
+
+    save() 只在调用线程上做一次内存快照，写盘全部在后台线程完成。
+    """
+    def __init__(self, directory, keep_last=3, prefix='ckpt'):
+        self.directory = directory
+        self.keep_last = keep_last
+        self.prefix = prefix
+        os.makedirs(directory, exist_ok=True)
+        self.best_path = os.path.join(directory, f'{prefix}_{BEST_SUFFIX}')
+        self.best_metric = None
+        if os.path.exists(self.best_path):
+            self.best_metric = load_checkpoint(self.best_path).get('metric')
+
+        self.queue = queue.Queue()
+        self.error = None
+        self.thread = threading.Thread(target=self._writer, name='checkpoint-writer', daemon=True)
+        self.thread.start()
+
+    def path_for(self, step):
+        return os.path.join(self.directory, f'{self.prefix}_{step:09d}.pth')
+
+    def checkpoints(self):
+        """已保存的检查点，按 step 从旧到新排序"""
+        return sorted(glob.glob(os.path.join(self.directory, f'{self.prefix}_[0-9]*.pth')))
+
+    def save(self, state, step, metric=None):
+        """异步保存；metric (例如成功率) 比之前都好时同时更新 <prefix>_best.pth"""
+        if self.error is not None:
+            raise RuntimeError('checkpoint writer failed') from self.error
+        state = snapshot(state)
+        state['step'] = step
+        state['metric'] = metric
+        is_best = metric is not None and (self.best_metric is None or metric > self.best_metric)
+        if is_best:
+            self.best_metric = metric
+        state['best_metric'] = self.best_metric
+        self.queue.put((state, step, is_best))
+
+    def _writer(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                state, step, is_best = item
+                atomic_save(state, self.path_for(step))
+                if is_best:
+                    atomic_save(state, self.best_path)
+                for old in self.checkpoints()[:-self.keep_last]:
+                    os.remove(old)
+            except Exception as e: # 在下一次 save() 时报告给训练线程
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def wait(self):
+        """等待所有排队的检查点写完"""
+        self.queue.join()
+        if self.error is not None:
+            raise RuntimeError('checkpoint writer failed') from self.error
+
+    def close(self):
+        self.wait()
+        self.queue.put(None)
+        self.thread.join()
+
+    def load_latest(self, map_location='cpu'):
+        """读取最新的检查点，没有时返回 None"""
+        paths = self.checkpoints()
+        return load_checkpoint(paths[-1], map_location) if paths else None
+
+    def load_best(self, map_location='cpu'):
+        return load_checkpoint(self.best_path, map_location) if os.path.exists(self.best_path) else None
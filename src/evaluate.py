@@ -0,0 +1,185 @@
+# evaluate.py
+# 检查点评估：在进程池中跑 M 个固定种子的回合 (greedy 取概率最大的动作 / sampled 按概率采样)，
+# 输出成功率 (Wilson 置信区间)、回报、找到所有躲藏者所用步数和用掉的弹药的分布，保存为 JSON。
+# 回合按 BLOCK_SIZE 分块，每块的种子只由 (seed, 块编号) 决定，结果与进程数无关；
+# 两种模式使用相同的种子，面对的是同样的躲藏者布局。传入目录时评估其中所有检查点并选出最好的一个。
+#
+#   python src/evaluate.py checkpoints/ppo_best.pth --episodes 10000 --out eval.json
+#   python src/evaluate.py checkpoints --episodes 2000          # 比较目录中的所有检查点
+import argparse
+import glob
+import json
+import math
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+
+from level import as_level
+from numpy_policy import NumpyActorCritic
+from sim_core import STARTING_AMMO
+from vec_env import VecHideAndSeekEnv
+
+MODES = ('greedy', 'sampled')
+BLOCK_SIZE = 256     # 每个任务同时运行的回合数 (一个批量环境，一次前向计算所有回合)
+CONFIDENCE = 0.95
+PERCENTILES = (10, 50, 90)
+
+
+def load_policy(path):
+    """导出的 .npz 直接读取，.pth 检查点在主进程中转成 NumPy 权重 (工作进程不需要 torch)"""
+    if path.endswith('.npz'):
+        return NumpyActorCritic.load(path)
+    return NumpyActorCritic.from_checkpoint(path)
+
+
+def run_block(layers, level, seed, block, size, greedy):
+    """一个批量环境中的 size 个回合 (每个位置只取第一个回合)，返回每个回合的统计"""
+    policy = NumpyActorCritic(layers)
+    env = VecHideAndSeekEnv(size, seed=[seed, block], level=level)
+    rng = np.random.default_rng([seed, block, 1])
+    stats = {name: np.zeros(size, dtype=dtype) for name, dtype in
+             (('success', bool), ('length', np.int64), ('return', np.float64), ('ammo_used', np.int64),
+              ('hiders_found', np.int64))}
+    finished = np.zeros(size, dtype=bool)
+    obs = env.reset()
+    while not finished.all():
+        probs, _ = policy(obs)
+        if greedy:
+            actions = probs.argmax(axis=1)
+        else: # 每行按概率采样一个动作
+            actions = (probs.cumsum(axis=1) < rng.random((size, 1))).sum(axis=1)
+            actions = np.minimum(actions, probs.shape[1] - 1)
+        obs, _, dones, info = env.step(actions)
+        new = dones & ~finished # 结束后的位置已经自动重置，之后的回合不计
+        if new.any():
+            stats['success'][new] = info['success'][new]
+            stats['length'][new] = info['episode_length'][new]
+            stats['return'][new] = info['episode_return'][new]
+            stats['ammo_used'][new] = info['ammo_used'][new]
+            stats['hiders_found'][new] = info['hiders_found'][new]
+            finished |= new
+    return stats
+
+
+def wilson_interval(successes, n, confidence=CONFIDENCE):
+    """成功率的 Wilson 置信区间 (成功率接近 0 或 1 时也不会超出 [0, 1])"""
+    if n == 0:
+        return 0.0, 1.0
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    p = successes / n
+    center = (p + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def distribution(values):
+    """均值、百分位数和每个取值出现的次数"""
+    values = np.asarray(values)
+    if not len(values):
+        return {'count': 0}
+    counts = dict(zip(*np.unique(values, return_counts=True)))
+    return {'count': len(values), 'mean': float(values.mean()),
+            **{f'p{q}': float(np.percentile(values, q)) for q in PERCENTILES},
+            'counts': {str(int(k)): int(v) for k, v in counts.items()}}
+
+
+def summarize(stats, confidence=CONFIDENCE):
+    n = len(stats['success'])
+    successes = int(stats['success'].sum())
+    returns = stats['return']
+    half = NormalDist().inv_cdf(0.5 + confidence / 2) * returns.std(ddof=1) / math.sqrt(n) if n > 1 else float('nan')
+    won = stats['success']
+    return {'episodes': n, 'successes': successes, 'success_rate': successes / n if n else 0.0,
+            'success_ci': wilson_interval(successes, n, confidence),
+            'mean_return': float(returns.mean()), 'return_ci': (float(returns.mean() - half), float(returns.mean() + half)),
+            'steps_to_success': distribution(stats['length'][won]),
+            'ammo_used_on_success': distribution(stats['ammo_used'][won]),
+            'ammo_used': distribution(stats['ammo_used']),
+            'hiders_found': distribution(stats['hiders_found'])}
+
+
+def evaluate(policy, episodes, modes=MODES, seed=0, level=None, pool=None, block_size=BLOCK_SIZE):
+    """返回 {模式: summarize() 的结果}；pool 为 None 时在当前进程中运行"""
+    blocks = [(b, min(block_size, episodes - b * block_size)) for b in range(math.ceil(episodes / block_size))]
+    tasks = {mode: [(policy.layers, level, seed, b, size, mode == 'greedy') for b, size in blocks] for mode in modes}
+    if pool is None:
+        results = {mode: [run_block(*task) for task in mode_tasks] for mode, mode_tasks in tasks.items()}
+    else:
+        futures = {mode: [pool.submit(run_block, *task) for task in mode_tasks] for mode, mode_tasks in tasks.items()}
+        results = {mode: [f.result() for f in mode_futures] for mode, mode_futures in futures.items()}
+    summary = {}
+    for mode, blocks_stats in results.items():
+        stats = {name: np.concatenate([s[name] for s in blocks_stats]) for name in blocks_stats[0]}
+        summary[mode] = summarize(stats)
+    return summary
+
+
+def checkpoint_paths(path):
+    """文件本身，或目录中所有的 .pth / .npz (按名字排序)"""
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, '*.pth')) + glob.glob(os.path.join(path, '*.npz')))
+    return [path]
+
+
+def print_summary(name, summary):
+    for mode, s in summary.items():
+        lo, hi = s['success_ci']
+        steps = s['steps_to_success']
+        steps_text = f"p50 {steps['p50']:.0f} (p10 {steps['p10']:.0f}, p90 {steps['p90']:.0f})" if steps['count'] else 'n/a'
+        print(f"{name} [{mode}] success {s['success_rate']:.1%} [{lo:.1%}, {hi:.1%}] | "
+              f"return {s['mean_return']:.2f} | steps to success {steps_text} | "
+              f"ammo used {s['ammo_used']['mean']:.2f}/{STARTING_AMMO}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate seeker checkpoints on seeded episodes')
+    parser.add_argument('checkpoint', help='.pth checkpoint, exported .npz policy, or a directory of them')
+    parser.add_argument('--episodes', type=int, default=10000)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--level', help='.level file (default: the office level)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='processes (1: no pool)')
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE, help='episodes per batched env')
+    parser.add_argument('--out', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    paths = checkpoint_paths(args.checkpoint)
+    if not paths:
+        parser.error(f'no checkpoints in {args.checkpoint}')
+    level = as_level(args.level)
+    pool = ProcessPoolExecutor(args.workers, mp_context=mp.get_context('spawn')) if args.workers > 1 else None
+    results = []
+    try:
+        for path in paths:
+            start = time.perf_counter()
+            summary = evaluate(load_policy(path), args.episodes, args.modes, args.seed, args.level, pool,
+                               args.block_size)
+            elapsed = time.perf_counter() - start
+            print_summary(path, summary)
+            print(f"--- {args.episodes} episodes x {len(args.modes)} modes in {elapsed:.1f}s ---")
+            results.append({'checkpoint': path, 'elapsed_s': elapsed, 'modes': summary})
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    # 按第一个模式的成功率 (相同时按平均回报) 选出最好的检查点
+    rank = lambda r: (r['modes'][args.modes[0]]['success_rate'], r['modes'][args.modes[0]]['mean_return'])
+    best = max(results, key=rank)
+    if len(results) > 1:
+        lo, hi = best['modes'][args.modes[0]]['success_ci']
+        print(f"--- Best ({args.modes[0]}): {best['checkpoint']} [{lo:.1%}, {hi:.1%}] ---")
+    if args.out:
+        report = {'episodes': args.episodes, 'seed': args.seed, 'block_size': args.block_size,
+                  'confidence': CONFIDENCE, 'level': {'name': level.name, 'hash': level.hash},
+                  'best': best['checkpoint'], 'results': results}
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'--- Results saved to {args.out} ---')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,91 +1,130 @@
 # game_env.py
+# Ursina 只在选择了渲染后端 (headless=False 或 viewer=True) 时，在第一次 reset() 时导入 (ursina_backend.py)，
+# 所以 headless 训练、vec_env 的子进程和评估脚本不需要加载 Ursina，也不会打开窗口
 import numpy as np
-from ursina import *
 import random
 
-# --- 游戏世界的配置 (可以从之前的文件复制) ---
-# ... (此处省略PROP_TYPES, LEVEL_LAYOUT, WAYPOINTS等定义，请从之前的代码复制)
-PROP_TYPES = {
-    'desk': {'model': 'cube', 'scale': (4, 1, 2), 'color': color.brown},
-    'chair': {'model': 'cube', 'scale': (1, 2, 1), 'color': color.black},
-    'plant_pot': {'model': 'cylinder', 'scale': (1.5, 0.8, 1.5), 'color': color.orange},
-    'plant_leaves': {'model': 'cylinder', 'scale': (1.2, 2.5, 1.2), 'color': color.green},
-    'monitor': {'model': 'cube', 'scale': (1.5, 1, 0.2), 'color': color.dark_gray},
-    'partition': {'model': 'cube', 'scale': (0.2, 4, 8), 'color': color.rgba(200, 200, 200, 200)},
-}
-LEVEL_LAYOUT = [ ('desk', (-12, 0, 10)), ('monitor', (-12, 0.5, 10)), ('chair', (-12, 0, 8)), ('desk', (-12, 0, 0)), ('monitor', (-12, 0.5, 0)), ('chair', (-12, 0, -2)), ('desk', (-12, 0, -10)), ('monitor', (-12, 0.5, -10)), ('chair', (-12, 0, -12)), ('partition', (-8, 0, 5)), ('desk', (12, 0, 10)), ('monitor', (12, 0.5, 10)), ('chair', (12, 0, 8)), ('desk', (12, 0, 0)), ('monitor', (12, 0.5, 0)), ('chair', (12, 0, -2)), ('desk', (12, 0, -10)), ('monitor', (12, 0.5, -10)), ('chair', (12, 0, -12)), ('partition', (8, 0, 5)), ('plant_pot', (0, 0, 0)), ('plant_pot', (0, 0, 5)), ]
-NUM_HIDERS = 1
+from sim_core import NumpySim, SIM_DT, NUM_NEAREST
+from level import as_level
+from spatial_index import NearestPropIndex
+from profiling import profiler
 
-class Prop(Entity):
-    # ... (Prop类的定义与之前相同)
-    def __init__(self, **kwargs):
-        super().__init__(collider='box', **kwargs)
-        self.is_hider = False
-        self.shot = False
-        self.checked_by_ai = False
-    def get_shot(self):
-        if self.shot: return False
-        if self.is_hider:
-            self.color = color.red; self.shot = True; return True
-        return False
+NUM_HIDERS = 1
 
 class HideAndSeekEnv:
-    def __init__(self):
-        self.app = Ursina(borderless=False, development_mode=False, window_title="AI Training Environment")
+    def __init__(self, headless=False, viewer=False, dt=SIM_DT, frame_skip=1, seed=None, level=None):
+        # headless=True: 使用纯NumPy模拟核心 (sim_core.py)，不创建Ursina窗口
+        # viewer=True: 在headless模式下额外打开一个只用来显示的Ursina窗口
+        # dt: 固定的模拟时间步长 (不再使用Ursina的 time.dt)
+        # frame_skip: 一次决策重复执行多少个模拟 tick
+        # seed: 躲藏者抽样的随机种子
+        # level: 编译好的关卡 (level.Level 或 .level 文件路径)，默认是办公室关卡
+        self.headless = headless
+        self.level = as_level(level)
+        self.dt = dt
+        self.frame_skip = frame_skip
+        self.rng = random.Random(seed)
+        self.sim = None
+        self.viewer = None
         # 观察空间: AI位置(2), AI朝向(1), 最近3个未检查道具的相对位置(3*2=6)
         # Total = 2 + 1 + 6 = 9
         self.observation_space_n = 9
         # 动作空间: 0:前进, 1:后退, 2:左转, 3:右转, 4:开火
         self.action_space_n = 5
         self.game_over = False
-        self.max_steps = 1000 # 每局游戏的最大步数
+        self.max_steps = 1000 # 每局游戏的最大步数 (tick)
+
+        self.use_viewer = viewer
+        self.app = None # 渲染模式的 Ursina 窗口，第一次 reset() 时才创建
+
+        if headless:
+            self.sim = NumpySim(self.level, NUM_HIDERS, max_steps=self.max_steps,
+                                dt=dt, frame_skip=frame_skip, seed=seed)
+            return
+
+        # 场景只在关卡布局变化时重建，其余的 reset 只重置道具状态
+        self.layout_key = None
+        self.all_props = []
+        self.prop_groups = [] # 每个道具对应的布局条目编号
 
+    def _open_window(self):
+        from ursina import Ursina, camera
+        self.app = Ursina(borderless=False, development_mode=False, window_title="AI Training Environment")
         # 关闭默认的相机控制器
         camera.position = (0, 30, -35)
         camera.rotation_x = 45
 
 
-    def reset(self):
-        """重置环境到初始状态"""
-        # --- THE FIX ---
-        # Access the global 'scene' object directly, not through 'self.app'
-        [destroy(e) for e in scene.children if isinstance(e, (Prop, SeekerAI))]
-        
+    def reset(self, seed=None):
+        """重置环境到初始状态 (传入seed会重新设定随机数生成器)"""
+        if seed is not None:
+            self.rng.seed(seed)
+            if self.headless: self.sim.seed(seed)
+        if self.headless:
+            if self.use_viewer and self.viewer is None:
+                from ursina_backend import SimViewer
+                self.viewer = SimViewer(self.sim)
+            self.sim.reset()
+            self._sync_from_sim()
+            return self._get_observation()
+
+        if self.app is None:
+            self._open_window()
+        from ursina import destroy, scene
+        from ursina_backend import Prop, SeekerAI
+
+        layout_key = self.level.hash
+        if layout_key != self.layout_key:
+            # 关卡布局变了 (或第一次 reset)：销毁旧实体，完整重建
+            # Access the global 'scene' object directly, not through 'self.app'
+            [destroy(e) for e in scene.children if isinstance(e, (Prop, SeekerAI))]
+            self.all_props, self.prop_groups = self._setup_scene()
+            self.seeker = self._setup_seeker()
+            # 道具位置不随回合变化，最近道具索引每个关卡只构建一次
+            self.prop_index = NearestPropIndex(self.level.pos, grid=self.level.grid)
+            self.layout_key = layout_key
+
         self.step_count = 0
         self.game_over = False
         self.hiders_found = 0
         self.ammo = 10
-        self.all_props = self._setup_scene()
-        self.seeker = self._setup_seeker()
-        
-        # After resetting, we need to re-enable the main scene light and sky
-        # as they might be destroyed if not handled carefully.
-        # A simple way is to ensure they aren't parented to something that gets destroyed,
-        # or re-initialize them if needed. For now, the destroy logic is specific enough.
-        
+        self._reset_scene()
         return self._get_observation()
+
+    def get_rng_state(self):
+        """躲藏者抽样的随机数状态，保存到检查点中用于精确恢复"""
+        return self.sim.rng.bit_generator.state if self.headless else self.rng.getstate()
+
+    def set_rng_state(self, state):
+        if self.headless: self.sim.rng.bit_generator.state = state
+        else: self.rng.setstate(state)
+
     def _setup_scene(self):
-        """创建场景和道具"""
-        all_props = []
-        hider_choices = random.sample(LEVEL_LAYOUT, NUM_HIDERS)
-        for i, (prop_type, pos) in enumerate(LEVEL_LAYOUT):
-            # ... (创建道具的代码与之前相同)
-            prop_info = PROP_TYPES[prop_type]; is_hider = (prop_type, pos) in hider_choices
-            if prop_type == 'plant_pot':
-                pot = Prop(name=f'prop_{i}_pot', model=prop_info['model'], scale=prop_info['scale'], color=prop_info['color'], position=pos, is_hider=is_hider)
-                leaves = Prop(name=f'prop_{i}_leaves', model=PROP_TYPES['plant_leaves']['model'], scale=PROP_TYPES['plant_leaves']['scale'], color=PROP_TYPES['plant_leaves']['color'], position=pos+(0, prop_info['scale'][1], 0), is_hider=is_hider)
-                all_props.extend([pot, leaves])
-            else:
-                entity = Prop(name=f'prop_{i}', model=prop_info['model'], scale=prop_info['scale'], color=prop_info['color'], position=pos, is_hider=is_hider)
-                if prop_type == 'monitor': entity.y += 0.5
-                all_props.append(entity)
-        return all_props
+        """创建场景和道具 (只在关卡布局变化时调用)"""
+        from scene_batch import create_prop_entity
+        from ursina_backend import Prop
+        all_props = [create_prop_entity(Prop, self.level, i) for i in range(self.level.n_props)]
+        for prop_id, prop in enumerate(all_props): prop.prop_id = prop_id # 在 prop_index 中的编号
+        return all_props, self.level.group.tolist()
+
+    def _reset_scene(self):
+        """复用已创建的实体：重新抽选躲藏者，并重置道具和seeker的状态"""
+        hider_groups = set(self.rng.sample(self.level.hider_groups.tolist(), NUM_HIDERS))
+        for prop, group in zip(self.all_props, self.prop_groups):
+            prop.reset_state(group in hider_groups)
+        self.prop_index.reset()
+        self.seeker.position = (0, 0.5, -15)
+        self.seeker.rotation = (0, 0, 0)
 
     def _setup_seeker(self):
+        from ursina_backend import SeekerAI
         return SeekerAI(position=(0, 0.5, -15))
 
     def _get_observation(self):
         """生成AI的观察向量"""
+        if self.headless:
+            return self.sim.observe()[0]
+
         obs = np.zeros(self.observation_space_n)
         # AI自身状态
         obs[0] = self.seeker.x / 20 # 归一化
@@ -93,11 +132,10 @@ class HideAndSeekEnv:
         obs[2] = self.seeker.rotation_y / 360 # 归一化
 
         # 最近的3个未检查道具
-        unchecked_props = [p for p in self.all_props if not p.checked_by_ai]
-        unchecked_props.sort(key=lambda p: distance_xz(self.seeker.position, p.position))
+        nearest, valid = self.prop_index.nearest([(self.seeker.x, self.seeker.z)], NUM_NEAREST)
         
-        for i in range(min(3, len(unchecked_props))):
-            prop = unchecked_props[i]
+        for i in np.flatnonzero(valid[0]):
+            prop = self.all_props[nearest[0, i]]
             obs[3 + i*2] = (prop.x - self.seeker.x) / 20 # 相对位置
             obs[4 + i*2] = (prop.z - self.seeker.z) / 20 # 相对位置
         
@@ -105,20 +143,41 @@ class HideAndSeekEnv:
 
     def step(self, action):
         """执行一个动作，返回(观察, 奖励, 是否结束, 信息)"""
+        profiler.count('env_steps')
+        with profiler.phase('env.step'):
+            if self.headless:
+                return self._step_headless(action)
+
+            reward = 0
+            for tick in range(self.frame_skip):
+                # 开火只在第一个 tick 生效，之后的 tick 只推进时间
+                reward += self._tick(action if tick == 0 or action != 4 else None)
+                if self.game_over: break
+
+            with profiler.phase('env.observation'):
+                obs = self._get_observation()
+            return obs, reward, self.game_over, {}
+
+    def _tick(self, action):
+        """按固定时间步长 self.dt 推进一个 tick，返回这个 tick 的奖励"""
+        from ursina import raycast, Vec3
+        from ursina_backend import Prop
         self.step_count += 1
         reward = -0.01 # 时间流逝惩罚
 
         # 执行动作
-        if action == 0: self.seeker.position += self.seeker.forward * self.seeker.speed * time.dt
-        elif action == 1: self.seeker.position -= self.seeker.forward * self.seeker.speed * time.dt
-        elif action == 2: self.seeker.rotation_y -= self.seeker.turn_speed * time.dt
-        elif action == 3: self.seeker.rotation_y += self.seeker.turn_speed * time.dt
+        if action == 0: self.seeker.position += self.seeker.forward * self.seeker.speed * self.dt
+        elif action == 1: self.seeker.position -= self.seeker.forward * self.seeker.speed * self.dt
+        elif action == 2: self.seeker.rotation_y -= self.seeker.turn_speed * self.dt
+        elif action == 3: self.seeker.rotation_y += self.seeker.turn_speed * self.dt
         elif action == 4: # 开火
             reward -= 0.1 # 开火成本
             self.ammo -= 1
-            hit_info = raycast(self.seeker.world_position + Vec3(0,1,0), self.seeker.forward, distance=10, ignore=[self.seeker,])
+            with profiler.phase('env.raycast'):
+                hit_info = raycast(self.seeker.world_position + Vec3(0,1,0), self.seeker.forward, distance=10, ignore=[self.seeker,])
             if hit_info.entity and isinstance(hit_info.entity, Prop):
                 hit_info.entity.checked_by_ai = True
+                self.prop_index.mark_checked([0], [hit_info.entity.prop_id])
                 if hit_info.entity.get_shot():
                     reward += 10 # 找到躲藏者的大奖励
                     self.hiders_found += 1
@@ -126,7 +185,8 @@ class HideAndSeekEnv:
                     reward -= 1 # 射错的惩罚
 
         # 更新游戏世界 (非常重要)
-        self.app.step()
+        with profiler.phase('env.app_step'):
+            self.app.step()
 
         # 检查结束条件
         if self.hiders_found == NUM_HIDERS or self.ammo <= 0 or self.step_count >= self.max_steps:
@@ -134,10 +194,21 @@ class HideAndSeekEnv:
             if self.hiders_found == NUM_HIDERS:
                 reward += 100 # 获胜的终极大奖
 
-        return self._get_observation(), reward, self.game_over, {}
+        return reward
+
+    def _step_headless(self, action):
+        with profiler.phase('env.sim_step'):
+            reward, done = self.sim.step(np.array([action]))
+        self._sync_from_sim()
+        self.game_over = bool(done[0])
+        if self.viewer is not None:
+            self.viewer.sync()
+        with profiler.phase('env.observation'):
+            obs = self._get_observation()
+        return obs, float(reward[0]), self.game_over, {}
 
-class SeekerAI(Entity):
-    def __init__(self, **kwargs):
-        super().__init__(model='cube', scale=(1, 2, 1), color=color.red, **kwargs)
-        self.speed = 250 # 速度需要调整，因为time.dt在非实时模式下很小
-        self.turn_speed = 3600
\ No newline at end of file
+    def _sync_from_sim(self):
+        """把NumPy核心中的计数器同步到环境属性上 (train.py 会读取它们)"""
+        self.step_count = int(self.sim.step_count[0])
+        self.ammo = int(self.sim.ammo[0])
+        self.hiders_found = int(self.sim.hiders_found[0])
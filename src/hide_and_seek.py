@@ -1,6 +1,17 @@
-import pygame
+import argparse
+import importlib
+import json
+import os
 import random
 import sys
+import time
+
+import pygame
+from collections import OrderedDict
+
+import numpy as np
+
+from level import default_level_2d
 
 # --- 游戏设置 (Game Settings) ---
 SCREEN_WIDTH = 800
@@ -14,8 +25,6 @@ WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 RED = (255, 0, 0)
 GRAY = (128, 128, 128)
-STEEL_BLUE = (70, 130, 180) # 办公桌颜色
-SADDLE_BROWN = (139, 69, 19) # 椅子颜色
 DARK_GREEN = (0, 100, 0)     # 盆栽颜色
 
 # 搜捕者设置 (Seeker Settings)
@@ -24,288 +33,608 @@ STARTING_AMMO = 8 # 子弹稍微多一点，因为地图大了
 SEEKER_COLOR = RED
 
 # 躲藏者/道具设置 (Hider/Prop Settings)
-# 定义了不同类型的道具
-PROP_TYPES = {
-    "desk": {"color": STEEL_BLUE, "size": (150, 60)},
-    "chair": {"color": SADDLE_BROWN, "size": (40, 40)},
-    "plant": {"color": DARK_GREEN, "size": (50, 70)},
-}
+# 道具类型和关卡布局在 level.py 中定义 (PROP_TYPES_2D, LEVEL_LAYOUT_2D)，这里加载编译好的关卡
 NUM_HIDERS = 3
 
-# 预设的关卡布局: (类型, (x坐标, y坐标))
-LEVEL_LAYOUT = [
-    # 周围的墙壁/边界
-    ("desk", (0, 0)), ("desk", (150, 0)), ("desk", (300, 0)), ("desk", (450, 0)), ("desk", (600, 0)),
-    ("desk", (750, 0)),("desk", (900, 0)),("desk", (1050, 0)),("desk", (1200, 0)), ("desk", (1350, 0)),
-    ("desk", (0, 1140)), ("desk", (150, 1140)), ("desk", (300, 1140)), ("desk", (450, 1140)), ("desk", (600, 1140)),
-    ("desk", (750, 1140)),("desk", (900, 1140)),("desk", (1050, 1140)),("desk", (1200, 1140)), ("desk", (1350, 1140)),
-    # 内部的办公区
-    ("desk", (200, 200)), ("chair", (250, 270)),
-    ("desk", (200, 400)), ("chair", (250, 350)), ("plant", (140, 380)),
-    ("desk", (600, 300)), ("chair", (600, 250)),
-    ("desk", (600, 500)), ("chair", (600, 570)),
-    ("desk", (1000, 200)), ("chair", (950, 220)),
-    ("desk", (1000, 600)), ("chair", (1050, 550)), ("plant", (1150, 620)),
-    ("desk", (1200, 800)), ("chair", (1250, 870)),
-    ("plant", (50, 800)), ("plant", (1400, 100)),
-]
-
 # 游戏时间 (Game Timer)
 GAME_TIME_SECONDS = 60
 
+# 空间网格的格子大小 (像素)，大约是一个办公桌的大小
+GRID_CELL_SIZE = 128
+# 静态图层按 TILE_SIZE×TILE_SIZE 的块缓存，最多保留 MAX_CACHED_TILES 块 (约 1MB/块)
+TILE_SIZE = 512
+MAX_CACHED_TILES = 64
+MAX_CACHED_TEXTS = 256
+
+# 回合状态 (Round States)
+PLAYING = 'playing'
+ROUND_OVER = 'round_over'             # 停留 ROUND_OVER_DELAY 秒，显示最后一帧
+GAME_OVER_SCREEN = 'game_over_screen' # 显示胜负，等待 R/Q
+ROUND_OVER_DELAY = 1.0
+HIT_MARKER_LIFETIME = 0.5
+MAX_FRAME_TIME = 0.1
+# 脚本搜捕者每隔多少帧开一枪 (大约人点鼠标的速度)
+SCRIPTED_SHOT_INTERVAL = 15
+
 # --- 游戏对象类 (Game Object Classes) ---
 
 class Seeker(pygame.sprite.Sprite):
-    def __init__(self, x, y):
+    def __init__(self, x, y, obstacles=None, map_size=(MAP_WIDTH, MAP_HEIGHT)):
         super().__init__()
         self.image = pygame.Surface([30, 40])
         self.image.fill(SEEKER_COLOR)
         self.rect = self.image.get_rect()
         self.rect.x = x # 这是在整个地图上的坐标 (世界坐标)
         self.rect.y = y
+        self.obstacles = obstacles # SpatialHashGrid，不能穿过其中的道具
+        self.map_width, self.map_height = map_size
+
+    def update(self, dx=0, dy=0):
+        """向 (dx, dy) 方向 (各为 -1/0/1) 移动一帧"""
+        dx, dy = dx * SEEKER_SPEED, dy * SEEKER_SPEED
 
-    def update(self):
-        keystate = pygame.key.get_pressed()
-        dx, dy = 0, 0
-        if keystate[pygame.K_a]: dx = -SEEKER_SPEED
-        if keystate[pygame.K_d]: dx = SEEKER_SPEED
-        if keystate[pygame.K_w]: dy = -SEEKER_SPEED
-        if keystate[pygame.K_s]: dy = SEEKER_SPEED
-        
-        # 移动并检查是否超出地图边界
-        if 0 < self.rect.x + dx < MAP_WIDTH - self.rect.width:
+        # 移动并检查是否超出地图边界或撞到道具 (x、y 分开检查，可以贴着道具滑动)
+        if 0 < self.rect.x + dx < self.map_width - self.rect.width and not self._blocked(dx, 0):
             self.rect.x += dx
-        if 0 < self.rect.y + dy < MAP_HEIGHT - self.rect.height:
+        if 0 < self.rect.y + dy < self.map_height - self.rect.height and not self._blocked(0, dy):
             self.rect.y += dy
 
+    def _blocked(self, dx, dy):
+        if self.obstacles is None or (dx == 0 and dy == 0):
+            return False
+        target = self.rect.move(dx, dy)
+        # 已经重叠的道具不挡路 (比如出生点在道具里)，这样总能走出来
+        return any(not prop.rect.colliderect(self.rect) for prop in self.obstacles.query_rect(target))
+
 class Prop(pygame.sprite.Sprite):
-    def __init__(self, prop_type, pos, is_hider=False):
+    def __init__(self, level, i, is_hider=False):
+        """关卡中的第 i 个道具 (2D 关卡编译在 xz 平面上：x -> x, z -> y)"""
         super().__init__()
-        prop_info = PROP_TYPES[prop_type]
-        self.image = pygame.Surface(prop_info["size"])
-        self.image.fill(prop_info["color"])
+        x, _, y = level.lo[i].tolist()
+        w, _, h = (level.hi[i] - level.lo[i]).tolist()
+        self.image = pygame.Surface((w, h))
+        self.color = tuple(level.color[i, :3].tolist())
+        self.image.fill(self.color)
         self.rect = self.image.get_rect()
-        self.rect.topleft = pos # 世界坐标
+        self.rect.topleft = (x, y) # 世界坐标
         self.is_hider = is_hider
+        self.order = i # 在关卡中的编号，重叠时按这个顺序绘制/检测
+
+class SpatialHashGrid:
+    """道具矩形的均匀网格 (spatial hash)
+
+    每个道具登记在它覆盖的所有格子里，点击检测、碰撞和镜头裁剪只检查附近格子中的道具，
+    耗时与地图大小和道具总数无关。道具被移除 (kill) 时要同时调用 remove()。
+    """
+    def __init__(self, sprites=(), cell_size=GRID_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {} # (cx, cy) -> [sprite, ...]
+        for sprite in sprites:
+            self.insert(sprite)
+
+    def _cells(self, rect):
+        cs = self.cell_size
+        for cx in range(rect.left // cs, max(rect.left, rect.right - 1) // cs + 1):
+            for cy in range(rect.top // cs, max(rect.top, rect.bottom - 1) // cs + 1):
+                yield cx, cy
+
+    def insert(self, sprite):
+        for cell in self._cells(sprite.rect):
+            self.cells.setdefault(cell, []).append(sprite)
+
+    def remove(self, sprite):
+        for cell in self._cells(sprite.rect):
+            bucket = self.cells.get(cell)
+            if bucket and sprite in bucket:
+                bucket.remove(sprite)
+                if not bucket:
+                    del self.cells[cell]
+
+    def query_point(self, x, y):
+        """包含点 (x, y) 的道具，按关卡顺序"""
+        cs = self.cell_size
+        bucket = self.cells.get((int(x) // cs, int(y) // cs), ())
+        return sorted((s for s in bucket if s.rect.collidepoint(x, y)), key=lambda s: s.order)
+
+    def query_rect(self, rect):
+        """与 rect 相交的道具，按关卡顺序"""
+        found = set()
+        for cell in self._cells(rect):
+            for sprite in self.cells.get(cell, ()):
+                if sprite not in found and sprite.rect.colliderect(rect):
+                    found.add(sprite)
+        return sorted(found, key=lambda s: s.order)
 
 class HitMarker(pygame.sprite.Sprite):
-    def __init__(self, world_pos):
+    def __init__(self, world_pos, lifetime=HIT_MARKER_LIFETIME):
         super().__init__()
         self.image = pygame.Surface([10, 10])
         pygame.draw.circle(self.image, BLACK, (5, 5), 5)
         self.image.set_colorkey(WHITE)
         self.rect = self.image.get_rect(center=world_pos) # 世界坐标
-        self.spawn_time = pygame.time.get_ticks()
+        self.time_left = lifetime # 按游戏时间计时 (秒)
 
-    def update(self):
-        if pygame.time.get_ticks() - self.spawn_time > 500:
+    def update(self, dt):
+        self.time_left -= dt
+        if self.time_left <= 0:
             self.kill()
 
 # --- 辅助函数 (Helper Functions) ---
 
+_fonts = {}
+_text_surfaces = {}
+
+def get_font(size):
+    """同一个字号只创建一次 Font (创建 Font 需要读取字体文件)"""
+    if size not in _fonts:
+        _fonts[size] = pygame.font.Font(None, size)
+    return _fonts[size]
+
+def render_text(text, size, color):
+    """缓存渲染好的文字，HUD 的文字大部分帧都不变"""
+    key = (size, text, color)
+    text_surface = _text_surfaces.get(key)
+    if text_surface is None:
+        if len(_text_surfaces) >= MAX_CACHED_TEXTS:
+            _text_surfaces.clear()
+        text_surface = _text_surfaces[key] = get_font(size).render(text, True, color)
+    return text_surface
+
 def draw_text(surface, text, size, x, y, color):
-    font = pygame.font.Font(None, size)
-    text_surface = font.render(text, True, color)
+    text_surface = render_text(text, size, color)
     text_rect = text_surface.get_rect()
     text_rect.topleft = (x, y)
     surface.blit(text_surface, text_rect)
 
-def create_camera(seeker_rect):
+class StaticLayer:
+    """预先渲染好的静态道具图层
+
+    地图按 TILE_SIZE 分块，块第一次出现在镜头里时把其中的道具画进去，之后每帧只 blit
+    镜头覆盖的几个块 (与道具数量无关)。道具被移除时用 invalidate(rect) 只重画那一块区域。
+    """
+    def __init__(self, grid, tile_size=TILE_SIZE, max_tiles=MAX_CACHED_TILES):
+        self.grid = grid
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self.tiles = OrderedDict() # (tx, ty) -> Surface，按最近使用排序
+
+    def _tile_rect(self, key):
+        return pygame.Rect(key[0] * self.tile_size, key[1] * self.tile_size, self.tile_size, self.tile_size)
+
+    def _keys(self, rect):
+        ts = self.tile_size
+        for tx in range(rect.left // ts, max(rect.left, rect.right - 1) // ts + 1):
+            for ty in range(rect.top // ts, max(rect.top, rect.bottom - 1) // ts + 1):
+                yield tx, ty
+
+    def _paint(self, tile, tile_rect, area):
+        """在块上重画世界坐标 area 内的背景和道具"""
+        tile.set_clip(area.move(-tile_rect.x, -tile_rect.y))
+        tile.fill(WHITE)
+        for prop in self.grid.query_rect(area):
+            tile.blit(prop.image, prop.rect.move(-tile_rect.x, -tile_rect.y))
+        tile.set_clip(None)
+
+    def _tile(self, key):
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile_rect = self._tile_rect(key)
+            tile = pygame.Surface(tile_rect.size).convert()
+            self._paint(tile, tile_rect, tile_rect)
+            self.tiles[key] = tile
+            if len(self.tiles) > self.max_tiles:
+                self.tiles.popitem(last=False)
+        else:
+            self.tiles.move_to_end(key)
+        return tile
+
+    def invalidate(self, rect):
+        """rect (世界坐标) 中的道具变了：只重画已缓存块中的这块区域"""
+        for key in self._keys(rect):
+            if key in self.tiles:
+                tile_rect = self._tile_rect(key)
+                self._paint(self.tiles[key], tile_rect, rect.clip(tile_rect))
+
+    def draw(self, surface, camera):
+        view = pygame.Rect(-camera.x, -camera.y, SCREEN_WIDTH, SCREEN_HEIGHT)
+        for key in self._keys(view):
+            surface.blit(self._tile(key), self._tile_rect(key).move(camera.topleft))
+
+def create_camera(seeker_rect, map_size=(MAP_WIDTH, MAP_HEIGHT)):
     """计算镜头偏移量"""
+    map_width, map_height = map_size
     x = -seeker_rect.centerx + SCREEN_WIDTH / 2
     y = -seeker_rect.centery + SCREEN_HEIGHT / 2
     # 限制镜头不超出地图边界
     x = min(0, x) # 不向右滚动超过地图左边界
     y = min(0, y) # 不向下滚动超过地图上边界
-    x = max(-(MAP_WIDTH - SCREEN_WIDTH), x) # 不向左滚动超过地图右边界
-    y = max(-(MAP_HEIGHT - SCREEN_HEIGHT), y) # 不向上滚动超过地图下边界
-    return pygame.Rect(x, y, MAP_WIDTH, MAP_HEIGHT)
-
-def draw_minimap(surface, seeker, props):
-    """绘制小地图"""
-    # 小地图的尺寸和位置
-    minimap_w, minimap_h = 200, 150
-    minimap_x, minimap_y = SCREEN_WIDTH - minimap_w - 10, 10
-    
-    # 比例尺
-    scale_x = minimap_w / MAP_WIDTH
-    scale_y = minimap_h / MAP_HEIGHT
-
-    # 绘制背景
-    minimap_surface = pygame.Surface((minimap_w, minimap_h))
-    minimap_surface.fill(GRAY)
-    minimap_surface.set_alpha(180) # 半透明
-
-    # 绘制所有道具的缩略图
-    for prop in props:
-        mini_prop_x = int(prop.rect.x * scale_x)
-        mini_prop_y = int(prop.rect.y * scale_y)
-        mini_prop_w = int(prop.rect.width * scale_x) + 1
-        mini_prop_h = int(prop.rect.height * scale_y) + 1
-        pygame.draw.rect(minimap_surface, prop.image.get_at((0,0)), (mini_prop_x, mini_prop_y, mini_prop_w, mini_prop_h))
-
-    # 绘制搜捕者位置
-    seeker_mini_x = int(seeker.rect.centerx * scale_x)
-    seeker_mini_y = int(seeker.rect.centery * scale_y)
-    pygame.draw.circle(minimap_surface, RED, (seeker_mini_x, seeker_mini_y), 3)
-
-    # 将小地图画到主屏幕上
-    surface.blit(minimap_surface, (minimap_x, minimap_y))
-
-def show_game_over_screen(winner):
-    # ... (此函数与之前版本相同，此处省略以节省空间) ...
-    # ... (The game over screen function is the same as the previous version) ...
-    # (Copy the `show_game_over_screen` function from the previous code block here)
-    screen.fill(GRAY)
+    x = max(-(map_width - SCREEN_WIDTH), x) # 不向左滚动超过地图右边界
+    y = max(-(map_height - SCREEN_HEIGHT), y) # 不向上滚动超过地图下边界
+    return pygame.Rect(x, y, map_width, map_height)
+
+class Minimap:
+    """小地图：道具缩略图画一次缓存起来，每帧只画搜捕者的位置
+
+    道具被移除时调用 invalidate()，下一帧重新生成底图。
+    """
+    def __init__(self, props, map_size=(MAP_WIDTH, MAP_HEIGHT), width=200, height=150):
+        self.props = props
+        self.map_width, self.map_height = map_size
+        self.width, self.height = width, height
+        self.position = (SCREEN_WIDTH - width - 10, 10)
+        self.base = None
+
+    def invalidate(self):
+        self.base = None
+
+    def _render_base(self):
+        # 比例尺
+        scale_x = self.width / self.map_width
+        scale_y = self.height / self.map_height
+        base = pygame.Surface((self.width, self.height))
+        base.fill(GRAY)
+        base.set_alpha(180) # 半透明
+        # 绘制所有道具的缩略图
+        for prop in self.props:
+            mini_rect = (int(prop.rect.x * scale_x), int(prop.rect.y * scale_y),
+                         int(prop.rect.width * scale_x) + 1, int(prop.rect.height * scale_y) + 1)
+            pygame.draw.rect(base, prop.color, mini_rect)
+        return base
+
+    def draw(self, surface, seeker):
+        if self.base is None:
+            self.base = self._render_base()
+        surface.blit(self.base, self.position)
+        # 绘制搜捕者位置
+        seeker_mini_x = self.position[0] + int(seeker.rect.centerx * self.width / self.map_width)
+        seeker_mini_y = self.position[1] + int(seeker.rect.centery * self.height / self.map_height)
+        pygame.draw.circle(surface, RED, (seeker_mini_x, seeker_mini_y), 3)
+
+def draw_game_over_screen(surface, winner):
+    surface.fill(GRAY)
     if winner == "Hiders":
-        font = pygame.font.Font(None, 74)
+        font = get_font(74)
         text = font.render("Hiders Win!", True, DARK_GREEN)
-        screen.blit(text, (SCREEN_WIDTH/2 - text.get_width()/2, SCREEN_HEIGHT/4))
+        surface.blit(text, (SCREEN_WIDTH/2 - text.get_width()/2, SCREEN_HEIGHT/4))
     else:
-        font = pygame.font.Font(None, 74)
+        font = get_font(74)
         text = font.render("Seeker Wins!", True, RED)
-        screen.blit(text, (SCREEN_WIDTH/2 - text.get_width()/2, SCREEN_HEIGHT/4))
-    
-    font = pygame.font.Font(None, 30)
+        surface.blit(text, (SCREEN_WIDTH/2 - text.get_width()/2, SCREEN_HEIGHT/4))
+
+    font = get_font(30)
     text = font.render("Press 'R' to Play Again or 'Q' to Quit", True, WHITE)
-    screen.blit(text, (SCREEN_WIDTH/2 - text.get_width()/2, SCREEN_HEIGHT/2))
-    pygame.display.flip()
-    
-    waiting = True
-    while waiting:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                sys.exit()
-            if event.type == pygame.KEYUP:
-                if event.key == pygame.K_r:
-                    waiting = False
-                if event.key == pygame.K_q:
-                    pygame.quit()
-                    sys.exit()
+    surface.blit(text, (SCREEN_WIDTH/2 - text.get_width()/2, SCREEN_HEIGHT/2))
+
+
+# --- 游戏状态 (Game State) ---
+
+class HideAndSeekGame:
+    """一局一局进行的躲猫猫游戏，回合之间是显式的状态机：
+
+        PLAYING -> ROUND_OVER (停留 ROUND_OVER_DELAY 秒) -> GAME_OVER_SCREEN -> new_round() -> PLAYING
+
+    道具、精灵组、空间网格和渲染缓存只在创建时构建一次，new_round() 只把被击中的道具放回去
+    并重置弹药/时间等变量，所以玩多少回合内存都不会增长。
+    screen 为 None 时是 headless 模式：不创建图层和命中标记，也不绘制。
+    """
+    def __init__(self, level=None, screen=None, seed=None):
+        self.level = level if level is not None else default_level_2d()
+        self.screen = screen
+        self.rng = random.Random(seed)
+        # 关卡比默认地图大时扩大地图
+        map_width, map_height = MAP_WIDTH, MAP_HEIGHT
+        if self.level.n_props:
+            map_width = max(map_width, int(np.ceil(self.level.hi[:, 0].max())))
+            map_height = max(map_height, int(np.ceil(self.level.hi[:, 2].max())))
+        self.map_size = (map_width, map_height)
+
+        # 道具是静态的，不放进 markers，避免每帧对它们调用 update
+        self.props = [Prop(self.level, i) for i in range(self.level.n_props)]
+        self.props_group = pygame.sprite.Group()
+        self.markers = pygame.sprite.Group()
+        self.grid = SpatialHashGrid()
+        self.seeker = Seeker(map_width / 2, map_height / 2, obstacles=self.grid, map_size=self.map_size)
+        self.static_layer = self.minimap = None
+        if screen is not None:
+            self.static_layer = StaticLayer(self.grid)
+            self.minimap = Minimap(self.props_group, self.map_size)
+        self.rounds = 0
+        self.new_round()
+
+    def new_round(self):
+        """重新选择躲藏者，放回上一回合被击中的道具，重置搜捕者和计时"""
+        hider_groups = set(self.rng.sample(self.level.hider_groups.tolist(), NUM_HIDERS))
+        for prop in self.props:
+            prop.is_hider = int(self.level.group[prop.order]) in hider_groups
+            if not prop.alive():
+                self.props_group.add(prop)
+                self.grid.insert(prop)
+                if self.static_layer is not None:
+                    self.static_layer.invalidate(prop.rect)
+        if self.minimap is not None:
+            self.minimap.invalidate()
+        self.markers.empty()
+
+        self.seeker.rect.topleft = (self.map_size[0] / 2, self.map_size[1] / 2)
+        self.camera = create_camera(self.seeker.rect, self.map_size)
+        self.ammo = STARTING_AMMO
+        self.hiders_found = 0
+        self.elapsed = 0.0
+        self.winner = None
+        self.state = PLAYING
+        self.state_time = 0.0
+        self.rounds += 1
+
+    @property
+    def time_left(self):
+        return max(0.0, GAME_TIME_SECONDS - self.elapsed)
+
+    def view_rect(self):
+        """镜头能看到的区域 (世界坐标)"""
+        return pygame.Rect(-self.camera.x, -self.camera.y, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+    def shoot(self, x, y):
+        """向世界坐标 (x, y) 开一枪，击中躲藏者时返回 True"""
+        if self.state != PLAYING or self.ammo <= 0:
+            return False
+        self.ammo -= 1
+        if self.screen is not None:
+            self.markers.add(HitMarker((x, y)))
+
+        # 检查是否击中 (只看点击位置所在格子里的道具)
+        for hider in self.grid.query_point(x, y):
+            if hider.is_hider:
+                hider.kill() # 从所有组中移除
+                self.grid.remove(hider)
+                if self.static_layer is not None:
+                    self.static_layer.invalidate(hider.rect)
+                    self.minimap.invalidate()
+                    print("Hit a hider!")
+                self.hiders_found += 1
+                return True # 一次射击最多击中一个
+        return False
+
+    def update(self, dt, move=(0, 0)):
+        """游戏时间前进 dt 秒；move 是搜捕者这一帧的移动方向 (dx, dy)"""
+        if self.state == PLAYING:
+            self.seeker.update(*move)
+            self.markers.update(dt)
+            # 在每一帧都更新镜头位置
+            self.camera = create_camera(self.seeker.rect, self.map_size)
+            self.elapsed += dt
+
+            # 检查胜利/失败条件 (恰好在最后一秒或最后一发子弹找到所有人也算搜捕者赢)
+            if self.hiders_found == NUM_HIDERS:
+                self.end_round("Seeker")
+            elif self.time_left <= 0 or self.ammo <= 0:
+                self.end_round("Hiders")
+        elif self.state == ROUND_OVER:
+            # 短暂停留，让玩家看到最后一击
+            self.state_time += dt
+            if self.state_time >= ROUND_OVER_DELAY:
+                self.state = GAME_OVER_SCREEN
+
+    def end_round(self, winner):
+        self.winner = winner
+        self.state = ROUND_OVER
+        self.state_time = 0.0
+
+    def draw(self):
+        screen = self.screen
+        if self.state == GAME_OVER_SCREEN:
+            draw_game_over_screen(screen, self.winner)
+            return
+        # 背景和道具来自缓存的静态图层 (只有镜头内的块)
+        camera = self.camera
+        self.static_layer.draw(screen, camera)
+        screen.blit(self.seeker.image, self.seeker.rect.move(camera.topleft))
+        for marker in self.markers:
+            screen.blit(marker.image, marker.rect.move(camera.topleft))
 
+        # 绘制UI
+        draw_text(screen, f"Ammo: {self.ammo}", 30, 10, 10, BLACK)
+        draw_text(screen, f"Time: {int(self.time_left)}", 30, 10, 40, BLACK)
+        draw_text(screen, f"Hiders Found: {self.hiders_found} / {NUM_HIDERS}", 30, 10, 70, BLACK)
+
+        # 绘制小地图
+        self.minimap.draw(screen, self.seeker)
+
+
+# --- 搜捕者控制器 (Seeker Controllers) ---
+# 控制器是一个可调用对象：controller(game) -> (移动方向 (dx, dy), 射击的世界坐标或 None)
+# 可选的 reset(game) 在每回合开始时调用
+
+def keyboard_move():
+    keystate = pygame.key.get_pressed()
+    dx, dy = 0, 0
+    if keystate[pygame.K_a]: dx = -1
+    if keystate[pygame.K_d]: dx = 1
+    if keystate[pygame.K_w]: dy = -1
+    if keystate[pygame.K_s]: dy = 1
+    return dx, dy
+
+class RandomSeeker:
+    """随机游走，每隔一段时间向镜头内随机一个道具开枪"""
+    def __init__(self, seed=None, turn_interval=30, shot_interval=SCRIPTED_SHOT_INTERVAL):
+        self.rng = random.Random(seed)
+        self.turn_interval = turn_interval
+        self.shot_interval = shot_interval
+
+    def reset(self, game):
+        self.frame = 0
+        self.move = (0, 0)
+
+    def __call__(self, game):
+        self.frame += 1
+        if self.frame % self.turn_interval == 1:
+            self.move = (self.rng.randint(-1, 1), self.rng.randint(-1, 1))
+        target = None
+        if self.frame % self.shot_interval == 0:
+            visible = game.grid.query_rect(game.view_rect())
+            if visible:
+                target = self.rng.choice(visible).rect.center
+        return self.move, target
+
+class GreedySeeker:
+    """走向最近的没打过的道具，道具进入镜头后就开枪 (每个道具只打一次)"""
+    def __init__(self, seed=None, shot_interval=SCRIPTED_SHOT_INTERVAL):
+        self.rng = random.Random(seed)
+        self.shot_interval = shot_interval
+
+    def reset(self, game):
+        # 随机的访问顺序打破距离相同时的平局，不然每回合都走同一条路线
+        self.tie_break = {prop: self.rng.random() for prop in game.props}
+        self.shot = set()
+        self.cooldown = 0
+
+    def __call__(self, game):
+        self.cooldown -= 1
+        seeker = game.seeker.rect
+        if self.cooldown <= 0:
+            visible = [prop for prop in game.grid.query_rect(game.view_rect()) if prop not in self.shot]
+            if visible:
+                prop = min(visible, key=lambda p: (self._distance(seeker, p), self.tie_break[p]))
+                self.shot.add(prop)
+                self.cooldown = self.shot_interval
+                return (0, 0), prop.rect.center
+        candidates = [prop for prop in game.props_group if prop not in self.shot]
+        if not candidates:
+            return (0, 0), None
+        goal = min(candidates, key=lambda p: (self._distance(seeker, p), self.tie_break[p])).rect.center
+        return (_sign(goal[0] - seeker.centerx), _sign(goal[1] - seeker.centery)), None
+
+    @staticmethod
+    def _distance(rect, prop):
+        return abs(prop.rect.centerx - rect.centerx) + abs(prop.rect.centery - rect.centery)
+
+def _sign(v, dead_zone=SEEKER_SPEED):
+    return 0 if abs(v) < dead_zone else (1 if v > 0 else -1)
+
+SEEKER_CONTROLLERS = {
+    'random': RandomSeeker,
+    'greedy': GreedySeeker,
+}
+
+def make_controller(name, seed=None):
+    """内置控制器的名字，或者 'module:callable' 形式的策略 (callable(seed) 返回控制器)"""
+    if name in SEEKER_CONTROLLERS:
+        return SEEKER_CONTROLLERS[name](seed=seed)
+    if ':' not in name:
+        raise ValueError(f"unknown seeker '{name}', expected one of {sorted(SEEKER_CONTROLLERS)} or module:callable")
+    module_name, attr = name.split(':', 1)
+    return getattr(importlib.import_module(module_name), attr)(seed=seed)
 
-# --- 主游戏循环 (Main Game Loop) ---
 
 # --- 主游戏循环 (Main Game Loop) ---
 
-def game_loop():
-    # 初始化精灵组
-    all_sprites = pygame.sprite.Group()
-    props_group = pygame.sprite.Group()
-    hiders_group = pygame.sprite.Group()
-
-    # 从布局中选择一些道具作为躲藏者
-    hider_choices = random.sample(LEVEL_LAYOUT, NUM_HIDERS)
-    
-    # 创建所有道具
-    for prop_type, pos in LEVEL_LAYOUT:
-        is_hider = (prop_type, pos) in hider_choices
-        prop = Prop(prop_type, pos, is_hider=is_hider)
-        props_group.add(prop)
-        all_sprites.add(prop)
-        if is_hider:
-            hiders_group.add(prop)
-    
-    # 创建搜捕者
-    seeker = Seeker(MAP_WIDTH / 2, MAP_HEIGHT / 2)
-    all_sprites.add(seeker)
-
-    # 游戏变量
-    ammo = STARTING_AMMO
-    hiders_found = 0
-    start_time = pygame.time.get_ticks()
-    game_over = False
-    winner = None # 初始化winner变量
-
-    # ↓↓↓ --- 代码修正之处 --- ↓↓↓
-    # 在循环开始前，先对camera进行一次初始化
-    camera = create_camera(seeker.rect)
-    # ↑↑↑ -------------------- ↑↑↑
-
-    running = True
-    while running:
+def game_loop(screen, clock, level=None):
+    """交互模式：键盘移动、鼠标射击，回合结束后按 R 再来一局，按 Q 退出"""
+    game = HideAndSeekGame(level, screen)
+    while True:
+        # 上一帧的耗时就是这一帧的游戏时间 (拖动窗口等卡顿时最多算 MAX_FRAME_TIME)
+        dt = min(clock.tick(FPS) / 1000, MAX_FRAME_TIME)
+
         # 1. 事件处理
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
-                running = False
-                pygame.quit()
-                sys.exit()
-
-            if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1 and ammo > 0 and not game_over:
-                ammo -= 1
+                return
+            if game.state == PLAYING and event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
                 # 将屏幕坐标转换为世界坐标
-                screen_pos = pygame.mouse.get_pos()
-                world_pos_x = screen_pos[0] - camera.x
-                world_pos_y = screen_pos[1] - camera.y
-                
-                all_sprites.add(HitMarker((world_pos_x, world_pos_y)))
-
-                # 检查是否击中
-                for hider in hiders_group:
-                    if hider.rect.collidepoint(world_pos_x, world_pos_y):
-                        hider.kill() # 从所有组中移除
-                        hiders_group.remove(hider)
-                        hiders_found += 1
-                        print("Hit a hider!")
-                        break # 一次射击最多击中一个
+                screen_x, screen_y = event.pos
+                game.shoot(screen_x - game.camera.x, screen_y - game.camera.y)
+            if game.state == GAME_OVER_SCREEN and event.type == pygame.KEYUP:
+                if event.key == pygame.K_r:
+                    game.new_round() # 重新开始游戏
+                if event.key == pygame.K_q:
+                    return
 
         # 2. 逻辑更新
-        if not game_over:
-            all_sprites.update()
-            # 在每一帧都更新镜头位置
-            camera = create_camera(seeker.rect)
-
-            # 检查胜利/失败条件
-            time_left = GAME_TIME_SECONDS - (pygame.time.get_ticks() - start_time) / 1000
-            if hiders_found == NUM_HIDERS:
-                game_over = True
-                winner = "Seeker"
-            elif time_left <= 0 or ammo <= 0:
-                if hiders_found < NUM_HIDERS:
-                    game_over = True
-                    winner = "Hiders"
-                else: # 恰好在最后一秒或最后一发子弹找到所有人
-                    game_over = True
-                    winner = "Seeker"
-
+        game.update(dt, keyboard_move())
 
         # 3. 绘制
-        screen.fill(WHITE) # 背景
-
-        # 绘制所有在镜头内的精灵
-        for sprite in props_group:
-            screen.blit(sprite.image, sprite.rect.move(camera.topleft))
-        screen.blit(seeker.image, seeker.rect.move(camera.topleft))
-        for sprite in all_sprites:
-             if isinstance(sprite, HitMarker):
-                 screen.blit(sprite.image, sprite.rect.move(camera.topleft))
-
-        # 绘制UI
-        draw_text(screen, f"Ammo: {ammo}", 30, 10, 10, BLACK)
-        draw_text(screen, f"Time: {int(time_left) if time_left > 0 else 0}", 30, 10, 40, BLACK)
-        draw_text(screen, f"Hiders Found: {hiders_found} / {NUM_HIDERS}", 30, 10, 70, BLACK)
-        
-        # 绘制小地图
-        draw_minimap(screen, seeker, props_group)
-
-        if game_over:
-            # 在显示结束画面之前，最后再绘制一次游戏状态
-            pygame.display.flip() 
-            pygame.time.wait(1000) # 短暂等待，让玩家看到最后一击
-            show_game_over_screen(winner)
-            game_loop() # 重新开始游戏
-
+        game.draw()
         pygame.display.flip()
 
-        clock.tick(FPS)
+def run_headless(rounds, seeker='greedy', level=None, seed=None, progress_every=0):
+    """不开窗口、不绘制，用脚本/策略控制的搜捕者连续玩 rounds 回合，返回统计结果
+
+    游戏时间固定按 1/FPS 前进，回合结束时直接开始下一回合 (跳过结束画面)。
+    """
+    controller = make_controller(seeker, seed) if isinstance(seeker, str) else seeker
+    game = HideAndSeekGame(level, screen=None, seed=seed)
+    dt = 1 / FPS
+    seeker_wins = hiders_found = ammo_used = 0
+    round_time = 0.0
+    rss_start = _max_rss_mb()
+    start = time.perf_counter()
+
+    for played in range(1, rounds + 1):
+        if hasattr(controller, 'reset'):
+            controller.reset(game)
+        while game.state == PLAYING:
+            move, target = controller(game)
+            if target is not None:
+                game.shoot(*target)
+            game.update(dt, move)
+        seeker_wins += game.winner == "Seeker"
+        hiders_found += game.hiders_found
+        ammo_used += STARTING_AMMO - game.ammo
+        round_time += game.elapsed
+        if progress_every and played % progress_every == 0:
+            print(f"Round {played}: seeker win rate {seeker_wins / played:.3f}, max RSS {_max_rss_mb():.1f} MB")
+        game.new_round()
+
+    elapsed = time.perf_counter() - start
+    return {
+        'rounds': rounds,
+        'seeker': seeker if isinstance(seeker, str) else type(seeker).__name__,
+        'seeker_win_rate': seeker_wins / rounds,
+        'hider_win_rate': 1 - seeker_wins / rounds,
+        'avg_hiders_found': hiders_found / rounds,
+        'avg_ammo_used': ammo_used / rounds,
+        'avg_round_seconds': round_time / rounds,
+        'rounds_per_sec': rounds / elapsed,
+        'max_rss_mb_start': rss_start,
+        'max_rss_mb_end': _max_rss_mb(),
+    }
+
+def _max_rss_mb():
+    try:
+        import resource
+    except ImportError: # Windows
+        return float('nan')
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
 
-    pygame.quit()
-    sys.exit()
 # --- 主程序入口 ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='2D Hide and Seek')
+    parser.add_argument('--headless', action='store_true', help='play rounds without a window and report win rates')
+    parser.add_argument('--rounds', type=int, default=1000)
+    parser.add_argument('--seeker', default='greedy',
+                        help=f"seeker controller for --headless: {', '.join(SEEKER_CONTROLLERS)} or module:callable")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--progress', type=int, default=0, metavar='N', help='print stats every N rounds')
+    parser.add_argument('--json', action='store_true', help='print the headless report as JSON')
+    args = parser.parse_args()
+
+    if args.headless:
+        # 不需要显示和声音设备，也可以在服务器上运行
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+        report = run_headless(args.rounds, args.seeker, seed=args.seed, progress_every=args.progress)
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            for key, value in report.items():
+                print(f"{key:>20}: {value:.4f}" if isinstance(value, float) else f"{key:>20}: {value}")
+        sys.exit(0)
+
     pygame.init()
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
     pygame.display.set_caption("Advanced 2D Hide and Seek")
     clock = pygame.time.Clock()
-    game_loop()
\ No newline at end of file
+    game_loop(screen, clock)
+    pygame.quit()
+    sys.exit()
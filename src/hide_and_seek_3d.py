@@ -1,45 +1,34 @@
+import math
 import random
 import time
+
+import numpy as np
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
 # 1. 导入光照
 from ursina.lights import DirectionalLight
+from panda3d.core import Point2, Point3
+
+from level import default_level
+from ray_kernel import BVH
+from scene_batch import build_level_entities, scene_stats
+from numpy_policy import NumpyActorCritic
+from spatial_index import NearestPropIndex
+from visibility import sample_hider_groups, visibility_field
+from sim_core import SIM_DT, SEEKER_SPEED, SEEKER_TURN_SPEED, FIRE_RANGE, EYE_HEIGHT, NUM_NEAREST
 
 # --- 游戏设置 (与之前相同) ---
 STARTING_AMMO = 8
 GAME_TIME_SECONDS = 90
 NUM_HIDERS = 5
-
-# --- 道具与关卡定义 (已更新) ---
-PROP_TYPES = {
-    'desk': {'model': 'cube', 'scale': (4, 1, 2), 'color': color.brown},
-    'chair': {'model': 'cube', 'scale': (1, 2, 1), 'color': color.black},
-    # 4. 更新盆栽，让它由圆柱体组成
-    'plant_pot': {'model': 'cylinder', 'scale': (1.5, 0.8, 1.5), 'color': color.orange},
-    'plant_leaves': {'model': 'cylinder', 'scale': (1.2, 2.5, 1.2), 'color': color.green},
-    'monitor': {'model': 'cube', 'scale': (1.5, 1, 0.2), 'color': color.dark_gray},
-    # 3. 新增隔断墙
-    'partition': {'model': 'cube', 'scale': (0.2, 4, 8), 'color': color.rgba(200, 200, 200, 200)},
-}
-
-# 3. 全新设计的“办公室”布局
-LEVEL_LAYOUT = [
-    # 办公区1 (左侧)
-    ('desk', (-12, 0, 10)), ('monitor', (-12, 0.5, 10)), ('chair', (-12, 0, 8)),
-    ('desk', (-12, 0, 0)), ('monitor', (-12, 0.5, 0)), ('chair', (-12, 0, -2)),
-    ('desk', (-12, 0, -10)), ('monitor', (-12, 0.5, -10)), ('chair', (-12, 0, -12)),
-    ('partition', (-8, 0, 5)), # 隔断
-
-    # 办公区2 (右侧)
-    ('desk', (12, 0, 10)), ('monitor', (12, 0.5, 10)), ('chair', (12, 0, 8)),
-    ('desk', (12, 0, 0)), ('monitor', (12, 0.5, 0)), ('chair', (12, 0, -2)),
-    ('desk', (12, 0, -10)), ('monitor', (12, 0.5, -10)), ('chair', (12, 0, -12)),
-    ('partition', (8, 0, 5)), # 隔断
-    
-    # 中央装饰区
-    ('plant_pot', (0, 0, 0)),
-    ('plant_pot', (0, 0, 5)),
-]
+# 不是躲藏者的道具按区域合并成少量静态网格 (scene_batch.py)，道具很多的关卡也能保持帧率
+FLATTEN_STATIC_PROPS = True
+PRINT_SCENE_STATS = False
+# 训练好的搜捕者策略 (python src/numpy_policy.py checkpoints/ppo_best.pth --out seeker_policy.npz 导出)，
+# 设置后由 AI 控制搜捕者开枪，玩家只能观战；只用 NumPy 推理，不需要导入 torch
+SEEKER_POLICY = None
+# 不为 None 时躲藏者优先选看不见的位置 (visibility.py 的暴露度，权重 exp(-暴露度 / 温度))，越小越集中在最隐蔽的位置
+HIDER_VISIBILITY_TEMPERATURE = None
 
 # --- 道具类 (与之前相同) ---
 class Prop(Entity):
@@ -75,28 +64,44 @@ sky = Sky()
 light = DirectionalLight(y=10, z=5, shadows=True, rotation=(30, -45, 0))
 
 # --- 道具和躲藏者创建 ---
+# 道具来自编译好的关卡 (level.py)：盆栽的盆和叶子属于同一个条目 (group)，算一个躲藏者
+level = default_level()
 all_entities = [ground, wall_1, wall_2, wall_3, wall_4]
-hider_choices = random.sample(LEVEL_LAYOUT, NUM_HIDERS)
-
-for prop_type, pos in LEVEL_LAYOUT:
-    prop_info = PROP_TYPES[prop_type]
-    
-    # 4. 特殊处理复合道具“盆栽”
-    if prop_type == 'plant_pot':
-        pot = Prop(model=prop_info['model'], scale=prop_info['scale'], color=prop_info['color'], position=pos)
-        leaves_info = PROP_TYPES['plant_leaves']
-        leaves = Prop(model=leaves_info['model'], scale=leaves_info['scale'], color=leaves_info['color'], position=pos+(0, prop_info['scale'][1], 0))
-        # 决定盆栽是否是躲藏者 (锅和叶子算一体)
-        is_hider = (prop_type, pos) in hider_choices
-        pot.is_hider = is_hider
-        leaves.is_hider = is_hider
-        all_entities.extend([pot, leaves])
+if HIDER_VISIBILITY_TEMPERATURE is None:
+    hider_groups = set(random.sample(level.hider_groups.tolist(), NUM_HIDERS))
+else:
+    weights = visibility_field(level).hider_weights(HIDER_VISIBILITY_TEMPERATURE)
+    hider_groups = set(sample_hider_groups(level.hider_groups, NUM_HIDERS, weights).tolist())
+
+# 躲藏者要能单独变色，保持为独立的 Prop；其他道具合并后 props 中对应的位置是 None
+is_hider = np.isin(level.group, list(hider_groups))
+props, static_nodes = build_level_entities(level, Prop, individual=is_hider, flatten=FLATTEN_STATIC_PROPS)
+for i, entity in enumerate(props):
+    if entity is not None:
+        entity.is_hider = bool(is_hider[i])
+all_entities.extend(entity for entity in props if entity is not None)
+all_entities.extend(static_nodes)
+if PRINT_SCENE_STATS:
+    print(f"DEBUG: scene {scene_stats()}")
+
+# 射击只在点击时做拾取：关掉 Ursina 每帧对所有碰撞体的鼠标射线检测 (mouse.hovered_entity)，
+# 改为用关卡包围盒建的 BVH 求交，耗时与道具数量基本无关。墙和地面不在树里 (它们没有碰撞体，原来也不挡射击)。
+# (只设 traverse_target = None 时 Mouse.update 每帧还会遍历所有实体取消 hover，所以整段跳过)
+mouse.traverse_target = None
+mouse.update_step = math.inf
+prop_bvh = BVH(level.lo, level.hi)
+
+def pick_prop():
+    """准星 (鼠标锁定时是屏幕中心) 方向上最近的道具；没打中或打中的是合并掉的静态道具时返回 None"""
+    if mouse.locked:
+        origin, direction = camera.world_position, camera.forward
     else:
-        # 普通道具
-        entity = Prop(model=prop_info['model'], scale=prop_info['scale'], color=prop_info['color'], position=pos)
-        if prop_type == 'monitor': entity.y += 0.5
-        entity.is_hider = (prop_type, pos) in hider_choices
-        all_entities.append(entity)
+        near, far = Point3(), Point3()
+        camera.lens.extrude(Point2(mouse.x * 2 / window.aspect_ratio, mouse.y * 2), near, far)
+        origin = scene.get_relative_point(camera, near)
+        direction = scene.get_relative_point(camera, far) - origin
+    i, _ = prop_bvh.raycast(tuple(origin), tuple(direction))
+    return props[i] if 0 <= i < level.n_props else None
 
 # 2. 为所有实体启用阴影
 for e in all_entities:
@@ -107,6 +112,47 @@ for e in all_entities:
 player = FirstPersonController(position=(0, 2, -15), origin_y=-0.5)
 player.shadow_caster = True # 玩家自己也产生阴影
 
+# --- AI 搜捕者 (可选) ---
+class PolicySeeker(Entity):
+    """由导出的策略控制的搜捕者，规则与训练环境 (game_env.py) 相同：每 SIM_DT 秒决策一次，
+    观察是自己的位置、朝向和最近 3 个未检查道具的相对位置，开火射程 FIRE_RANGE"""
+    def __init__(self, policy, **kwargs):
+        super().__init__(model='cube', scale=(1, 2, 1), color=color.red, **kwargs)
+        self.policy = policy
+        self.prop_index = NearestPropIndex(level.pos, grid=level.grid)
+        self.accumulator = 0.0
+
+    def observation(self):
+        obs = np.zeros(self.policy.input_dims, dtype=np.float32)
+        obs[:3] = self.x / 20, self.z / 20, self.rotation_y / 360 # 归一化
+        nearest, valid = self.prop_index.nearest([(self.x, self.z)], NUM_NEAREST)
+        rel = self.prop_index.positions[nearest[0]] - (self.x, self.z)
+        obs[3:] = (np.where(valid[0, :, None], rel, 0) / 20).ravel()
+        return obs
+
+    def update(self):
+        if game_state['game_over']: return
+        # 固定步长：渲染帧率不影响 AI 的行为
+        self.accumulator = min(self.accumulator + time.dt, 5 * SIM_DT)
+        while self.accumulator >= SIM_DT:
+            self.accumulator -= SIM_DT
+            self.act(self.policy.act(self.observation()))
+
+    def act(self, action):
+        if action == 0: self.position += self.forward * SEEKER_SPEED * SIM_DT
+        elif action == 1: self.position -= self.forward * SEEKER_SPEED * SIM_DT
+        elif action == 2: self.rotation_y -= SEEKER_TURN_SPEED * SIM_DT
+        elif action == 3: self.rotation_y += SEEKER_TURN_SPEED * SIM_DT
+        elif action == 4 and game_state['ammo'] > 0: # 开火
+            game_state['ammo'] -= 1
+            i, _ = prop_bvh.raycast(tuple(self.world_position + Vec3(0, EYE_HEIGHT, 0)), tuple(self.forward), FIRE_RANGE)
+            if 0 <= i < level.n_props:
+                self.prop_index.mark_checked([0], [i])
+                if props[i] is not None and props[i].get_shot():
+                    game_state['hiders_found'] += 1
+
+seeker_ai = PolicySeeker(NumpyActorCritic.load(SEEKER_POLICY), position=(0, 0.5, -15)) if SEEKER_POLICY else None
+
 # --- 游戏状态和UI (与之前相同) ---
 game_state = {'ammo': STARTING_AMMO, 'hiders_found': 0, 'game_over': False, 'winner': None}
 ammo_text = Text(f"Ammo: {game_state['ammo']}", origin=(-0.5, -0.5), position=(-0.8, -0.4), scale=2)
@@ -143,12 +189,12 @@ def input(key):
         if key == 'q': application.quit()
         return
             
-    if key == 'left mouse down':
+    if key == 'left mouse down' and seeker_ai is None: # AI 搜捕者模式下玩家不能开枪
         if game_state['ammo'] > 0:
             game_state['ammo'] -= 1
-            if mouse.hovered_entity and isinstance(mouse.hovered_entity, Prop):
-                if mouse.hovered_entity.get_shot():
-                    game_state['hiders_found'] += 1
+            target = pick_prop()
+            if target and target.get_shot():
+                game_state['hiders_found'] += 1
 
 # 运行
 app.run()
\ No newline at end of file
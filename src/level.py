@@ -0,0 +1,376 @@
+# level.py
+# 关卡定义、编译和加载
+# 布局 (LEVEL_LAYOUT) 只在这里定义一次；compile_level() 把它展开成扁平的道具数组
+# (复合道具、显示器的高度偏移都在编译时处理)，保存成可以直接 memmap 的二进制文件，
+# 训练环境和游戏都从编译好的关卡开始，加载关卡只是一次文件映射。
+import argparse
+import hashlib
+import json
+import math
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from spatial_index import build_grid
+
+FORMAT_MAGIC = b'HSLEVEL1'
+FORMAT_VERSION = 1
+ALIGN = 64                  # 每个数组在文件中的起始位置按 64 字节对齐
+# 编译结果的缓存目录 (按布局内容的哈希命名)，固定在仓库根目录下，与当前工作目录无关
+LEVEL_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'levels')
+
+# --- 3D 道具类型 ---
+# color: RGBA 0-255；parts: 一个布局条目展开成哪些道具 (类型, 相对位置)，默认就是它自己
+# hider: False 时这种条目不会被选为躲藏者 (默认都可以)
+PROP_TYPES = {
+    'desk': {'model': 'cube', 'scale': (4, 1, 2), 'color': (165, 42, 42, 255)},
+    'chair': {'model': 'cube', 'scale': (1, 2, 1), 'color': (0, 0, 0, 255)},
+    # 盆栽由盆和叶子两个圆柱体组成，算同一个躲藏者
+    'plant_pot': {'model': 'cylinder', 'scale': (1.5, 0.8, 1.5), 'color': (255, 128, 0, 255),
+                  'parts': (('plant_pot', (0, 0, 0)), ('plant_leaves', (0, 0.8, 0)))},
+    'plant_leaves': {'model': 'cylinder', 'scale': (1.2, 2.5, 1.2), 'color': (0, 255, 0, 255)},
+    # 显示器放在桌面上
+    'monitor': {'model': 'cube', 'scale': (1.5, 1, 0.2), 'color': (64, 64, 64, 255),
+                'parts': (('monitor', (0, 0.5, 0)),)},
+    # 隔断墙 (半透明)
+    'partition': {'model': 'cube', 'scale': (0.2, 4, 8), 'color': (200, 200, 200, 200)},
+}
+
+# “办公室”布局: (类型, (x, y, z))
+LEVEL_LAYOUT = [
+    # 办公区1 (左侧)
+    ('desk', (-12, 0, 10)), ('monitor', (-12, 0.5, 10)), ('chair', (-12, 0, 8)),
+    ('desk', (-12, 0, 0)), ('monitor', (-12, 0.5, 0)), ('chair', (-12, 0, -2)),
+    ('desk', (-12, 0, -10)), ('monitor', (-12, 0.5, -10)), ('chair', (-12, 0, -12)),
+    ('partition', (-8, 0, 5)), # 隔断
+
+    # 办公区2 (右侧)
+    ('desk', (12, 0, 10)), ('monitor', (12, 0.5, 10)), ('chair', (12, 0, 8)),
+    ('desk', (12, 0, 0)), ('monitor', (12, 0.5, 0)), ('chair', (12, 0, -2)),
+    ('desk', (12, 0, -10)), ('monitor', (12, 0.5, -10)), ('chair', (12, 0, -12)),
+    ('partition', (8, 0, 5)), # 隔断
+
+    # 中央装饰区
+    ('plant_pot', (0, 0, 0)),
+    ('plant_pot', (0, 0, 5)),
+]
+
+# --- 2D 版本 (hide_and_seek.py) ---
+# 2D 道具是轴对齐的矩形：位置是左上角 (x, y) 像素坐标，编译后放在 xz 平面上 (y 方向高度为 1)
+PROP_TYPES_2D = {
+    'desk': {'model': 'rect', 'size': (150, 60), 'color': (70, 130, 180, 255)},
+    'chair': {'model': 'rect', 'size': (40, 40), 'color': (139, 69, 19, 255)},
+    'plant': {'model': 'rect', 'size': (50, 70), 'color': (0, 100, 0, 255)},
+}
+
+LEVEL_LAYOUT_2D = [
+    # 周围的墙壁/边界
+    ('desk', (0, 0)), ('desk', (150, 0)), ('desk', (300, 0)), ('desk', (450, 0)), ('desk', (600, 0)),
+    ('desk', (750, 0)), ('desk', (900, 0)), ('desk', (1050, 0)), ('desk', (1200, 0)), ('desk', (1350, 0)),
+    ('desk', (0, 1140)), ('desk', (150, 1140)), ('desk', (300, 1140)), ('desk', (450, 1140)), ('desk', (600, 1140)),
+    ('desk', (750, 1140)), ('desk', (900, 1140)), ('desk', (1050, 1140)), ('desk', (1200, 1140)), ('desk', (1350, 1140)),
+    # 内部的办公区
+    ('desk', (200, 200)), ('chair', (250, 270)),
+    ('desk', (200, 400)), ('chair', (250, 350)), ('plant', (140, 380)),
+    ('desk', (600, 300)), ('chair', (600, 250)),
+    ('desk', (600, 500)), ('chair', (600, 570)),
+    ('desk', (1000, 200)), ('chair', (950, 220)),
+    ('desk', (1000, 600)), ('chair', (1050, 550)), ('plant', (1150, 620)),
+    ('desk', (1200, 800)), ('chair', (1250, 870)),
+    ('plant', (50, 800)), ('plant', (1400, 100)),
+]
+
+# 模型的包围盒，以 scale 为单位、相对于道具位置 (与 Ursina 的 collider='box' 一致)
+MODEL_BOUNDS = {
+    'cube': ((-0.5, -0.5, -0.5), (0.5, 0.5, 0.5)),   # 以原点为中心
+    'cylinder': ((-0.5, 0, -0.5), (0.5, 1, 0.5)),    # Ursina 的圆柱体从 y=0 长到 y=1
+    'rect': ((0, 0, 0), (1, 1, 1)),                  # 2D 矩形，位置是左上角
+}
+
+
+class Level:
+    """编译好的关卡
+
+    道具数组 (P 个道具，顺序就是各个游戏创建实体的顺序):
+        pos/lo/hi/scale (P,3)  位置、碰撞盒 AABB、缩放
+        kind (P,)   道具类型编号 (type_names 的下标)
+        color (P,4) RGBA 0-255
+        group (P,)  所属的布局条目编号 (盆栽的盆和叶子共用一个)
+    布局条目 (G 个): entry_kind (G,), entry_pos (G,3)
+    hider_groups: 可以被选为躲藏者的条目编号
+    grid_*: 最近道具查询的网格 (spatial_index.build_grid)
+    """
+    def __init__(self, arrays, meta, path=None):
+        self.arrays = arrays
+        self.meta = meta
+        self.path = path
+        for name, array in arrays.items():
+            setattr(self, name, array)
+        self.name = meta['name']
+        self.type_names = meta['type_names']
+        self.type_models = meta['type_models']
+        self.hash = meta['hash']
+
+    @property
+    def n_props(self):
+        return len(self.pos)
+
+    @property
+    def n_groups(self):
+        return len(self.entry_kind)
+
+    @property
+    def grid(self):
+        """NearestPropIndex(grid=...) 使用的预先构建好的网格"""
+        return {'origin': self.grid_origin, 'cell_size': self.meta['grid_cell_size'], 'shape': self.grid_shape,
+                'cell_props': self.grid_cell_props, 'prop_cell': self.grid_prop_cell}
+
+    def kind_name(self, i):
+        return self.type_names[self.kind[i]]
+
+    def model(self, i):
+        return self.type_models[self.kind[i]]
+
+    def layout(self):
+        """还原成 [(类型, 位置), ...] 形式的布局"""
+        return [(self.type_names[k], tuple(p)) for k, p in zip(self.entry_kind.tolist(), self.entry_pos.tolist())]
+
+    def __reduce__(self):
+        # 传给子进程时只传文件路径，由子进程自己 memmap
+        if self.path is not None:
+            return load_level, (self.path,)
+        return Level, ({name: np.array(a) for name, a in self.arrays.items()}, self.meta)
+
+    def __repr__(self):
+        return f'Level({self.name!r}, props={self.n_props}, groups={self.n_groups}, hash={self.hash})'
+
+
+def compile_level(layout, prop_types=PROP_TYPES, name=''):
+    """把 [(类型, 位置), ...] 布局编译成 Level
+
+    2D 布局的位置是 (x, y)，编译到 xz 平面上；2D 道具类型用 size 代替 scale。
+    """
+    type_names = list(prop_types)
+    type_id = {n: i for i, n in enumerate(type_names)}
+    type_models = [prop_types[n]['model'] for n in type_names]
+    type_scale = np.array([_scale3(prop_types[n]) for n in type_names], dtype=np.float64).reshape(-1, 3)
+    type_color = np.array([prop_types[n]['color'] for n in type_names], dtype=np.uint8).reshape(-1, 4)
+    type_hider = np.array([prop_types[n].get('hider', True) for n in type_names], dtype=bool)
+    bounds = np.array([MODEL_BOUNDS[m] for m in type_models], dtype=np.float64).reshape(-1, 2, 3)
+
+    entry_kind = np.array([type_id[kind] for kind, _ in layout], dtype=np.int16)
+    entry_pos = np.array([_pos3(p) for _, p in layout], dtype=np.float64).reshape(-1, 3)
+
+    # 按类型展开复合道具，再按 (条目, 部件) 排回布局顺序
+    entry_idx, part_idx, kinds, offsets = [], [], [], []
+    for t, type_name in enumerate(type_names):
+        entries = np.flatnonzero(entry_kind == t)
+        if not len(entries):
+            continue
+        for j, (part, offset) in enumerate(prop_types[type_name].get('parts', ((type_name, (0, 0, 0)),))):
+            entry_idx.append(entries)
+            part_idx.append(np.full(len(entries), j))
+            kinds.append(np.full(len(entries), type_id[part], dtype=np.int16))
+            offsets.append(np.broadcast_to(np.asarray(offset, dtype=np.float64), (len(entries), 3)))
+    if entry_idx:
+        entry_idx, part_idx = np.concatenate(entry_idx), np.concatenate(part_idx)
+        order = np.lexsort((part_idx, entry_idx))
+        group = entry_idx[order].astype(np.int32)
+        kind = np.concatenate(kinds)[order]
+        pos = entry_pos[group] + np.concatenate(offsets)[order]
+    else:
+        group = np.zeros(0, dtype=np.int32)
+        kind = np.zeros(0, dtype=np.int16)
+        pos = np.zeros((0, 3))
+    scale = type_scale[kind]
+    lo = pos + scale * bounds[kind, 0]
+    hi = pos + scale * bounds[kind, 1]
+
+    grid = build_grid(pos[:, [0, 2]])
+    arrays = {
+        'pos': pos, 'lo': lo, 'hi': hi, 'scale': scale, 'kind': kind, 'color': type_color[kind], 'group': group,
+        'entry_kind': entry_kind, 'entry_pos': entry_pos,
+        'hider_groups': np.flatnonzero(type_hider[entry_kind]).astype(np.int32),
+        'grid_origin': grid['origin'], 'grid_shape': grid['shape'],
+        'grid_cell_props': grid['cell_props'], 'grid_prop_cell': grid['prop_cell'],
+    }
+    meta = {'name': name, 'type_names': type_names, 'type_models': type_models, 'grid_cell_size': grid['cell_size']}
+    meta['hash'] = _content_hash(arrays, meta)
+    return Level(arrays, meta)
+
+
+def _scale3(info):
+    if 'size' in info: # 2D 矩形 (宽, 高) -> xz 平面
+        w, h = info['size']
+        return (w, 1, h)
+    return info['scale']
+
+
+def _pos3(p):
+    return (p[0], 0, p[1]) if len(p) == 2 else tuple(p)
+
+
+def _content_hash(arrays, meta):
+    h = hashlib.sha1(json.dumps(meta, sort_keys=True).encode())
+    for name in sorted(arrays):
+        a = np.ascontiguousarray(arrays[name])
+        h.update(f'{name}:{a.dtype.str}:{a.shape}'.encode())
+        h.update(a.tobytes())
+    return h.hexdigest()[:16]
+
+
+def _aligned(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def save_level(level, path):
+    """写成 [magic][header 长度][JSON header][对齐的数组数据]
+
+    先写到同一目录下唯一命名的临时文件再 os.replace，多个进程同时编译同一个关卡时互不干扰。
+    """
+    arrays = {name: np.ascontiguousarray(a) for name, a in level.arrays.items()}
+    index, offset = {}, 0
+    for name, a in arrays.items():
+        index[name] = {'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': offset}
+        offset = _aligned(offset + a.nbytes)
+    header = json.dumps({'version': FORMAT_VERSION, 'meta': level.meta, 'arrays': index}).encode()
+    data_start = _aligned(len(FORMAT_MAGIC) + 8 + len(header))
+
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=os.path.dirname(os.path.abspath(path)))
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(FORMAT_MAGIC)
+            f.write(len(header).to_bytes(8, 'little'))
+            f.write(header)
+            for name, a in arrays.items():
+                f.seek(data_start + index[name]['offset'])
+                f.write(a.tobytes())
+            f.truncate(data_start + offset)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return path
+
+
+def load_level(path):
+    """memmap 方式读取编译好的关卡 (只读，数组直接指向文件映射)"""
+    with open(path, 'rb') as f:
+        if f.read(len(FORMAT_MAGIC)) != FORMAT_MAGIC:
+            raise ValueError(f'{path} is not a compiled level file')
+        header_len = int.from_bytes(f.read(8), 'little')
+        header = json.loads(f.read(header_len))
+    if header['version'] != FORMAT_VERSION:
+        raise ValueError(f'{path}: unsupported level format version {header["version"]}')
+    data_start = _aligned(len(FORMAT_MAGIC) + 8 + header_len)
+    size = os.path.getsize(path) - data_start
+    data = np.memmap(path, dtype=np.uint8, mode='r', offset=data_start) if size > 0 else np.zeros(0, dtype=np.uint8)
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype = np.dtype(spec['dtype'])
+        count = math.prod(spec['shape'])
+        start = spec['offset']
+        arrays[name] = data[start:start + count * dtype.itemsize].view(dtype).reshape(spec['shape'])
+    return Level(arrays, header['meta'], path=path)
+
+
+def cached_level(layout, prop_types=PROP_TYPES, name='level', cache_dir=LEVEL_CACHE_DIR):
+    """编译并缓存到 cache_dir (文件名包含布局内容的哈希)，之后直接 memmap 读取"""
+    key = hashlib.sha1(repr((FORMAT_VERSION, [(k, tuple(p)) for k, p in layout], prop_types)).encode()).hexdigest()[:16]
+    path = os.path.join(cache_dir, f'{name}_{key}.level')
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        save_level(compile_level(layout, prop_types, name), path)
+    return load_level(path)
+
+
+def as_level(level):
+    """None -> 默认关卡；字符串 -> 编译好的关卡文件路径；Level 原样返回"""
+    if level is None:
+        return default_level()
+    if isinstance(level, (str, os.PathLike)):
+        return load_level(level)
+    return level
+
+
+def default_level():
+    """3D 游戏和训练环境使用的办公室关卡"""
+    return cached_level(LEVEL_LAYOUT, PROP_TYPES, 'office')
+
+
+def default_level_2d():
+    return cached_level(LEVEL_LAYOUT_2D, PROP_TYPES_2D, 'office_2d')
+
+
+# --- 大关卡生成器 (用于性能/规模测试) ---
+ROOM_SIZE = 40              # 每个房间和默认关卡一样大 (40×40)
+DESK_COLUMNS = (-14, -7, 7, 14)
+DESK_ROWS = (10, 0, -10)
+
+
+def generate_office_layout(n_props, seed=None):
+    """生成恰好有 n_props 个道具的办公室布局 (相同 seed 得到相同布局)
+
+    关卡由一排排房间组成，每个房间里有若干列工位 (桌子 + 显示器 + 椅子)、隔断和盆栽。
+    """
+    rng = np.random.default_rng(seed)
+    rooms_per_row = max(1, math.ceil(math.sqrt(n_props / 27))) # 每个房间平均约 27 个道具
+    layout, count, room = [], 0, 0
+
+    def add(kind, pos):
+        nonlocal count
+        size = len(PROP_TYPES[kind].get('parts', ((kind, None),)))
+        if count + size > n_props: # 最后只差一个道具时用椅子代替盆栽
+            kind, size = 'chair', 1
+        layout.append((kind, tuple(round(float(v), 2) for v in pos)))
+        count += size
+
+    while count < n_props:
+        cx = (room % rooms_per_row - (rooms_per_row - 1) / 2) * ROOM_SIZE
+        cz = (room // rooms_per_row) * ROOM_SIZE
+        room += 1
+        entries = []
+        for x in rng.choice(DESK_COLUMNS, size=rng.integers(2, len(DESK_COLUMNS) + 1), replace=False):
+            for z in DESK_ROWS:
+                if rng.random() < 0.8:
+                    dx, dz = rng.uniform(-0.5, 0.5, 2)
+                    x0, z0 = cx + x + dx, cz + z + dz
+                    entries += [('desk', (x0, 0, z0)), ('monitor', (x0, 0.5, z0)), ('chair', (x0, 0, z0 - 2))]
+        for _ in range(rng.integers(0, 3)):
+            entries.append(('partition', (cx + rng.choice((-10, 10)), 0, cz + rng.uniform(-5, 5))))
+        for _ in range(rng.integers(1, 4)):
+            entries.append(('plant_pot', (cx + rng.uniform(-3, 3), 0, cz + rng.uniform(-15, 15))))
+        for kind, pos in entries:
+            if count >= n_props:
+                break
+            add(kind, pos)
+    return layout
+
+
+def generate_office_level(n_props, seed=None):
+    return compile_level(generate_office_layout(n_props, seed), PROP_TYPES, f'office_{n_props}_{seed}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile or generate hide & seek levels')
+    parser.add_argument('--props', type=int, help='generate an office level with this many props')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', help='output .level path (default: compile the built-in office level)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    level = generate_office_level(args.props, args.seed) if args.props else compile_level(LEVEL_LAYOUT, PROP_TYPES, 'office')
+    print(f'--- Compiled {level} in {time.perf_counter() - start:.3f}s ---')
+    path = args.out or os.path.join(LEVEL_CACHE_DIR, f'{level.name}.level')
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    save_level(level, path)
+    start = time.perf_counter()
+    level = load_level(path)
+    print(f'--- Saved to {path} ({os.path.getsize(path) / 1e6:.2f} MB), loaded in {(time.perf_counter() - start) * 1000:.2f} ms ---')
+
+
+if __name__ == '__main__':
+    main()
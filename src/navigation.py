@@ -0,0 +1,536 @@
+# navigation.py
+# 占用栅格寻路 (occupancy grid)：道具的 AABB 按搜捕者半径膨胀后投影到地面格子上，
+# 在 8 邻接 (不切角) 的格子上做 A* / JPS，路径按 (起点格, 终点格) 缓存，关卡哈希变化时只丢掉受影响的路径。
+# ScriptedSeeker 在它上面实现“走到最近的未检查道具旁边开枪”的脚本搜捕者，作为基线和示范数据的来源。
+#
+#   python src/navigation.py [--props 1000] [--cell-size 0.5] [--episodes 200]
+import argparse
+import heapq
+import math
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from level import as_level, generate_office_level
+from ray_kernel import raycast_aabbs
+from sim_core import EYE_HEIGHT, FIRE_RANGE, SEEKER_START, SEEKER_TURN_SPEED, SIM_DT
+
+CELL_SIZE = 0.5
+SEEKER_RADIUS = 0.5         # 道具的占地范围向外膨胀这么多，路径和道具保持距离
+BOUNDS_MARGIN = 2.0         # 默认地面范围 = 道具和出生点的 xz 范围向外扩 2 个单位
+PATH_CACHE_SIZE = 4096
+SQRT2 = math.sqrt(2)
+
+
+class OccupancyGrid:
+    """地面格子的占用情况
+
+    格子 (i, j) 的中心在 origin + (i + 0.5, j + 0.5) * cell_size (x, z)。
+    寻路用四周多一圈“墙”的一维数组 free，格子编号 = (i + 1) * stride + (j + 1)，不需要边界检查。
+    """
+    def __init__(self, level, cell_size=CELL_SIZE, radius=SEEKER_RADIUS, bounds=None):
+        lo, hi = np.asarray(level.lo, dtype=np.float64), np.asarray(level.hi, dtype=np.float64)
+        if bounds is None:
+            start = np.array([SEEKER_START[0], SEEKER_START[2]], dtype=np.float64)
+            extent_lo = lo[:, [0, 2]].min(axis=0) if len(lo) else start
+            extent_hi = hi[:, [0, 2]].max(axis=0) if len(hi) else start
+            bounds = (np.minimum(extent_lo, start) - BOUNDS_MARGIN, np.maximum(extent_hi, start) + BOUNDS_MARGIN)
+        self.level_hash = level.hash
+        self.cell_size = cell_size
+        self.radius = radius
+        self.origin = np.asarray(bounds[0], dtype=np.float64)
+        self.shape = tuple(np.maximum(np.ceil((np.asarray(bounds[1]) - self.origin) / cell_size), 1).astype(int).tolist())
+
+        # 格子中心落在膨胀后的占地范围内就不能走
+        blocked = np.zeros(self.shape, dtype=bool)
+        first = np.ceil((lo[:, [0, 2]] - radius - self.origin) / cell_size - 0.5).astype(np.int64).clip(0, self.shape)
+        last = np.floor((hi[:, [0, 2]] + radius - self.origin) / cell_size - 0.5).astype(np.int64).clip(-1, np.array(self.shape) - 1)
+        for (a, b), (c, d) in zip(first.tolist(), last.tolist()):
+            blocked[a:c + 1, b:d + 1] = True
+        self.blocked = blocked
+
+        self.stride = self.shape[1] + 2
+        padded = np.zeros((self.shape[0] + 2, self.stride), dtype=np.uint8)
+        padded[1:-1, 1:-1] = ~blocked
+        self.free = bytearray(padded.tobytes())
+        self._free_cells = None
+        self._stops = None
+
+    def cell(self, x, z):
+        """世界坐标 (x, z) 所在格子的编号 (超出范围时取最近的边缘格子)"""
+        i = min(max(int((x - self.origin[0]) // self.cell_size), 0), self.shape[0] - 1)
+        j = min(max(int((z - self.origin[1]) // self.cell_size), 0), self.shape[1] - 1)
+        return (i + 1) * self.stride + j + 1
+
+    def position(self, cell):
+        """格子中心的世界坐标 (x, z)"""
+        i, j = divmod(cell, self.stride)
+        return (self.origin[0] + (i - 0.5) * self.cell_size, self.origin[1] + (j - 0.5) * self.cell_size)
+
+    def nearest_free(self, cell):
+        """离 cell 最近的可走格子 (cell 本身可走时原样返回)"""
+        if self.free[cell]:
+            return cell
+        if self._free_cells is None:
+            i, j = np.nonzero(~self.blocked)
+            self._free_cells = np.column_stack([i, j])
+        if not len(self._free_cells):
+            return None
+        i, j = divmod(cell, self.stride)
+        best = np.argmin(((self._free_cells - (i - 1, j - 1)) ** 2).sum(axis=1))
+        return int((self._free_cells[best, 0] + 1) * self.stride + self._free_cells[best, 1] + 1)
+
+    def _neighbors(self, cell):
+        """8 邻接，斜着走要求两个相邻的直线格子都可走 (不切角)"""
+        free, s = self.free, self.stride
+        for d in (1, -1, s, -s):
+            if free[cell + d]:
+                yield cell + d, 1.0
+        for dx in (s, -s):
+            for dz in (1, -1):
+                if free[cell + dx + dz] and free[cell + dx] and free[cell + dz]:
+                    yield cell + dx + dz, SQRT2
+
+    def _octile(self, a, b):
+        dx = abs(a // self.stride - b // self.stride)
+        dz = abs(a % self.stride - b % self.stride)
+        return max(dx, dz) + (SQRT2 - 1) * min(dx, dz)
+
+    def astar(self, start, goal):
+        """A* (octile 启发式)，返回格子编号列表 (包含起点和终点)，走不到时返回 None"""
+        if not (self.free[start] and self.free[goal]):
+            return None
+        g = {start: 0.0}
+        parent = {start: None}
+        heap = [(self._octile(start, goal), 0.0, start)] # f 相同时先展开 g 大的 (离终点近的)
+        closed = set()
+        while heap:
+            _, neg_cost, cell = heapq.heappop(heap)
+            cost = -neg_cost
+            if cell == goal:
+                return _backtrack(parent, goal)
+            if cell in closed:
+                continue
+            closed.add(cell)
+            for nb, step in self._neighbors(cell):
+                new_cost = cost + step
+                if new_cost < g.get(nb, math.inf):
+                    g[nb] = new_cost
+                    parent[nb] = cell
+                    heapq.heappush(heap, (new_cost + self._octile(nb, goal), -new_cost, nb))
+        return None
+
+    def jps(self, start, goal):
+        """Jump Point Search (不切角的 8 邻接版本)，返回的路径和 A* 一样长，只包含拐点"""
+        if not (self.free[start] and self.free[goal]):
+            return None
+        if self._stops is None:
+            self._build_jump_tables()
+        g = {start: 0.0}
+        parent = {start: None}
+        heap = [(self._octile(start, goal), 0.0, start)] # f 相同时先展开 g 大的 (离终点近的)
+        closed = set()
+        while heap:
+            _, neg_cost, cell = heapq.heappop(heap)
+            cost = -neg_cost
+            if cell == goal:
+                return _backtrack(parent, goal)
+            if cell in closed:
+                continue
+            closed.add(cell)
+            for d in self._pruned_directions(cell, parent[cell]):
+                jump = self._jump(cell + d, d, goal)
+                if jump is None:
+                    continue
+                new_cost = cost + self._octile(cell, jump)
+                if new_cost < g.get(jump, math.inf):
+                    g[jump] = new_cost
+                    parent[jump] = cell
+                    heapq.heappush(heap, (new_cost + self._octile(jump, goal), -new_cost, jump))
+        return None
+
+    def _direction(self, a, b):
+        """从 a 到 b 的单步方向 (格子编号的差)"""
+        s = self.stride
+        dx = (b // s > a // s) - (b // s < a // s)
+        dz = (b % s > a % s) - (b % s < a % s)
+        return dx * s + dz
+
+    def _split(self, d):
+        """方向 d 拆成 x 分量 (0 或 ±stride) 和 z 分量 (0 或 ±1)"""
+        dz = (d + 1) % self.stride - 1
+        return d - dz, dz
+
+    def _pruned_directions(self, cell, parent):
+        free, s = self.free, self.stride
+        if parent is None:
+            return [nb - cell for nb, _ in self._neighbors(cell)]
+        d = self._direction(parent, cell)
+        dx, dz = self._split(d)
+        dirs = []
+        if dx and dz:
+            if free[cell + dz]:
+                dirs.append(dz)
+            if free[cell + dx]:
+                dirs.append(dx)
+            if free[cell + dz] and free[cell + dx]:
+                dirs.append(d)
+            return dirs
+        # 直线移动：前方，以及两侧 (两侧被障碍物挡住时出现的强制邻居)
+        sides = (1, -1) if dx else (s, -s)
+        if free[cell + d]:
+            dirs.append(d)
+            dirs.extend(d + o for o in sides if free[cell + o])
+        dirs.extend(o for o in sides if free[cell + o])
+        return dirs
+
+    def _build_jump_tables(self):
+        """JPS+ 式的预计算：每个格子沿四个直线方向走，第一个撞墙或有强制邻居的格子 (直线跳跃变成查表)"""
+        s = self.stride
+        free = np.frombuffer(bytes(self.free), dtype=np.uint8).astype(bool)
+        idx = np.arange(len(free))
+        self._stops = {}
+        for d in (1, -1, s, -s):
+            sides = (s, -s) if abs(d) == 1 else (1, -1)
+            # 外圈都是墙，np.roll 绕回的只会是外圈格子，不影响内部
+            forced = np.zeros_like(free)
+            for o in sides:
+                forced |= np.roll(free, -o) & ~np.roll(free, d - o)
+            stop = ~free | forced
+            # 沿 d 方向的第一个 stop (包括自己)：把格子排成“沿 d 递增”的顺序做累积最小值
+            grid = np.where(stop, idx, -1 if d < 0 else len(free)).reshape(-1, s)
+            if abs(d) == s:
+                grid = grid.T
+            if d > 0:
+                grid = np.minimum.accumulate(grid[:, ::-1], axis=1)[:, ::-1]
+            else:
+                grid = np.maximum.accumulate(grid, axis=1)
+            if abs(d) == s:
+                grid = grid.T
+            self._stops[d] = grid.ravel().tolist()
+
+    def _jump_straight(self, cell, d, goal):
+        stop = self._stops[d][cell]
+        # 终点在 [cell, stop] 这一段上 (abs(d) == 1 时这一段不会跨行)
+        offset, rest = divmod(goal - cell, d)
+        if rest == 0 and 0 <= offset <= (stop - cell) // d and self.free[goal]:
+            return goal
+        return stop if self.free[stop] else None
+
+    def _jump(self, cell, d, goal):
+        """从 cell 沿方向 d 一直跳，返回遇到的第一个跳点 (终点或有强制邻居的格子)，撞墙返回 None"""
+        if abs(d) == 1 or abs(d) == self.stride: # 直线
+            return self._jump_straight(cell, d, goal)
+        free = self.free
+        dx, dz = self._split(d)
+        while free[cell]:
+            if cell == goal:
+                return cell
+            if self._jump_straight(cell + dx, dx, goal) is not None or self._jump_straight(cell + dz, dz, goal) is not None:
+                return cell
+            if not (free[cell + dx] and free[cell + dz]):
+                return None
+            cell += d
+        return None
+
+    def expand(self, path):
+        """把只有拐点的路径展开成相邻格子组成的路径"""
+        cells = [path[0]]
+        for a, b in zip(path, path[1:]):
+            d = self._direction(a, b)
+            while cells[-1] != b:
+                cells.append(cells[-1] + d)
+        return cells
+
+    def path_length(self, path):
+        return sum(self._octile(a, b) for a, b in zip(path, path[1:])) * self.cell_size
+
+
+def _backtrack(parent, cell):
+    path = []
+    while cell is not None:
+        path.append(cell)
+        cell = parent[cell]
+    return path[::-1]
+
+
+class Navigator:
+    """带缓存的寻路：find_path 的结果按 (起点格, 终点格) 缓存 (LRU)，
+    起点落在某条缓存路径上时直接取那条路径的后半段。
+    update_level() 发现关卡哈希变了才重建栅格；栅格范围不变时只丢掉经过新挡住的格子 (及其相邻格子，斜走不切角)
+    的路径，有格子变得可走时再丢掉“走不到”的结果，其余缓存路径仍然可走。
+    """
+    def __init__(self, level, cell_size=CELL_SIZE, radius=SEEKER_RADIUS, method='jps', cache_size=PATH_CACHE_SIZE):
+        self.cell_size = cell_size
+        self.radius = radius
+        self.method = method
+        self.cache_size = cache_size
+        self.hits = self.misses = 0
+        self.grid = None
+        self.update_level(level)
+
+    def update_level(self, level):
+        level = as_level(level)
+        old = self.grid
+        if old is not None and old.level_hash == level.hash:
+            return
+        self.grid = OccupancyGrid(level, self.cell_size, self.radius)
+        if old is None or old.shape != self.grid.shape or not np.array_equal(old.origin, self.grid.origin):
+            self.clear_cache()
+            return
+        self._invalidate(old.blocked, self.grid.blocked)
+
+    def clear_cache(self):
+        self._cache = OrderedDict()   # (start, goal) -> 展开后的路径 (tuple)
+        self._through = {}            # goal -> {格子: (路径, 下标)}
+
+    def _invalidate(self, old_blocked, new_blocked):
+        """栅格范围不变的关卡修改：只丢掉受影响的缓存路径"""
+        added = new_blocked & ~old_blocked
+        freed = (old_blocked & ~new_blocked).any()
+        # 新挡住的格子和它的 8 个相邻格子 (斜着走经过它旁边也不行)
+        near = np.zeros((added.shape[0] + 2, added.shape[1] + 2), dtype=bool)
+        for di in range(3):
+            for dj in range(3):
+                near[di:di + added.shape[0], dj:dj + added.shape[1]] |= added
+        i, j = np.nonzero(near)
+        changed = set((i * self.grid.stride + j).tolist()) # 加了一圈边界，与格子编号一致
+        stale = [key for key, path in self._cache.items()
+                 if (path is None and freed) or (path is not None and not changed.isdisjoint(path))]
+        for key in stale:
+            self._evict(key)
+
+    def _evict(self, key):
+        """删掉一条缓存路径，以及 _through 中指向它的格子 (同一终点的其他路径经过这些格子时改为指向它们)"""
+        path = self._cache.pop(key)
+        goal = key[1]
+        through = self._through.get(goal)
+        if path is None or through is None:
+            return
+        lost = {cell for cell in path if through.get(cell, (None,))[0] is path}
+        for cell in lost:
+            del through[cell]
+        if not through:
+            del self._through[goal]
+            return
+        # 每条缓存路径至少占着自己的起点，所以同一终点的其他路径都能从 through 中找到
+        for other in {id(p): p for p, _ in through.values()}.values():
+            for i, cell in enumerate(other):
+                if cell in lost:
+                    through.setdefault(cell, (other, i))
+
+    def find_path(self, start, goal):
+        """格子编号的路径 (相邻格子，包含起点和终点)；起点/终点不可走时先移到最近的可走格子"""
+        grid = self.grid
+        start, goal = grid.nearest_free(start), grid.nearest_free(goal)
+        if start is None or goal is None:
+            return None
+        key = (start, goal)
+        path = self._cache.get(key)
+        if path is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return path
+        on_path = self._through.get(goal, {}).get(start)
+        if on_path is not None:
+            self.hits += 1
+            cached, i = on_path
+            return cached[i:]
+
+        self.misses += 1
+        path = grid.jps(start, goal) if self.method == 'jps' else grid.astar(start, goal)
+        path = tuple(grid.expand(path)) if path is not None else None
+        self._cache[key] = path
+        if path is not None:
+            through = self._through.setdefault(goal, {})
+            for i, cell in enumerate(path):
+                through.setdefault(cell, (path, i))
+        if len(self._cache) > self.cache_size:
+            self._evict(next(iter(self._cache)))
+        return path
+
+    def waypoints(self, start_xz, goal_xz):
+        """世界坐标 (x, z) 之间的路径，返回格子中心的列表，走不到时返回 None"""
+        grid = self.grid
+        path = self.find_path(grid.cell(*start_xz), grid.cell(*goal_xz))
+        return None if path is None else [grid.position(c) for c in path]
+
+
+class ScriptedSeeker:
+    """脚本搜捕者：沿最短路走到最近的未检查道具附近，对准后开枪
+
+    直接读取 NumpySim 的状态 (搜捕者位置/朝向、已检查的道具)，为每个回合输出一个离散动作
+    (0:前进, 1:后退, 2:左转, 3:右转, 4:开火)。开枪的射线是水平的 (视线高度)，
+    够不到这个高度的道具 (桌子、椅子) 永远打不中，所以不作为目标。
+    """
+    AIM_TOLERANCE = SEEKER_TURN_SPEED * SIM_DT / 2 # 小于半个转向步长就不再转
+    WAYPOINT_DISTANCE = 1.0                        # 朝路径上至少这么远的格子走
+
+    def __init__(self, level, navigator=None, fire_range=FIRE_RANGE):
+        self.level = level
+        self.navigator = navigator or Navigator(level)
+        self.fire_range = fire_range
+        self.eye_y = SEEKER_START[1] + EYE_HEIGHT
+        self.center = (level.lo + level.hi)[:, [0, 2]] / 2
+        self.hittable = (level.lo[:, 1] <= self.eye_y) & (level.hi[:, 1] >= self.eye_y)
+        self.unreachable = None
+
+    def reset(self, num_envs, env_ids=None):
+        if self.unreachable is None or len(self.unreachable) != num_envs:
+            self.unreachable = np.zeros((num_envs, self.level.n_props), dtype=bool)
+        self.unreachable[slice(None) if env_ids is None else env_ids] = False
+
+    def __call__(self, sim):
+        n = sim.num_envs
+        if self.unreachable is None or len(self.unreachable) != n:
+            self.reset(n)
+        lo, hi = self.level.lo, self.level.hi
+        pos = sim.seeker_pos[:, [0, 2]]
+        fwd = sim.forward()
+        eyes = np.column_stack([pos[:, 0], np.full(n, self.eye_y), pos[:, 1]])
+
+        # 目标：最近的、打得到的、还没检查过的道具
+        candidates = self.hittable[None] & ~sim.checked & ~self.unreachable
+        dist = np.linalg.norm(self.center[None] - pos[:, None], axis=2)
+        dist = np.where(candidates, dist, np.inf)
+        target = np.argmin(dist, axis=1)
+        has_target = np.isfinite(dist[np.arange(n), target])
+
+        # 准星正对目标就开枪
+        directions = np.zeros((n, 3))
+        directions[:, [0, 2]] = fwd
+        aim_hit, _ = raycast_aabbs(eyes, directions, lo, hi, self.fire_range)
+        fire = has_target & (aim_hit == target) & (sim.ammo > 0)
+
+        # 在射程内并且没有被挡住：原地转向目标；否则沿路径走
+        to_target = self.center[target] - pos
+        los = np.zeros((n, 3))
+        los[:, [0, 2]] = to_target / np.maximum(np.linalg.norm(to_target, axis=1, keepdims=True), 1e-9)
+        los_hit, _ = raycast_aabbs(eyes, los, lo, hi, self.fire_range)
+        in_view = has_target & (los_hit == target)
+
+        actions = np.zeros(n, dtype=np.int64)
+        for e in range(n):
+            if not has_target[e]:
+                actions[e] = 3 # 没有目标了，原地转圈
+            elif fire[e]:
+                actions[e] = 4
+            elif in_view[e]:
+                actions[e] = self._steer(sim.seeker_rot[e], to_target[e])
+            else:
+                waypoint = self._next_waypoint(pos[e], target[e])
+                if waypoint is None:
+                    self.unreachable[e, target[e]] = True
+                    actions[e] = 3
+                else:
+                    actions[e] = self._steer(sim.seeker_rot[e], waypoint - pos[e])
+        return actions
+
+    def _next_waypoint(self, pos, target):
+        nav = self.navigator
+        grid = nav.grid
+        path = nav.find_path(grid.cell(*pos), grid.cell(*self.center[target]))
+        if path is None:
+            return None
+        for cell in path:
+            p = np.array(grid.position(cell))
+            if np.linalg.norm(p - pos) >= self.WAYPOINT_DISTANCE:
+                return p
+        return np.array(grid.position(path[-1])) if len(path) > 1 else self.center[target]
+
+    def _steer(self, rot, delta):
+        """朝 delta 方向转 (rot 是角度，forward = (sin, cos))，已经对准就前进"""
+        heading = math.degrees(math.atan2(delta[0], delta[1]))
+        error = (heading - rot + 180) % 360 - 180
+        if abs(error) <= self.AIM_TOLERANCE:
+            return 0
+        return 3 if error > 0 else 2
+
+
+def collect_demonstrations(env, steps, expert=None):
+    """用脚本搜捕者在 VecHideAndSeekEnv 上跑 steps 步，返回 (obs (T,N,obs_dim), actions (T,N), rewards (T,N), dones (T,N))"""
+    expert = expert or ScriptedSeeker(env.level)
+    obs = env.reset()
+    expert.reset(env.num_envs)
+    all_obs, all_actions, all_rewards, all_dones = [], [], [], []
+    for _ in range(steps):
+        actions = expert(env.sim)
+        all_obs.append(obs)
+        all_actions.append(actions)
+        obs, rewards, dones, _ = env.step(actions)
+        all_rewards.append(rewards)
+        all_dones.append(dones)
+        if dones.any():
+            expert.reset(env.num_envs, np.flatnonzero(dones))
+    return np.stack(all_obs), np.stack(all_actions), np.stack(all_rewards), np.stack(all_dones)
+
+
+def benchmark_planning(navigator, queries=200, seed=0):
+    """随机可走格子之间寻路：返回 (冷启动的平均毫秒, 缓存命中的平均毫秒, A* 和 JPS 路径长度的最大差)"""
+    grid = navigator.grid
+    rng = np.random.default_rng(seed)
+    i, j = np.nonzero(~grid.blocked)
+    cells = ((i + 1) * grid.stride + j + 1)[rng.integers(0, len(i), (queries, 2))].tolist()
+    navigator.clear_cache()
+    start = time.perf_counter()
+    paths = [navigator.find_path(a, b) for a, b in cells]
+    cold = (time.perf_counter() - start) * 1000 / queries
+    start = time.perf_counter()
+    for a, b in cells:
+        navigator.find_path(a, b)
+    cached = (time.perf_counter() - start) * 1000 / queries
+    error = 0.0
+    for (a, b), path in zip(cells[:20], paths[:20]):
+        reference = grid.astar(a, b)
+        if (path is None) != (reference is None):
+            return cold, cached, math.inf
+        if path is not None:
+            error = max(error, abs(grid.path_length(path) - grid.path_length(reference)))
+    return cold, cached, error
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark grid path planning and evaluate the scripted seeker')
+    parser.add_argument('--props', type=int, default=None, help='generated office level size (default: the office level)')
+    parser.add_argument('--level', help='compiled .level file')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cell-size', type=float, default=CELL_SIZE)
+    parser.add_argument('--method', choices=('jps', 'astar'), default='jps')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--episodes', type=int, default=200, help='scripted seeker episodes (0 to skip)')
+    args = parser.parse_args()
+
+    level = generate_office_level(args.props, args.seed) if args.props else as_level(args.level)
+    start = time.perf_counter()
+    navigator = Navigator(level, args.cell_size, method=args.method)
+    grid = navigator.grid
+    print(f'--- {level}: grid {grid.shape[0]}x{grid.shape[1]} ({int(grid.blocked.sum())} blocked), '
+          f'built in {(time.perf_counter() - start) * 1000:.1f} ms ---')
+    cold, cached, error = benchmark_planning(navigator, args.queries, args.seed)
+    print(f'--- {args.method}: {cold:.3f} ms/path, cached {cached * 1000:.1f} us/path, '
+          f'max length difference vs A* {error:.2e} ---')
+
+    if args.episodes:
+        from vec_env import VecHideAndSeekEnv
+        env = VecHideAndSeekEnv(min(args.episodes, 64), seed=args.seed, level=level)
+        expert = ScriptedSeeker(level, navigator)
+        obs = env.reset()
+        expert.reset(env.num_envs)
+        returns, wins, steps = [], 0, 0
+        start = time.perf_counter()
+        while len(returns) < args.episodes:
+            obs, rewards, dones, info = env.step(expert(env.sim))
+            steps += env.num_envs
+            for e in np.flatnonzero(dones).tolist():
+                returns.append(info['episode_return'][e])
+                wins += bool(info['success'][e])
+            expert.reset(env.num_envs, np.flatnonzero(dones))
+        elapsed = time.perf_counter() - start
+        print(f'--- Scripted seeker: {len(returns)} episodes, win rate {wins / len(returns):.1%}, '
+              f'mean return {np.mean(returns):.1f}, {steps / elapsed:.0f} steps/s, '
+              f'path cache hit rate {navigator.hits / max(navigator.hits + navigator.misses, 1):.1%} ---')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# numpy_policy.py
+# ActorCritic 的纯 NumPy 推理：把训练好的权重导出成 .npz (可选 int8 量化)，
+# 游戏里运行 AI 搜捕者时只需要 numpy，不用导入 torch (启动快几秒，内存少几百 MB)
+#
+#   python src/numpy_policy.py checkpoints/ppo_best.pth --out seeker_policy.npz [--int8] [--check]
+import argparse
+import os
+
+import numpy as np
+
+FORMAT_VERSION = 1
+# ActorCritic 的层，按 forward 的顺序
+LAYERS = ('fc1', 'fc2', 'actor', 'critic')
+
+
+def _to_numpy(value):
+    """复制一份 float32 数组：state_dict 里的张量和模型参数共用内存，不复制的话快照会跟着训练变化"""
+    if hasattr(value, 'detach'): # torch.Tensor
+        value = value.detach().cpu().numpy()
+    return np.array(value, dtype=np.float32)
+
+
+def _model_state(checkpoint):
+    """检查点路径 (.pth)、训练状态 dict (含 model_state_dict) 或模型的 state_dict -> state_dict"""
+    if isinstance(checkpoint, (str, os.PathLike)):
+        from checkpoint import load_checkpoint # 只有读取 .pth 时才需要 torch
+        checkpoint = load_checkpoint(checkpoint)
+    return checkpoint.get('model_state_dict', checkpoint)
+
+
+def export_policy(checkpoint, path, quantize=None):
+    """把 ActorCritic 的权重导出为 .npz
+
+    checkpoint: 检查点路径 (.pth)、训练状态 dict (含 model_state_dict) 或模型的 state_dict
+    quantize: None 保存 float32；'int8' 每个输出通道一个缩放系数的对称量化 (权重约为原来的 1/4)
+    """
+    state = _model_state(checkpoint)
+
+    arrays = {'format_version': np.array(FORMAT_VERSION), 'quantized': np.array(quantize or '')}
+    for name in LAYERS:
+        weight = _to_numpy(state[f'{name}.weight'])
+        if quantize == 'int8':
+            scale = np.abs(weight).max(axis=1) / 127
+            scale[scale == 0] = 1.0
+            arrays[f'{name}.weight'] = np.round(weight / scale[:, None]).astype(np.int8)
+            arrays[f'{name}.scale'] = scale.astype(np.float32)
+        elif quantize is None:
+            arrays[f'{name}.weight'] = weight
+        else:
+            raise ValueError(f"unknown quantization '{quantize}'")
+        arrays[f'{name}.bias'] = _to_numpy(state[f'{name}.bias'])
+
+    # 与检查点一样先写临时文件再 rename
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(f, **arrays)
+    os.replace(tmp_path, path)
+    return path
+
+
+class NumpyActorCritic:
+    """与 model.ActorCritic.forward 相同的前向计算 (relu(fc1) -> relu(fc2) -> softmax(actor), critic)"""
+    def __init__(self, layers):
+        self.layers = layers # name -> (weight (out,in) float32, bias (out,))
+        self.input_dims = layers['fc1'][0].shape[1]
+        self.n_actions = layers['actor'][0].shape[0]
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            version = int(data['format_version'])
+            if version != FORMAT_VERSION:
+                raise ValueError(f'{path}: unsupported policy format version {version}')
+            layers = {}
+            for name in LAYERS:
+                weight = data[f'{name}.weight'].astype(np.float32)
+                if f'{name}.scale' in data:
+                    weight *= data[f'{name}.scale'][:, None] # 读取时反量化一次，之后按 float32 计算
+                layers[name] = (weight, data[f'{name}.bias'])
+        return cls(layers)
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint):
+        """不经过 .npz，直接从检查点 (路径或 dict) 取 float32 权重"""
+        state = _model_state(checkpoint)
+        return cls({name: (_to_numpy(state[f'{name}.weight']), _to_numpy(state[f'{name}.bias'])) for name in LAYERS})
+
+    def _linear(self, name, x):
+        weight, bias = self.layers[name]
+        return x @ weight.T + bias
+
+    def forward(self, state):
+        """state: (obs_dim,) 或 (B, obs_dim)，返回 (action_probs, state_value)，形状与 torch 版本相同"""
+        x = np.asarray(state, dtype=np.float32)
+        x = np.maximum(self._linear('fc1', x), 0)
+        x = np.maximum(self._linear('fc2', x), 0)
+        logits = self._linear('actor', x)
+        logits -= logits.max(axis=-1, keepdims=True)
+        probs = np.exp(logits)
+        probs /= probs.sum(axis=-1, keepdims=True)
+        return probs, self._linear('critic', x)
+
+    __call__ = forward
+
+    def act(self, state, greedy=True, rng=None):
+        """选一个动作：greedy=True 取概率最大的动作，否则按概率采样"""
+        probs, _ = self.forward(state)
+        if greedy:
+            return int(np.argmax(probs))
+        rng = rng if rng is not None else np.random.default_rng()
+        return int(rng.choice(len(probs), p=probs / probs.sum()))
+
+
+def check_policy(checkpoint, path, n=4096, seed=0):
+    """在随机观察上比较导出的策略和 torch 模型，返回 (动作概率的最大误差, 状态价值的最大误差)"""
+    import torch
+    from checkpoint import load_checkpoint
+    from model import ActorCritic
+
+    if isinstance(checkpoint, (str, os.PathLike)):
+        checkpoint = load_checkpoint(checkpoint)
+    state = checkpoint.get('model_state_dict', checkpoint)
+    policy = NumpyActorCritic.load(path)
+    model = ActorCritic(policy.input_dims, policy.n_actions)
+    model.load_state_dict(state)
+    obs = np.random.default_rng(seed).normal(size=(n, policy.input_dims)).astype(np.float32)
+    with torch.no_grad():
+        probs, values = (t.numpy() for t in model(torch.from_numpy(obs)))
+    np_probs, np_values = policy(obs)
+    return float(np.abs(np_probs - probs).max()), float(np.abs(np_values - values).max())
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export ActorCritic weights for torch-free inference')
+    parser.add_argument('checkpoint', help='.pth checkpoint (training state or model state_dict)')
+    parser.add_argument('--out', default='seeker_policy.npz')
+    parser.add_argument('--int8', action='store_true', help='quantize the weights to int8')
+    parser.add_argument('--check', action='store_true', help='compare against the torch model on random observations')
+    args = parser.parse_args()
+
+    path = export_policy(args.checkpoint, args.out, 'int8' if args.int8 else None)
+    print(f"--- Policy exported to {path} ({os.path.getsize(path) / 1024:.1f} KB) ---")
+    if args.check:
+        prob_error, value_error = check_policy(args.checkpoint, path)
+        print(f"--- Max abs error vs torch: action probs {prob_error:.2e}, state value {value_error:.2e} ---")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+# ppo.py
+# PPO (clipped surrogate) 的采样与更新，在固定长度的 T步 × N个环境 轨迹上训练
+import numpy as np
+import torch
+import torch.nn as nn
+from torch.distributions import Categorical
+
+from profiling import profiler
+
+
+def collect_rollout(env, model, buffer, state, act=None):
+    """用当前策略在批量环境中采样 buffer.capacity 步
+
+    state: (N, obs_dim) 当前观察
+    act: 可选，act(state) -> (动作, 价值, log 概率) 的 NumPy 数组，代替 model 的前向
+         (例如 SelfPlayEnv.act，与对手在同一次前向中计算)
+    返回 (下一步的观察, 本次采样中结束的回合信息列表)
+    到 max_steps 被截断的回合 (info['truncated']) 用 V(final_observation) 自举，见 RolloutBuffer.bootstrap
+    """
+    buffer.reset()
+    finished = []
+    while not buffer.full:
+        with profiler.phase('model.act'):
+            if act is not None:
+                action, value, log_prob = act(state)
+            else:
+                with torch.no_grad():
+                    action_probs, state_value = model(torch.as_tensor(state, dtype=torch.float32))
+                    dist = Categorical(action_probs)
+                    sample = dist.sample()
+                action, value, log_prob = (sample.numpy(), state_value.squeeze(-1).numpy(),
+                                           dist.log_prob(sample).numpy())
+        new_state, reward, done, info = env.step(action)
+        bootstrap = np.zeros(len(done), dtype=np.float32)
+        truncated = np.flatnonzero(info.get('truncated', np.zeros(len(done), dtype=bool)))
+        if len(truncated):
+            with profiler.phase('model.act'), torch.no_grad():
+                final_obs = torch.as_tensor(info['final_observation'][truncated], dtype=torch.float32)
+                bootstrap[truncated] = model(final_obs)[1].squeeze(-1).numpy()
+        buffer.add(state, action, reward, done, value, log_prob, bootstrap)
+        profiler.count('episodes', int(done.sum()))
+        for i in np.flatnonzero(done):
+            finished.append({
+                'reward': float(info['episode_return'][i]),
+                'success': bool(info['success'][i]),
+                'steps': int(info['episode_length'][i]),
+                'ammo_used': int(info['ammo_used'][i]),
+            })
+        state = new_state
+    return state, finished
+
+
+def ppo_update(model, optimizer, buffer, epochs, minibatch_size, clip_eps, value_clip,
+               entropy_coef, value_coef, max_grad_norm):
+    """在已经算好 GAE 的 buffer 上做多轮小批量更新，返回各项损失的平均值"""
+    obs = torch.from_numpy(buffer.flat('obs'))
+    actions = torch.from_numpy(buffer.flat('actions'))
+    old_log_probs = torch.from_numpy(buffer.flat('log_probs'))
+    old_values = torch.from_numpy(buffer.flat('values'))
+    returns = torch.from_numpy(buffer.flat('returns'))
+    advantages = torch.from_numpy(buffer.flat('advantages'))
+    advantages = (advantages - advantages.mean()) / (advantages.std() + 1e-8)
+
+    stats = {'policy_loss': 0.0, 'value_loss': 0.0, 'entropy': 0.0, 'approx_kl': 0.0, 'clip_fraction': 0.0, 'loss': 0.0}
+    n_batches = 0
+    batch_size = len(obs)
+    for _ in range(epochs):
+        for idx in torch.randperm(batch_size).split(minibatch_size):
+            with profiler.phase('update.forward'):
+                action_probs, values = model(obs[idx])
+                dist = Categorical(action_probs)
+                log_probs = dist.log_prob(actions[idx])
+                values = values.squeeze(-1)
+
+            log_ratio = log_probs - old_log_probs[idx]
+            ratio = log_ratio.exp()
+            surr1 = ratio * advantages[idx]
+            surr2 = ratio.clamp(1 - clip_eps, 1 + clip_eps) * advantages[idx]
+            policy_loss = -torch.min(surr1, surr2).mean()
+
+            # value clipping: 新的 value 与采样时的 value 相差不超过 value_clip
+            values_clipped = old_values[idx] + (values - old_values[idx]).clamp(-value_clip, value_clip)
+            value_loss = 0.5 * torch.max((values - returns[idx]).pow(2), (values_clipped - returns[idx]).pow(2)).mean()
+            entropy = dist.entropy().mean()
+
+            loss = policy_loss + value_coef * value_loss - entropy_coef * entropy
+            optimizer.zero_grad()
+            with profiler.phase('update.backward'):
+                loss.backward()
+            with profiler.phase('optimizer.step'):
+                nn.utils.clip_grad_norm_(model.parameters(), max_grad_norm)
+                optimizer.step()
+
+            with torch.no_grad():
+                stats['approx_kl'] += ((ratio - 1) - log_ratio).mean().item()
+                stats['clip_fraction'] += ((ratio - 1).abs() > clip_eps).float().mean().item()
+            stats['policy_loss'] += policy_loss.item()
+            stats['value_loss'] += value_loss.item()
+            stats['entropy'] += entropy.item()
+            stats['loss'] += loss.item()
+            n_batches += 1
+    return {k: v / n_batches for k, v in stats.items()}
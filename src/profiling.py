@@ -0,0 +1,231 @@
+# profiling.py
+# 热点路径计时 (per-phase timing) 和计数器，定期写入 TensorBoard
+# 关闭时 phase() 直接返回一个共享的空上下文，几乎没有开销
+import contextlib
+import functools
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+_NULL = contextlib.nullcontext()
+PERCENTILES = (50, 90, 99)
+
+
+class _Phase:
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        end = time.perf_counter()
+        self.profiler._record(self.name, self.start, end)
+        return False
+
+
+class Profiler:
+    """按阶段记录耗时，按名字累加计数
+
+    with profiler.phase('env.step'): ...
+    @profiler.timed('model.forward')
+    profiler.count('env_steps', n)
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.durations = {}
+        self.counters = {}
+        self.last_flush = time.perf_counter()
+        self.trace_events = None # 导出 Chrome trace 时记录每个阶段的时间段
+
+    def phase(self, name):
+        return _Phase(self, name) if self.enabled else _NULL
+
+    def timed(self, name):
+        """装饰器版本的 phase()"""
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.phase(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name, n=1):
+        # 计数器总是开启 (只是一次加法)，用来计算 steps/sec 等吞吐量
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def _record(self, name, start, end):
+        self.durations.setdefault(name, []).append(end - start)
+        if self.trace_events is not None:
+            self.trace_events.append({'name': name, 'ph': 'X', 'ts': start * 1e6, 'dur': (end - start) * 1e6,
+                                      'pid': os.getpid(), 'tid': 'phases'})
+
+    def summary(self):
+        """自上次 flush 以来每个阶段的次数、总耗时和延迟分位数 (毫秒)"""
+        result = {}
+        for name, values in self.durations.items():
+            if not values:
+                continue
+            ms = np.asarray(values) * 1000
+            result[name] = {'count': len(ms), 'total_ms': float(ms.sum()),
+                            **{f'p{q}_ms': float(v) for q, v in zip(PERCENTILES, np.percentile(ms, PERCENTILES))}}
+        return result
+
+    def flush(self, writer=None, step=0):
+        """把统计写入 TensorBoard (writer 为 None 时只返回)，然后清空本轮数据"""
+        now = time.perf_counter()
+        elapsed = max(now - self.last_flush, 1e-9)
+        summary = self.summary()
+        rates = {name: value / elapsed for name, value in self.counters.items()}
+        if writer is not None:
+            for name, stats in summary.items():
+                for q in PERCENTILES:
+                    writer.add_scalar(f'Timing/{name}/p{q}_ms', stats[f'p{q}_ms'], step)
+                writer.add_scalar(f'Timing/{name}/share', stats['total_ms'] / 1000 / elapsed, step)
+            for name, rate in rates.items():
+                writer.add_scalar(f'Throughput/{name}_per_sec', rate, step)
+        for values in self.durations.values():
+            values.clear()
+        self.counters = {}
+        self.last_flush = now
+        return summary, rates
+
+
+class SamplingProfiler:
+    """采样式分析器：后台线程定期抓取目标线程的调用栈，导出 Chrome trace (chrome://tracing / Perfetto)
+
+    连续采样到的相同栈帧会合并成一个时间段，得到火焰图式的时间线。
+    如果同时开启了 Profiler，它记录的阶段也会写进同一个文件。
+    """
+    def __init__(self, interval=0.001, profiler=None, max_depth=64):
+        self.interval = interval
+        self.profiler = profiler
+        self.max_depth = max_depth
+        self.samples = []
+        self.thread = None
+        self.running = False
+
+    def start(self, thread_id=None):
+        self.target = thread_id if thread_id is not None else threading.get_ident()
+        self.samples = []
+        self.running = True
+        if self.profiler is not None:
+            self.profiler.trace_events = []
+        self.thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        while self.running:
+            frame = sys._current_frames().get(self.target)
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            self.samples.append((time.perf_counter(), tuple(reversed(stack))))
+            time.sleep(self.interval)
+
+    def stop(self, path):
+        """停止采样并把 trace 写到 path"""
+        self.running = False
+        self.thread.join()
+        events = self._stack_events()
+        if self.profiler is not None:
+            events.extend(self.profiler.trace_events or [])
+            self.profiler.trace_events = None
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+        return path
+
+    def _stack_events(self):
+        events, open_frames = [], [] # open_frames: [(名字, 开始时间)]
+        pid = os.getpid()
+
+        def close(depth, t):
+            while len(open_frames) > depth:
+                name, start = open_frames.pop()
+                events.append({'name': name, 'ph': 'X', 'ts': start * 1e6, 'dur': (t - start) * 1e6,
+                               'pid': pid, 'tid': 'samples'})
+
+        for t, stack in self.samples:
+            common = 0
+            while common < min(len(stack), len(open_frames)) and stack[common] == open_frames[common][0]:
+                common += 1
+            close(common, t)
+            open_frames.extend((name, t) for name in stack[common:])
+        if self.samples:
+            close(0, self.samples[-1][0] + self.interval)
+        return events
+
+
+class TraceWindow:
+    """在编号 [start, stop) 的回合 (或PPO更新) 期间开启 SamplingProfiler 并导出 trace 文件
+
+    窗口内会临时打开 profiler，让各阶段的时间段也出现在 trace 中。
+    """
+    def __init__(self, trace_range, path, profiler):
+        self.start, self.stop = trace_range if trace_range else (None, None)
+        self.path = path
+        self.profiler = profiler
+        self.sampler = None
+
+    def before(self, index):
+        if index == self.start:
+            self.was_enabled = self.profiler.enabled
+            self.profiler.enabled = True
+            self.sampler = SamplingProfiler(profiler=self.profiler)
+            self.sampler.start()
+
+    def after(self, index):
+        if self.sampler is not None and index == self.stop - 1:
+            path = self.sampler.stop(self.path)
+            self.profiler.enabled = self.was_enabled
+            self.sampler = None
+            print(f"--- Chrome trace for {self.start}..{self.stop - 1} written to {path} ---")
+
+
+def import_profile(modules):
+    """在一个新的解释器中按顺序导入 modules (python -X importtime)
+
+    返回顶层导入的 [(模块名, 自身耗时 ms, 累计耗时 ms)]，按累计耗时从大到小排序。
+    前面的模块已经导入过的依赖不会重复计算，所以每一行是按这个顺序导入时新增的开销。
+    """
+    env = dict(os.environ)
+    src = os.path.dirname(os.path.abspath(__file__))
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [src, env.get('PYTHONPATH')]))
+    code = '; '.join(f'import {name}' for name in modules)
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        raise RuntimeError(f'importing {modules} failed:\n{result.stderr[-2000:]}')
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if name.startswith('  '): # 缩进的是被其他模块间接导入的
+            continue
+        rows.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return sorted(rows, key=lambda row: -row[2])
+
+
+def print_import_profile(rows, top=15):
+    total = sum(row[2] for row in rows)
+    print(f"{'module':<32} {'self ms':>9} {'cumulative ms':>14} {'share':>7}")
+    for name, self_ms, cumulative_ms in rows[:top]:
+        print(f'{name:<32} {self_ms:9.1f} {cumulative_ms:14.1f} {cumulative_ms / total:7.1%}')
+    print(f"{'total':<32} {'':>9} {total:14.1f}")
+
+
+# 全局实例：环境和训练循环共用
+profiler = Profiler()
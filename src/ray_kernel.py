@@ -0,0 +1,175 @@
+# ray_kernel.py
+# 批量射线 vs AABB 求交 (slab method)，替代逐条射线调用 Ursina 的 raycast
+# 所有 Prop 都是 collider='box'，所以只需要一组 (P,3) 的包围盒数组
+import numpy as np
+
+# 每个分块最多处理多少个 射线×道具 组合，限制临时数组的内存 (约 8MB/数组)
+CHUNK_ELEMENTS = 1 << 20
+
+
+def raycast_aabbs(origins, directions, lo, hi, max_distance, ignore=None):
+    """一次性求多条射线与所有 AABB 的最近交点
+
+    origins/directions: (R,3) 射线起点和方向 (方向不需要归一化，距离以方向长度为单位)
+    lo/hi: (P,3) 包围盒的最小/最大角
+    max_distance: 射程，超过它的交点不算 (与 raycast(distance=10) 相同)
+    ignore: 可选 (R,) 每条射线要忽略的道具编号，-1 表示不忽略
+            (seeker 本身不在道具数组中，所以 seeker-ignore 不需要额外处理)
+
+    返回 (hit_index (R,), distance (R,))，没打中时 hit_index = -1, distance = inf。
+    射线起点在盒子内部时距离为 0。
+    """
+    origins = np.asarray(origins, dtype=np.float64)
+    directions = np.asarray(directions, dtype=np.float64)
+    n_rays, n_boxes = len(origins), len(lo)
+    hit_index = np.full(n_rays, -1, dtype=np.int64)
+    distance = np.full(n_rays, np.inf)
+    if n_rays == 0 or n_boxes == 0:
+        return hit_index, distance
+
+    chunk = max(1, CHUNK_ELEMENTS // n_boxes)
+    for start in range(0, n_rays, chunk):
+        rays = slice(start, start + chunk)
+        ign = None if ignore is None else np.asarray(ignore)[rays]
+        hit_index[rays], distance[rays] = _raycast_chunk(origins[rays], directions[rays], lo, hi, max_distance, ign)
+    return hit_index, distance
+
+
+def _raycast_chunk(origins, directions, lo, hi, max_distance, ignore):
+    n = len(origins)
+    t_enter = np.zeros((n, len(lo)))
+    t_exit = np.full((n, len(lo)), np.inf)
+    # 逐个坐标轴收紧 [t_enter, t_exit]，避免 (R,P,3) 的临时数组
+    for axis in range(3):
+        o = origins[:, axis, None]
+        d = directions[:, axis, None]
+        parallel = d == 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            inv = 1.0 / d
+            t1 = (lo[:, axis] - o) * inv
+            t2 = (hi[:, axis] - o) * inv
+        near = np.minimum(t1, t2)
+        far = np.maximum(t1, t2)
+        if parallel.any():
+            # 方向分量为0: 起点在 slab 内则该轴不限制，否则不可能相交
+            inside = (o >= lo[:, axis]) & (o <= hi[:, axis])
+            near = np.where(parallel, np.where(inside, -np.inf, np.inf), near)
+            far = np.where(parallel, np.where(inside, np.inf, -np.inf), far)
+        np.maximum(t_enter, near, out=t_enter)
+        np.minimum(t_exit, far, out=t_exit)
+
+    miss = (t_enter > t_exit) | (t_enter > max_distance)
+    if ignore is not None:
+        rows = np.flatnonzero(ignore >= 0)
+        miss[rows, ignore[rows]] = True
+    t_enter[miss] = np.inf
+
+    idx = t_enter.argmin(axis=1)
+    dist = t_enter[np.arange(n), idx]
+    idx[~np.isfinite(dist)] = -1
+    return idx, dist
+
+
+class BVH:
+    """静态 AABB 的包围盒层次树 (bounding volume hierarchy)，用于单条射线的按需拾取
+
+    建树时沿包围盒中心跨度最大的轴按中位数二分，叶子最多 leaf_size 个盒子。
+    节点数组是扁平的：node_lo/node_hi 是节点包围盒，内部节点的两个子节点是 left/right，
+    叶子 (left == -1) 的盒子是 order[start:start + count]。
+    一次求交只访问射线经过的节点，耗时约为 O(log P)，适合鼠标点击这种偶尔的查询。
+    """
+    def __init__(self, lo, hi, leaf_size=4):
+        lo = np.asarray(lo, dtype=np.float64)
+        hi = np.asarray(hi, dtype=np.float64)
+        self.leaf_size = leaf_size
+        self.order = np.arange(len(lo))
+        centers = (lo + hi) / 2
+        node_lo, node_hi, left, right, start, count = [], [], [], [], [], []
+
+        def new_node(first, n):
+            boxes = self.order[first:first + n]
+            node_lo.append(lo[boxes].min(axis=0) if n else np.full(3, np.inf))
+            node_hi.append(hi[boxes].max(axis=0) if n else np.full(3, -np.inf))
+            left.append(-1)
+            right.append(-1)
+            start.append(first)
+            count.append(n)
+            return len(left) - 1
+
+        stack = [new_node(0, len(lo))]
+        while stack:
+            node = stack.pop()
+            first, n = start[node], count[node]
+            if n <= leaf_size:
+                continue
+            boxes = self.order[first:first + n]
+            c = centers[boxes]
+            axis = int(np.argmax(c.max(axis=0) - c.min(axis=0)))
+            half = n // 2
+            self.order[first:first + n] = boxes[np.argpartition(c[:, axis], half)]
+            left[node] = new_node(first, half)
+            right[node] = new_node(first + half, n - half)
+            stack.extend((left[node], right[node]))
+
+        self.node_lo, self.node_hi = np.array(node_lo).reshape(-1, 3), np.array(node_hi).reshape(-1, 3)
+        self.left, self.right = np.array(left), np.array(right)
+        self.start, self.count = np.array(start), np.array(count)
+        # 遍历是逐个节点的标量运算，用 Python 列表比逐元素索引 numpy 数组快得多
+        self._nodes = list(zip(self.node_lo.tolist(), self.node_hi.tolist(), left, right, start, count))
+        self._boxes = list(zip(lo.tolist(), hi.tolist()))
+        self._order = self.order.tolist()
+
+    @property
+    def n_nodes(self):
+        return len(self._nodes)
+
+    def raycast(self, origin, direction, max_distance=np.inf):
+        """一条射线的最近交点，结果与 raycast_aabbs 相同：返回 (道具编号, 距离)，没打中时 (-1, inf)"""
+        origin = [float(v) for v in origin]
+        inv = [1.0 / float(d) if d != 0 else None for d in direction]
+        best, best_t = -1, np.inf
+        if not self._nodes:
+            return best, best_t
+        root_t = _ray_box(*self._nodes[0][:2], origin, inv, max_distance)
+        stack = [(root_t, 0)] if root_t is not None else []
+        while stack:
+            t, node = stack.pop()
+            if t > best_t:
+                continue
+            _, _, left, right, first, n = self._nodes[node]
+            if left < 0:
+                for i in self._order[first:first + n]:
+                    t = _ray_box(*self._boxes[i], origin, inv, max_distance)
+                    # 距离相同时取编号小的，与 raycast_aabbs 的 argmin 一致
+                    if t is not None and (t < best_t or (t == best_t and i < best)):
+                        best, best_t = i, t
+                continue
+            t_left = _ray_box(*self._nodes[left][:2], origin, inv, max_distance)
+            t_right = _ray_box(*self._nodes[right][:2], origin, inv, max_distance)
+            # 先访问近的子节点 (后入栈)，找到交点后就能剪掉更远的节点
+            children = sorted(((t, c) for t, c in ((t_left, left), (t_right, right)) if t is not None), reverse=True)
+            stack.extend(children)
+        return best, best_t
+
+
+def _ray_box(lo, hi, origin, inv, max_distance):
+    """标量 slab 求交：返回进入距离 (起点在盒内为 0)，不相交或超出射程时返回 None"""
+    t_enter, t_exit = 0.0, max_distance
+    for axis in range(3):
+        o = origin[axis]
+        if inv[axis] is None:
+            # 方向分量为0: 起点在 slab 内则该轴不限制，否则不可能相交
+            if o < lo[axis] or o > hi[axis]:
+                return None
+            continue
+        t1 = (lo[axis] - o) * inv[axis]
+        t2 = (hi[axis] - o) * inv[axis]
+        if t1 > t2:
+            t1, t2 = t2, t1
+        if t1 > t_enter:
+            t_enter = t1
+        if t2 < t_exit:
+            t_exit = t2
+        if t_enter > t_exit:
+            return None
+    return t_enter
@@ -0,0 +1,77 @@
+# rollout.py
+# 固定容量的轨迹缓冲区 (rollout buffer)
+# 采样阶段只存 NumPy 数组 (在 torch.no_grad() 下填充)，更新时再一次性批量前向计算 log_prob 和 value
+import numpy as np
+
+
+class RolloutBuffer:
+    """T 步 × N 个环境的预分配缓冲区
+
+    dones[t] 表示第 t 步之后回合结束 (即 env.step 返回的 done)。
+    bootstrap[t] 是因为 max_steps 被截断的回合最后一帧的价值 V(final_observation)，其余为 0：
+    截断不是真正的终止，回报在这里接上 gamma * bootstrap 而不是 0。
+    """
+    def __init__(self, capacity, num_envs, obs_dim):
+        self.capacity = capacity
+        self.num_envs = num_envs
+        self.obs = np.zeros((capacity, num_envs, obs_dim), dtype=np.float32)
+        self.actions = np.zeros((capacity, num_envs), dtype=np.int64)
+        self.rewards = np.zeros((capacity, num_envs), dtype=np.float32)
+        self.dones = np.zeros((capacity, num_envs), dtype=np.float32)
+        self.values = np.zeros((capacity, num_envs), dtype=np.float32)
+        self.log_probs = np.zeros((capacity, num_envs), dtype=np.float32)
+        self.bootstrap = np.zeros((capacity, num_envs), dtype=np.float32)
+        self.advantages = np.zeros((capacity, num_envs), dtype=np.float32)
+        self.returns = np.zeros((capacity, num_envs), dtype=np.float32)
+        self.size = 0
+
+    def reset(self):
+        self.size = 0
+
+    @property
+    def full(self):
+        return self.size == self.capacity
+
+    def add(self, obs, action, reward, done, value, log_prob, bootstrap=0.0):
+        t = self.size
+        self.obs[t] = obs
+        self.actions[t] = action
+        self.rewards[t] = reward
+        self.dones[t] = done
+        self.values[t] = value
+        self.log_probs[t] = log_prob
+        self.bootstrap[t] = bootstrap
+        self.size += 1
+
+    def compute_returns(self, gamma, last_value=0.0):
+        """折扣回报，一次反向遍历 O(T)；回合在中途结束的位置不向前累积"""
+        T = self.size
+        nonterminal = 1.0 - self.dones[:T]
+        running = np.broadcast_to(np.asarray(last_value, dtype=np.float32), (self.num_envs,)).copy()
+        rewards = self.rewards[:T] + gamma * self.bootstrap[:T]
+        for t in reversed(range(T)):
+            running = rewards[t] + gamma * nonterminal[t] * running
+            self.returns[t] = running
+        return self.returns[:T]
+
+    def compute_gae(self, gamma, lam, last_value=0.0):
+        """GAE(λ) 优势估计，一次反向遍历；同时写入 returns = advantages + values"""
+        T = self.size
+        values = self.values[:T]
+        nonterminal = 1.0 - self.dones[:T]
+        next_values = np.empty_like(values)
+        next_values[:-1] = values[1:]
+        next_values[-1] = last_value
+        deltas = self.rewards[:T] + gamma * (next_values * nonterminal + self.bootstrap[:T]) - values
+
+        running = np.zeros(self.num_envs, dtype=np.float32)
+        for t in reversed(range(T)):
+            running = deltas[t] + gamma * lam * nonterminal[t] * running
+            self.advantages[t] = running
+        self.returns[:T] = self.advantages[:T] + values
+        return self.advantages[:T], self.returns[:T]
+
+    def flat(self, name):
+        """把 (T,N,...) 的字段展平成 (T*N,...)，用于批量前向"""
+        array = getattr(self, name)[:self.size]
+        return array.reshape((-1,) + array.shape[2:])
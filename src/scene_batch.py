@@ -0,0 +1,168 @@
+# scene_batch.py
+# 静态场景合并 (scene-graph flattening)：不需要单独操作的道具按 空间块 × 材质 合并成少量网格节点，
+# 每个节点一个 Geom (一个 draw call) 和一个碰撞节点 (多个 CollisionBox)，节点数只随关卡面积增长。
+# 需要单独变色/判定的道具 (躲藏者) 仍然是独立的实体。
+#
+#   python src/scene_batch.py --props 5000    # 离屏渲染，对比合并前后的节点数、draw call 和帧时间
+import argparse
+import time
+
+import numpy as np
+from panda3d.core import CollisionBox, Point3, TransparencyAttrib
+from ursina import Entity, Mesh, Vec3, color, scene
+from ursina.collider import BoxCollider, Collider
+from ursina.models.procedural.cube import Cube
+from ursina.models.procedural.cylinder import Cylinder
+
+from level import MODEL_BOUNDS
+
+CHUNK_SIZE = 32.0 # 合并块的边长 (世界单位)，整块被视锥裁剪，射线也只检查附近块的碰撞体
+CYLINDER_RESOLUTION = 8
+MERGEABLE_MODELS = ('cube', 'cylinder')
+
+_templates = {}
+
+
+def model_mesh(name):
+    """关卡中的模型名对应的 Ursina 模型 (Ursina 没有名为 'cylinder' 的模型文件，用程序生成的圆柱体)"""
+    if name == 'cylinder':
+        return Cylinder(resolution=CYLINDER_RESOLUTION)
+    return name
+
+
+def _template(name):
+    """模型展开成三角形列表的顶点 (V,3) 和每个顶点的面法线 (V,3)"""
+    if name not in _templates:
+        mesh = Cylinder(resolution=CYLINDER_RESOLUTION) if name == 'cylinder' else Cube()
+        vertices = np.array([tuple(v) for v in mesh.generated_vertices], dtype=np.float32)
+        tri = vertices.reshape(-1, 3, 3)
+        normals = np.cross(tri[:, 1] - tri[:, 0], tri[:, 2] - tri[:, 0])
+        normals /= np.maximum(np.linalg.norm(normals, axis=1, keepdims=True), 1e-12)
+        _templates[name] = (vertices, np.repeat(normals, 3, axis=0))
+    return _templates[name]
+
+
+def create_prop_entity(cls, level, i, **kwargs):
+    """按编译好的关卡中第 i 个道具的模型、缩放、颜色和位置创建一个独立的实体
+
+    3D 游戏、渲染模式的 HideAndSeekEnv 和 SimViewer 都用这个函数创建道具；
+    有碰撞体时换成 MODEL_BOUNDS 的盒子，和无界面模拟 (level.lo/hi) 的碰撞盒一致。
+    """
+    name = level.model(i)
+    entity = cls(name=f'{level.kind_name(i)}_{i}', model=model_mesh(name), scale=tuple(level.scale[i].tolist()),
+                 color=color.rgba32(*level.color[i].tolist()), position=tuple(level.pos[i].tolist()), **kwargs)
+    entity.base_color = entity.color
+    if entity.collider is not None:
+        lo, hi = np.array(MODEL_BOUNDS[name], dtype=np.float64)
+        entity.collider = BoxCollider(entity, center=Vec3(*((lo + hi) / 2)), size=Vec3(*(hi - lo)))
+    return entity
+
+
+def build_level_entities(level, prop_class=Entity, individual=None, flatten=True, chunk_size=CHUNK_SIZE, **kwargs):
+    """创建关卡中的道具，返回 (props, static_nodes)
+
+    individual: (P,) bool，需要保持独立的道具 (例如躲藏者)；flatten=False 时所有道具都是独立的
+    props: 长度为 P 的列表，独立的道具是 prop_class 实体，被合并的是 None
+    static_nodes: 合并后的实体，每个 (块, 材质) 一个；半透明的道具单独成组，按 alpha 混合绘制
+    """
+    n = level.n_props
+    models = np.array([level.model(i) for i in range(n)])
+    keep = np.ones(n, dtype=bool) if not flatten else ~np.isin(models, MERGEABLE_MODELS)
+    if flatten and individual is not None:
+        keep |= np.asarray(individual, dtype=bool)
+
+    props = [None] * n
+    for i in np.flatnonzero(keep).tolist():
+        props[i] = create_prop_entity(prop_class, level, i, **kwargs)
+
+    static_nodes = []
+    merged = np.flatnonzero(~keep)
+    if len(merged):
+        center = (level.lo[merged] + level.hi[merged]) / 2
+        chunk = np.floor(center[:, [0, 2]] / chunk_size).astype(np.int64)
+        transparent = level.color[merged, 3] < 255
+        order = np.lexsort((transparent, chunk[:, 1], chunk[:, 0]))
+        keys = np.column_stack([chunk, transparent])[order]
+        starts = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1
+        for group in np.split(order, starts):
+            static_nodes.append(_merged_entity(level, merged[group], models[merged[group]], chunk[group[0]].tolist(),
+                                               bool(transparent[group[0]])))
+    return props, static_nodes
+
+
+def _merged_entity(level, idx, models, chunk, transparent):
+    vertices, normals, colors = [], [], []
+    for name in np.unique(models):
+        sel = idx[models == name]
+        tv, tn = _template(name)
+        scale = level.scale[sel].astype(np.float32)[:, None]
+        vertices.append((tv[None] * scale + level.pos[sel].astype(np.float32)[:, None]).reshape(-1, 3))
+        # 轴对齐缩放下法线按 1/scale 变换再归一化
+        n = tn[None] / scale
+        normals.append((n / np.linalg.norm(n, axis=2, keepdims=True)).reshape(-1, 3))
+        colors.append(np.repeat(level.color[sel].astype(np.float32) / 255, len(tv), axis=0))
+    mesh = Mesh(vertices=np.concatenate(vertices).ravel(), normals=np.concatenate(normals).ravel(),
+                colors=np.concatenate(colors).ravel(), mode='triangle')
+
+    entity = Entity(model=mesh, name=f"static_{chunk[0]}_{chunk[1]}{'_alpha' if transparent else ''}")
+    if transparent:
+        entity.set_transparency(TransparencyAttrib.M_alpha)
+    # 每个道具一个碰撞盒 (世界坐标)，放在同一个碰撞节点里，玩家仍然不能穿过被合并的道具
+    entity.collider = Collider(entity, [CollisionBox(Point3(*lo), Point3(*hi))
+                                        for lo, hi in zip(level.lo[idx].tolist(), level.hi[idx].tolist())])
+    return entity
+
+
+def scene_stats(root=scene):
+    """场景图的规模：节点数、GeomNode 数、Geom 数 (不做视锥裁剪时的 draw call 数) 和碰撞体数"""
+    nodes = root.find_all_matches('**')
+    geom_nodes = [path.node() for path in nodes if path.node().is_geom_node()]
+    collision_nodes = [path.node() for path in nodes if path.node().is_collision_node()]
+    return {
+        'nodes': nodes.get_num_paths(),
+        'geom_nodes': len(geom_nodes),
+        'draw_calls': sum(node.get_num_geoms() for node in geom_nodes),
+        'collision_nodes': len(collision_nodes),
+        'collision_solids': sum(node.get_num_solids() for node in collision_nodes),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the flattened and per-prop scene of a level offscreen')
+    parser.add_argument('--props', type=int, default=None, help='generated office level size (default: the office level)')
+    parser.add_argument('--level', help='compiled .level file')
+    parser.add_argument('--hiders', type=int, default=5)
+    parser.add_argument('--frames', type=int, default=60)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    from ursina import Ursina, camera, destroy
+    from level import as_level, generate_office_level
+
+    app = Ursina(window_type='offscreen')
+    level = generate_office_level(args.props, args.seed) if args.props else as_level(args.level)
+    rng = np.random.default_rng(args.seed)
+    hider_groups = rng.choice(level.hider_groups, min(args.hiders, len(level.hider_groups)), replace=False)
+    individual = np.isin(level.group, hider_groups)
+    camera.position = (0, 30, -40)
+    camera.look_at((0, 0, 0))
+
+    for flatten in (False, True):
+        start = time.perf_counter()
+        props, static_nodes = build_level_entities(level, individual=individual, flatten=flatten, collider='box')
+        build_time = time.perf_counter() - start
+        stats = scene_stats()
+        app.step()
+        start = time.perf_counter()
+        for _ in range(args.frames):
+            app.step()
+        frame_ms = (time.perf_counter() - start) * 1000 / args.frames
+        print(f"{'flattened' if flatten else 'per-prop':>9}: props={level.n_props} build={build_time:.2f}s "
+              f"frame={frame_ms:.2f}ms " + ' '.join(f'{k}={v}' for k, v in stats.items()))
+        for entity in [p for p in props if p is not None] + static_nodes:
+            destroy(entity)
+        app.step()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,327 @@
+# selfplay.py
+# 自我对弈：躲藏者也是会学习的策略。每个回合开始时 (准备阶段) 躲藏者策略为回合中的每个躲藏者选一个躲藏条目，
+# 之后躲藏者不再移动；搜捕者和躲藏者都从过去的快照组成的对手池中按回合抽样。
+# 所有回合、学习中的搜捕者和所有对手的同一个决策都在一次批量前向计算里完成 (权重拼成一个矩阵，每层一次矩阵乘法)，
+# 不会像 batch=1 的 train_reinforce 那样每个回合每一步一次前向。
+#
+# 训练入口是 train.py 的 ALGORITHM = 'selfplay'；这里只有 NumPy (环境、对手池和躲藏者策略的梯度)，
+# 工作进程和评估不需要 torch。
+#   python src/selfplay.py --envs 256 --steps 200     # 批量推理和准备阶段的速度
+import argparse
+import time
+
+import numpy as np
+
+from level import as_level
+from numpy_policy import LAYERS, NumpyActorCritic
+from sim_core import ACTION_N, OBSERVATION_N, SEEKER_START
+from vec_env import VecHideAndSeekEnv
+
+POOL_SIZE = 8           # 每一方保留的过去快照数
+LATEST_PROB = 0.5       # 学习中的搜捕者面对当前躲藏者策略的概率 (其余回合从快照中均匀抽一个)
+HIDER_LR = 0.05
+HIDER_BASELINE_DECAY = 0.99
+
+
+def hider_features(level, exposure=None):
+    """每个候选躲藏条目 (level.hider_groups) 的特征 (G, F)：位置、离搜捕者出生点的距离、暴露度、类型 one-hot
+
+    exposure: 可选 (n_groups,) 每个条目的暴露度 (visibility.VisibilityField.group_exposure())，None 时为 0
+    """
+    groups = level.hider_groups
+    xz = level.entry_pos[groups][:, [0, 2]]
+    distance = np.linalg.norm(xz - np.array(SEEKER_START)[[0, 2]], axis=1)
+    kinds = np.eye(len(level.type_names))[level.entry_kind[groups]]
+    exposure = np.zeros(len(groups)) if exposure is None else np.asarray(exposure)[groups]
+    return np.column_stack([xz / 20, distance / 20, exposure, kinds]).astype(np.float32)
+
+
+class HiderPolicy:
+    """躲藏者策略：每个候选条目的得分 = features @ w，每个躲藏者依次在剩下的条目中按 softmax(得分) 选一个
+
+    (Plackett-Luce，用 Gumbel top-k 一次抽完)。weights[0] 是正在学习的策略，其余是过去的快照 (对手池)。
+    """
+    def __init__(self, features, num_hiders, pool_size=POOL_SIZE, lr=HIDER_LR):
+        self.features = features
+        self.num_hiders = num_hiders
+        self.pool_size = pool_size
+        self.lr = lr
+        self.weights = np.zeros((1, features.shape[1]), dtype=np.float32) # 学习中的策略 + 快照
+        self.baseline = 0.0
+
+    @property
+    def n_snapshots(self):
+        return len(self.weights) - 1
+
+    def logits(self, members):
+        """members (B,) 对手池中的编号 -> (B, G)，一次矩阵乘法算完所有回合"""
+        return self.weights[members] @ self.features.T
+
+    def choose(self, members, rng):
+        """返回每个回合选中的条目下标 (B, num_hiders) (hider_groups 的下标)"""
+        logits = self.logits(members)
+        keys = logits - np.log(-np.log(rng.random(logits.shape))) # 加 Gumbel 噪声后取最大的 k 个
+        return np.argsort(-keys, axis=1)[:, :self.num_hiders]
+
+    def log_prob_grad(self, choices):
+        """学习中的策略下，选出 choices (B, k) 这个顺序的 log 概率对 w 的梯度 (B, F)"""
+        logits = self.logits(np.zeros(len(choices), dtype=np.int64)).astype(np.float64)
+        grad = np.zeros((len(choices), self.features.shape[1]))
+        rows = np.arange(len(choices))
+        for j in range(choices.shape[1]):
+            p = np.exp(logits - logits.max(axis=1, keepdims=True))
+            p /= p.sum(axis=1, keepdims=True)
+            grad += self.features[choices[:, j]] - p @ self.features
+            logits[rows, choices[:, j]] = -np.inf # 已经被前面的躲藏者选走
+        return grad
+
+    def update(self, choices, rewards):
+        """REINFORCE (滑动平均基线)：choices (B, k) 是学习中的策略选的，rewards (B,) 是没被找到的躲藏者比例"""
+        if not len(choices):
+            return 0.0
+        advantage = rewards - self.baseline
+        self.weights[0] += self.lr * (advantage[:, None] * self.log_prob_grad(choices)).mean(axis=0)
+        self.baseline = HIDER_BASELINE_DECAY * self.baseline + (1 - HIDER_BASELINE_DECAY) * float(rewards.mean())
+        return float(rewards.mean())
+
+    def snapshot(self):
+        """把当前策略加入对手池 (超过 pool_size 时丢掉最旧的)"""
+        snapshots = np.concatenate([self.weights[1:], self.weights[:1]])[-self.pool_size:]
+        self.weights = np.concatenate([self.weights[:1], snapshots])
+
+    def state_dict(self):
+        return {'weights': self.weights.copy(), 'baseline': self.baseline}
+
+    def load_state_dict(self, state):
+        self.weights = np.asarray(state['weights'], dtype=np.float32)
+        self.baseline = float(state['baseline'])
+
+
+class SeekerPool:
+    """过去的搜捕者快照 (ActorCritic 权重)，每层按对手堆叠，另外可以放一份学习中的搜捕者 (set_learner)
+
+    每一层把所有对手 (和学习中的搜捕者) 的权重拼成一个 (in, M*out) 矩阵，所有回合一次矩阵乘法算出每个成员的输出，
+    再取出各回合自己的那一份 (池子不大时比按回合 gather 权重做 batched matmul 快一倍)。
+    成员编号 0..len(pool)-1 是快照，learner_member 是学习中的搜捕者。
+    """
+    def __init__(self, pool_size=POOL_SIZE):
+        self.pool_size = pool_size
+        self.weights = {}  # name -> (P, out, in) 快照
+        self.biases = {}   # name -> (P, out)
+        self.learner = None
+        self.stacked = {}         # name -> (in, M*out)，M = P (+1 个学习中的搜捕者)
+        self.stacked_biases = {}  # name -> (M, out)
+
+    def __len__(self):
+        return len(self.biases['fc1']) if self.biases else 0
+
+    @property
+    def learner_member(self):
+        return len(self)
+
+    @staticmethod
+    def _layers(checkpoint):
+        if isinstance(checkpoint, str) and checkpoint.endswith('.npz'):
+            return NumpyActorCritic.load(checkpoint).layers
+        return NumpyActorCritic.from_checkpoint(checkpoint).layers
+
+    def add(self, checkpoint):
+        """checkpoint: 模型的 state_dict、训练状态 dict 或 .pth / .npz 路径 (超过 pool_size 时丢掉最旧的)"""
+        layers = self._layers(checkpoint)
+        for name in LAYERS:
+            w, b = layers[name]
+            if name in self.weights:
+                w = np.concatenate([self.weights[name], w[None]])[-self.pool_size:]
+                b = np.concatenate([self.biases[name], b[None]])[-self.pool_size:]
+            else:
+                w, b = w[None], b[None]
+            self.weights[name], self.biases[name] = w, b
+        self._stack()
+
+    def set_learner(self, checkpoint):
+        """学习中的搜捕者的当前权重 (每次更新之后调用)，它和对手在同一次前向中计算"""
+        self.learner = self._layers(checkpoint)
+        self._stack()
+
+    def _stack(self):
+        for name in LAYERS:
+            w, b = self.weights.get(name), self.biases.get(name)
+            if self.learner is not None:
+                lw, lb = self.learner[name]
+                w = lw[None] if w is None else np.concatenate([w, lw[None]])
+                b = lb[None] if b is None else np.concatenate([b, lb[None]])
+            if w is None:
+                continue
+            self.stacked[name] = np.ascontiguousarray(w.transpose(2, 0, 1).reshape(w.shape[2], -1))
+            self.stacked_biases[name] = b
+
+    def _linear(self, name, x, members):
+        m, out = self.stacked_biases[name].shape
+        y = (x @ self.stacked[name]).reshape(len(x), m, out)
+        return y[np.arange(len(x)), members] + self.stacked_biases[name][members]
+
+    def forward(self, obs, members):
+        """obs (B, obs_dim)，members (B,) -> (动作概率 (B, n_actions), 价值 (B,))，与 NumpyActorCritic.forward 相同的计算"""
+        x = np.asarray(obs, dtype=np.float32)
+        x = np.maximum(self._linear('fc1', x, members), 0)
+        x = np.maximum(self._linear('fc2', x, members), 0)
+        logits = self._linear('actor', x, members)
+        probs = np.exp(logits - logits.max(axis=1, keepdims=True))
+        return probs / probs.sum(axis=1, keepdims=True), self._linear('critic', x, members)[:, 0]
+
+    def probs(self, obs, members):
+        return self.forward(obs, members)[0]
+
+    def act(self, obs, members, rng):
+        return sample_actions(self.probs(obs, members), rng)
+
+
+def sample_actions(probs, rng):
+    """每行按概率采样一个动作"""
+    actions = (probs.cumsum(axis=1) < rng.random((len(probs), 1))).sum(axis=1)
+    return np.minimum(actions, probs.shape[1] - 1)
+
+
+class SelfPlayEnv:
+    """学习中的搜捕者和躲藏者在同一个批量环境中对弈
+
+    前 num_envs 个回合由学习中的搜捕者控制 (step() 的输入输出只有这些回合，可以直接交给 ppo.collect_rollout)，
+    躲藏者以 LATEST_PROB 的概率是学习中的躲藏者策略，否则从躲藏者快照中抽一个；
+    后 opponent_envs 个回合的搜捕者从 seeker_pool 中抽样 (这时 seeker_pool 至少要有一个快照)，
+    躲藏者总是学习中的策略。
+    学习中的躲藏者在所有回合中的选择和结果由 pop_hider_episodes() 取出用于更新。
+    """
+    def __init__(self, num_envs, opponent_envs, hider_policy, seeker_pool, seed=None, level=None):
+        self.num_envs = num_envs
+        self.opponent_envs = opponent_envs
+        self.total_envs = num_envs + opponent_envs
+        self.env = VecHideAndSeekEnv(self.total_envs, seed=seed, level=level)
+        self.sim = self.env.sim
+        self.level = self.env.level
+        self.observation_space_n = self.env.observation_space_n
+        self.action_space_n = self.env.action_space_n
+        self.max_steps = self.env.max_steps
+        self.hider_policy = hider_policy
+        self.seeker_pool = seeker_pool
+        self.rng = np.random.default_rng(seed)
+        self.hider_member = np.zeros(self.total_envs, dtype=np.int64)
+        self.seeker_member = np.zeros(opponent_envs, dtype=np.int64)
+        self.hider_choices = np.zeros((self.total_envs, hider_policy.num_hiders), dtype=np.int64)
+        self._hider_episodes = []
+        self._obs = None
+        self._opponent_actions = None
+
+    def get_rng_state(self):
+        return self.env.get_rng_state()
+
+    def set_rng_state(self, state):
+        self.env.set_rng_state(state)
+
+    def _begin(self, env_ids):
+        """准备阶段：为这些回合抽对手，并用一次批量前向为所有回合选好躲藏位置"""
+        members = np.zeros(len(env_ids), dtype=np.int64)
+        snapshots = self.hider_policy.n_snapshots
+        if snapshots:
+            past = self.rng.random(len(env_ids)) >= LATEST_PROB
+            past &= env_ids < self.num_envs # 对手搜捕者的回合用来训练学习中的躲藏者
+            members[past] = self.rng.integers(1, snapshots + 1, int(past.sum()))
+        self.hider_member[env_ids] = members
+        opponents = env_ids[env_ids >= self.num_envs] - self.num_envs
+        if len(opponents):
+            self.seeker_member[opponents] = self.rng.integers(0, len(self.seeker_pool), len(opponents))
+        choices = self.hider_policy.choose(members, self.rng)
+        self.hider_choices[env_ids] = choices
+        self.sim.set_hiders(env_ids, self.level.hider_groups[choices])
+
+    def reset(self):
+        self._obs = self.env.reset()
+        self._begin(np.arange(self.total_envs))
+        return self._obs[:self.num_envs]
+
+    def act(self, obs):
+        """学习中的搜捕者和对手搜捕者在一次批量前向中选动作 (需要先 seeker_pool.set_learner)
+
+        obs: 学习中的搜捕者的观察 (num_envs, obs_dim)；返回它们的 (动作, 价值, log 概率)，
+        对手的动作留给下一次 step()。可以作为 ppo.collect_rollout 的 act。
+        """
+        n = self.num_envs
+        members = np.concatenate([np.full(n, self.seeker_pool.learner_member), self.seeker_member])
+        probs, values = self.seeker_pool.forward(np.concatenate([obs, self._obs[n:]]), members)
+        actions = sample_actions(probs, self.rng)
+        self._opponent_actions = actions[n:]
+        log_probs = np.log(np.maximum(probs[np.arange(n), actions[:n]], 1e-12))
+        return actions[:n], values[:n], log_probs
+
+    def step(self, actions):
+        """actions: 学习中的搜捕者的动作 (num_envs,)；对手搜捕者的动作来自上一次 act()，没有时由对手池单独算出"""
+        if self.opponent_envs:
+            opponent, self._opponent_actions = self._opponent_actions, None
+            if opponent is None:
+                opponent = self.seeker_pool.act(self._obs[self.num_envs:], self.seeker_member, self.rng)
+            actions = np.concatenate([np.asarray(actions).reshape(self.num_envs), opponent])
+        obs, rewards, dones, info = self.env.step(actions)
+        done_ids = np.flatnonzero(dones)
+        if len(done_ids):
+            mine = done_ids[self.hider_member[done_ids] == 0]
+            if len(mine):
+                survived = 1 - info['hiders_found'][mine] / self.hider_policy.num_hiders
+                self._hider_episodes.append((self.hider_choices[mine].copy(), survived))
+            self._begin(done_ids)
+        self._obs = obs
+        n = self.num_envs
+        info = dict({name: value[:n] for name, value in info.items()},
+                    opponent_success=info['success'][n:], opponent_dones=dones[n:])
+        return obs[:n], rewards[:n], dones[:n], info
+
+    def pop_hider_episodes(self):
+        """学习中的躲藏者结束的回合：(选择 (B, k), 没被找到的比例 (B,))"""
+        episodes, self._hider_episodes = self._hider_episodes, []
+        if not episodes:
+            return np.zeros((0, self.hider_policy.num_hiders), dtype=np.int64), np.zeros(0)
+        return np.concatenate([c for c, _ in episodes]), np.concatenate([r for _, r in episodes])
+
+
+def benchmark(num_envs, steps, pool_size=POOL_SIZE, seed=0):
+    """一半回合由学习中的搜捕者、一半由对手池中的搜捕者 (都是随机初始化的 ActorCritic) 控制，跑 steps 步，
+    返回 (每步毫秒, 其中批量前向和采样的毫秒)"""
+    import torch # 只在这里用 torch 生成与训练时同样大小的网络
+    from model import ActorCritic
+    level = as_level(None)
+    rng = np.random.default_rng(seed)
+    torch.manual_seed(seed)
+    pool = SeekerPool(pool_size)
+    for _ in range(pool_size):
+        pool.add(ActorCritic(OBSERVATION_N, ACTION_N).state_dict())
+    pool.set_learner(ActorCritic(OBSERVATION_N, ACTION_N).state_dict())
+    hiders = HiderPolicy(hider_features(level), 1, pool_size)
+    for _ in range(pool_size):
+        hiders.weights[0] = rng.normal(size=hiders.weights.shape[1])
+        hiders.snapshot()
+    learner_envs = num_envs // 2
+    env = SelfPlayEnv(learner_envs, num_envs - learner_envs, hiders, pool, seed=seed, level=level)
+    obs = env.reset()
+    inference = 0.0
+    start = time.perf_counter()
+    for _ in range(steps):
+        t = time.perf_counter()
+        actions, _, _ = env.act(obs)
+        inference += time.perf_counter() - t
+        obs, _, _, _ = env.step(actions)
+    total = time.perf_counter() - start
+    return total / steps * 1000, inference / steps * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Self-play opponent pool throughput')
+    parser.add_argument('--envs', type=int, default=256, help='learner + opponent envs (half each)')
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--pool', type=int, default=POOL_SIZE)
+    args = parser.parse_args()
+    step_ms, inference_ms = benchmark(args.envs, args.steps, args.pool)
+    print(f'--- {args.envs} envs, pool of {args.pool}: {step_ms:.2f} ms/step, '
+          f'of which {inference_ms:.2f} ms batched learner + opponent inference '
+          f'({args.envs * 1000 / step_ms:.0f} env steps/s) ---')
+
+
+if __name__ == '__main__':
+    main()
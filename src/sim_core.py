@@ -0,0 +1,169 @@
+# sim_core.py
+# 纯NumPy的模拟核心 (Headless simulation core)
+# 不依赖Ursina/Panda3D，所有状态都是数组，第一维是环境编号 (N个独立回合)
+import numpy as np
+
+from ray_kernel import raycast_aabbs
+from spatial_index import NearestPropIndex
+
+# --- 与 game_env.py 中 Ursina 版本保持一致的规则常量 ---
+SEEKER_START = (0, 0.5, -15)
+# 固定时间步长 (fixed timestep)：每个模拟 tick 前进 SIM_DT 秒，与机器渲染速度无关
+# 每个 tick 移动 0.5 单位 / 转 7.2 度，与旧版 speed=250, turn_speed=3600 配合 time.dt≈0.002 时一致
+SIM_DT = 0.1
+SEEKER_SPEED = 5         # 单位/秒
+SEEKER_TURN_SPEED = 72   # 度/秒
+STARTING_AMMO = 10
+MAX_STEPS = 1000         # 每局的最大 tick 数
+FIRE_RANGE = 10
+EYE_HEIGHT = 1           # 射线起点 = seeker.world_position + Vec3(0,1,0)
+
+OBSERVATION_N = 9 # AI位置(2), AI朝向(1), 最近3个未检查道具的相对位置(3*2=6)
+ACTION_N = 5      # 0:前进, 1:后退, 2:左转, 3:右转, 4:开火
+NUM_NEAREST = 3
+
+# 奖励规则 (Reward rules)
+REWARD_STEP = -0.01
+REWARD_FIRE = -0.1
+REWARD_HIT = 10
+REWARD_MISS = -1
+REWARD_WIN = 100
+
+
+class NumpySim:
+    """N个独立回合的数组化模拟 (struct-of-arrays)
+
+    level: 编译好的关卡 (level.Level)
+    dt: 每个 tick 的模拟时长 (秒)
+    frame_skip: 每次 step 把同一个动作重复执行多少个 tick (开火只在第一个 tick 生效)
+    seed: 躲藏者抽样所用随机数生成器的种子，相同种子得到相同的回合序列
+    hider_weights: 可选 (len(level.hider_groups),) 躲藏者条目的抽样权重 (例如 visibility.VisibilityField.hider_weights())，
+                   None 时均匀抽样
+    """
+
+    def __init__(self, level, num_hiders, num_envs=1, max_steps=MAX_STEPS,
+                 dt=SIM_DT, frame_skip=1, seed=None, hider_weights=None):
+        self.num_envs = num_envs
+        self.num_hiders = num_hiders
+        self.max_steps = max_steps
+        self.dt = dt
+        self.frame_skip = frame_skip
+        self.level = level
+        self.n_props = level.n_props
+        self.rng = np.random.default_rng(seed)
+        self.hider_weights = None if hider_weights is None else np.asarray(hider_weights, dtype=np.float64)
+
+        n, p = num_envs, self.n_props
+        self.seeker_pos = np.zeros((n, 3))
+        self.seeker_rot = np.zeros(n)
+        self.ammo = np.zeros(n, dtype=np.int64)
+        self.step_count = np.zeros(n, dtype=np.int64)
+        self.hiders_found = np.zeros(n, dtype=np.int64)
+        self.is_hider = np.zeros((n, p), dtype=bool)
+        self.hider_groups = np.zeros((n, num_hiders), dtype=np.int64) # 每个回合抽到的躲藏者条目
+        self.shot = np.zeros((n, p), dtype=bool)
+        # 最近未检查道具的空间索引，checked 掩码由它增量维护
+        self.index = NearestPropIndex(level.pos, num_envs=n, grid=level.grid)
+        self.checked = self.index.checked
+
+    def seed(self, seed):
+        self.rng = np.random.default_rng(seed)
+
+    def reset(self, env_ids=None):
+        """重置指定的回合 (默认全部)"""
+        if env_ids is None:
+            env_ids = np.arange(self.num_envs)
+        env_ids = np.asarray(env_ids)
+        k = len(env_ids)
+        self.seeker_pos[env_ids] = SEEKER_START
+        self.seeker_rot[env_ids] = 0
+        self.ammo[env_ids] = STARTING_AMMO
+        self.step_count[env_ids] = 0
+        self.hiders_found[env_ids] = 0
+        self.shot[env_ids] = False
+        self.index.reset(env_ids)
+        # 等价于 random.sample(hider_groups, NUM_HIDERS)，每个回合独立抽样
+        hider_groups = self.level.hider_groups
+        keys = self.rng.random((k, len(hider_groups)))
+        if self.hider_weights is not None:
+            # 加权不放回抽样 (Efraimidis-Spirakis)：key = -log(u) / w 最小的 NUM_HIDERS 个
+            keys = -np.log1p(-keys) / self.hider_weights
+        self.set_hiders(env_ids, hider_groups[np.argsort(keys, axis=1)[:, :self.num_hiders]])
+
+    def set_hiders(self, env_ids, groups):
+        """指定回合的躲藏者条目 (k, num_hiders)，例如自我对弈中由躲藏者策略选出的 (reset 之后、第一次 step 之前调用)"""
+        self.hider_groups[env_ids] = groups
+        self.is_hider[env_ids] = (self.level.group[None, :, None] == groups[:, None, :]).any(axis=2)
+
+    def forward(self):
+        """seeker.forward 在 xz 平面上的分量 (N,2)"""
+        rad = np.radians(self.seeker_rot)
+        return np.stack([np.sin(rad), np.cos(rad)], axis=1)
+
+    def step(self, actions):
+        """所有回合同时执行一个动作 (frame_skip 个 tick)，返回 (reward (N,), done (N,))
+
+        奖励是这几个 tick 的奖励之和；某个回合中途结束后，剩下的 tick 不再推进它。
+        """
+        actions = np.asarray(actions)
+        reward = np.zeros(self.num_envs)
+        done = np.zeros(self.num_envs, dtype=bool)
+        for tick in range(self.frame_skip):
+            active = ~done
+            if tick > 0:
+                # 开火不重复，之后的 tick 只推进时间
+                actions = np.where(actions == 4, -1, actions)
+            r, d = self._tick(actions, active)
+            reward += r
+            done |= d
+            if done.all():
+                break
+        return reward, done
+
+    def _tick(self, actions, active):
+        """推进一个固定时间步长，只作用于 active 的回合"""
+        self.step_count += active
+        reward = np.where(active, REWARD_STEP, 0.0)
+        actions = np.where(active, actions, -1)
+
+        fwd = self.forward()
+        move = (actions == 0).astype(np.float64) - (actions == 1)
+        self.seeker_pos[:, [0, 2]] += fwd * (move * SEEKER_SPEED * self.dt)[:, None]
+        turn = (actions == 3).astype(np.float64) - (actions == 2)
+        self.seeker_rot += turn * SEEKER_TURN_SPEED * self.dt
+
+        firing = np.flatnonzero(actions == 4)
+        if len(firing):
+            reward[firing] += REWARD_FIRE
+            self.ammo[firing] -= 1
+            origins = self.seeker_pos[firing] + (0, EYE_HEIGHT, 0)
+            directions = np.zeros((len(firing), 3))
+            directions[:, [0, 2]] = fwd[firing]
+            hit_idx, _ = raycast_aabbs(origins, directions, self.level.lo, self.level.hi, FIRE_RANGE)
+
+            hit_envs, hit_props = firing[hit_idx >= 0], hit_idx[hit_idx >= 0]
+            self.index.mark_checked(hit_envs, hit_props)
+            # Prop.get_shot(): 只有未被射中过的躲藏者才算命中
+            good = self.is_hider[hit_envs, hit_props] & ~self.shot[hit_envs, hit_props]
+            self.shot[hit_envs[good], hit_props[good]] = True
+            self.hiders_found[hit_envs[good]] += 1
+            reward[hit_envs[good]] += REWARD_HIT
+            reward[hit_envs[~good]] += REWARD_MISS
+
+        won = self.hiders_found == self.num_hiders
+        done = active & (won | (self.ammo <= 0) | (self.step_count >= self.max_steps))
+        reward[done & won] += REWARD_WIN
+        return reward, done
+
+    def observe(self):
+        """生成所有回合的观察向量 (N, OBSERVATION_N)"""
+        obs = np.zeros((self.num_envs, OBSERVATION_N))
+        obs[:, 0] = self.seeker_pos[:, 0] / 20
+        obs[:, 1] = self.seeker_pos[:, 2] / 20
+        obs[:, 2] = self.seeker_rot / 360
+
+        seeker_xz = self.seeker_pos[:, [0, 2]]
+        nearest, valid = self.index.nearest(seeker_xz, NUM_NEAREST)
+        rel = self.index.positions[nearest] - seeker_xz[:, None] # (N,k,2)
+        obs[:, 3:] = (np.where(valid[..., None], rel, 0) / 20).reshape(self.num_envs, -1)
+        return obs
@@ -0,0 +1,163 @@
+# spatial_index.py
+# 最近未检查道具查询 (nearest unchecked props)
+# 道具位置在一个关卡中是固定的，所以网格只在关卡加载时构建一次；
+# 之后只需要在 checked_by_ai 变化时增量更新掩码
+import numpy as np
+
+# 道具数量不超过这个值时直接对所有道具求 top-k，比网格搜索更快
+BRUTE_FORCE_PROPS = 64
+PROPS_PER_CELL = 2 # 构建网格时每个格子的平均道具数
+
+
+def build_grid(positions, cell_size=None):
+    """在 xz 平面上为 (P,2) 的道具位置构建均匀网格
+
+    返回 dict: origin (2,), cell_size, shape (2,), cell_props (C,M) 每个格子里的道具编号
+    (不足 M 个用 -1 填充), prop_cell (P,) 每个道具所在的格子。
+    道具位置在一个关卡中是固定的，所以结果可以随关卡一起保存 (见 level.py)。
+    """
+    positions = np.asarray(positions, dtype=np.float64)
+    n_props = len(positions)
+    if n_props == 0:
+        return {'origin': np.zeros(2), 'cell_size': 1.0, 'shape': np.array([1, 1]),
+                'cell_props': np.full((1, 1), -1, dtype=np.int64), 'prop_cell': np.zeros(0, dtype=np.int64)}
+    lo = positions.min(axis=0)
+    hi = positions.max(axis=0)
+    if cell_size is None:
+        area = max(np.prod(np.maximum(hi - lo, 1e-6)), 1e-6)
+        cell_size = np.sqrt(area * PROPS_PER_CELL / n_props)
+    cell_size = float(cell_size)
+    shape = np.floor((hi - lo) / cell_size).astype(np.int64) + 1
+
+    cells = np.clip(np.floor((positions - lo) / cell_size).astype(np.int64), 0, shape - 1)
+    prop_cell = cells[:, 0] * shape[1] + cells[:, 1]
+    counts = np.bincount(prop_cell, minlength=int(shape.prod()))
+    cell_props = np.full((len(counts), max(1, counts.max())), -1, dtype=np.int64)
+    order = np.argsort(prop_cell, kind='stable')
+    slot = np.arange(n_props) - np.repeat(np.cumsum(counts) - counts, counts)
+    cell_props[prop_cell[order], slot] = order
+    return {'origin': lo, 'cell_size': cell_size, 'shape': shape, 'cell_props': cell_props, 'prop_cell': prop_cell}
+
+
+class NearestPropIndex:
+    """xz 平面上的均匀网格索引，支持 N 个 seeker 同时查询最近的 k 个未检查道具
+
+    checked (N,P) 是每个回合的已检查掩码，用 mark_checked / reset 增量维护。
+    查询结果与 "按距离稳定排序后取前k个" 完全一致 (距离相同按道具编号排序)。
+    grid: 可选，build_grid() 的结果 (例如编译好的关卡中保存的网格)，省去重新构建
+    """
+    def __init__(self, positions, num_envs=1, cell_size=None, grid=None):
+        positions = np.asarray(positions, dtype=np.float64)
+        if positions.shape[1] == 3: # (P,3) 的世界坐标只取 xz
+            positions = positions[:, [0, 2]]
+        self.positions = positions
+        self.n_props = len(self.positions)
+        self.num_envs = num_envs
+        self.checked = np.zeros((num_envs, self.n_props), dtype=bool)
+        if grid is None:
+            grid = build_grid(self.positions, cell_size)
+        self.origin = np.asarray(grid['origin'], dtype=np.float64)
+        self.cell_size = float(grid['cell_size'])
+        self.shape = np.asarray(grid['shape'], dtype=np.int64)
+        self.cell_props = grid['cell_props']
+        self.prop_cell = grid['prop_cell']
+        # 每个回合每个格子中未检查道具的数量，用来跳过已经查完的格子
+        self.cell_counts = np.bincount(self.prop_cell, minlength=int(self.shape.prod()))
+        self.unchecked_count = np.tile(self.cell_counts, (self.num_envs, 1))
+
+    def _cell_of(self, points):
+        cells = np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+        return np.clip(cells, 0, self.shape - 1)
+
+    def reset(self, env_ids=None):
+        """把指定回合的所有道具恢复为未检查"""
+        if env_ids is None:
+            env_ids = np.arange(self.num_envs)
+        self.checked[env_ids] = False
+        self.unchecked_count[env_ids] = self.cell_counts
+
+    def mark_checked(self, env_ids, prop_ids):
+        """checked_by_ai 从 False 变成 True 时调用 (重复标记会被忽略)"""
+        pairs = np.unique(np.asarray(env_ids, dtype=np.int64) * self.n_props + np.asarray(prop_ids, dtype=np.int64))
+        env_ids, prop_ids = pairs // self.n_props, pairs % self.n_props
+        new = ~self.checked[env_ids, prop_ids]
+        env_ids, prop_ids = env_ids[new], prop_ids[new]
+        self.checked[env_ids, prop_ids] = True
+        np.subtract.at(self.unchecked_count, (env_ids, self.prop_cell[prop_ids]), 1)
+
+    def nearest(self, points, k):
+        """每个回合最近的 k 个未检查道具
+
+        points: (N,2) 每个回合 seeker 的 xz 位置
+        返回 (idx (N,k), valid (N,k))，未检查道具不足 k 个时 valid 为 False
+        """
+        points = np.asarray(points, dtype=np.float64)
+        n = len(points)
+        idx = np.zeros((n, k), dtype=np.int64)
+        valid = np.zeros((n, k), dtype=bool)
+        if k == 0 or self.n_props == 0:
+            return idx, valid
+        if self.n_props <= BRUTE_FORCE_PROPS:
+            return self._nearest_brute_force(points, k)
+
+        pending = np.arange(n)
+        radius = 1
+        while len(pending):
+            cand, dist, bound = self._gather(pending, points[pending], radius)
+            order = np.lexsort((cand, dist), axis=-1)[:, :k]
+            top = np.take_along_axis(cand, order, axis=1)
+            top_dist = np.take_along_axis(dist, order, axis=1)
+            found = np.isfinite(top_dist)
+            if top.shape[1] < k:
+                pad = k - top.shape[1]
+                top = np.pad(top, ((0, 0), (0, pad)))
+                top_dist = np.pad(top_dist, ((0, 0), (0, pad)), constant_values=np.inf)
+                found = np.pad(found, ((0, 0), (0, pad)))
+            # 窗口外的道具距离至少为 bound，第 k 个结果严格小于 bound 时结果确定
+            done = top_dist[:, -1] < bound
+            done |= np.isinf(bound)
+            ids = pending[done]
+            idx[ids], valid[ids] = np.where(found[done], top[done], 0), found[done]
+            pending = pending[~done]
+            radius *= 2
+        return idx, valid
+
+    def _nearest_brute_force(self, points, k):
+        rel = self.positions[None] - points[:, None]
+        dist = np.where(self.checked, np.inf, np.hypot(rel[..., 0], rel[..., 1]))
+        k_eff = min(k, self.n_props)
+        order = np.argsort(dist, axis=1, kind='stable')[:, :k_eff]
+        found = np.isfinite(dist[np.arange(len(points))[:, None], order])
+        idx = np.zeros((len(points), k), dtype=np.int64)
+        valid = np.zeros((len(points), k), dtype=bool)
+        idx[:, :k_eff] = np.where(found, order, 0)
+        valid[:, :k_eff] = found
+        return idx, valid
+
+    def _gather(self, env_ids, points, radius):
+        """收集以 seeker 所在格子为中心、半径 radius 个格子的窗口内的候选道具"""
+        center = self._cell_of(points)
+        lo = np.maximum(center - radius, 0)
+        hi = np.minimum(center + radius, self.shape - 1)
+        offsets = np.arange(-radius, radius + 1)
+        gx = center[:, 0, None, None] + offsets[None, :, None]
+        gz = center[:, 1, None, None] + offsets[None, None, :]
+        inside = (gx >= 0) & (gx < self.shape[0]) & (gz >= 0) & (gz < self.shape[1])
+        flat = np.clip(gx, 0, self.shape[0] - 1) * self.shape[1] + np.clip(gz, 0, self.shape[1] - 1)
+        inside &= self.unchecked_count[env_ids[:, None, None], flat] > 0
+        cell = np.where(inside, gx * self.shape[1] + gz, -1).reshape(len(env_ids), -1)
+
+        cand = np.where(cell[..., None] >= 0, self.cell_props[np.maximum(cell, 0)], -1).reshape(len(env_ids), -1)
+        usable = cand >= 0
+        safe = np.maximum(cand, 0)
+        rel = self.positions[safe] - points[:, None]
+        dist = np.hypot(rel[..., 0], rel[..., 1])
+        usable &= ~self.checked[env_ids[:, None], safe]
+        dist = np.where(usable, dist, np.inf)
+
+        # 窗口边界到 seeker 的最短距离；窗口已经到达网格边缘的方向没有更远的道具
+        win_lo = self.origin + lo * self.cell_size
+        win_hi = self.origin + (hi + 1) * self.cell_size
+        gap = np.concatenate([np.where(lo > 0, points - win_lo, np.inf),
+                              np.where(hi < self.shape - 1, win_hi - points, np.inf)], axis=1)
+        return cand, dist, gap.min(axis=1)
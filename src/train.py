@@ -1,99 +1,209 @@
-
 # train.py
-import torch
-import torch.optim as optim
-from torch.distributions import Categorical
+# 模块级只导入轻量的模块：torch 在训练开始时才导入，TensorBoard 只在 TENSORBOARD = True 时导入，
+# 这样 SubprocVecHideAndSeekEnv 的子进程 (spawn 会重新导入这个文件) 不需要加载它们。
+# python src/train.py --import-profile 可以查看每个模块的导入耗时
+import argparse
 import numpy as np
 from collections import deque
 import os  # 1. 导入 os 库
 
-# 导入TensorBoard的SummaryWriter
-from torch.utils.tensorboard import SummaryWriter
-
 from game_env import HideAndSeekEnv, NUM_HIDERS
-from model import ActorCritic
+from rollout import RolloutBuffer
+from vec_env import VecHideAndSeekEnv, SubprocVecHideAndSeekEnv
+from profiling import profiler, TraceWindow, import_profile, print_import_profile
 
 # --- 超参数 ---
 LEARNING_RATE = 0.0005
 GAMMA = 0.99 
 NUM_EPISODES = 50000
 SAVE_EVERY_EPISODES = 50  # 每多少个回合保存一次
+HEADLESS = True           # 使用纯NumPy模拟核心训练 (不打开Ursina窗口)
+ALGORITHM = 'reinforce'   # 'reinforce': 每回合一次更新 (REINFORCE with baseline); 'ppo': 批量环境 + PPO;
+                          # 'selfplay': PPO 搜捕者 + 会学习的躲藏者和对手池 (见 selfplay.py)
+PROFILE = False           # 记录各阶段耗时 (env.step, model 前向/反向等) 并写入TensorBoard
+TRACE_RANGE = None        # 例如 (100, 103): 对这几个回合 (PPO为update) 采样分析并导出 Chrome trace
+TENSORBOARD = True        # False: 不写 TensorBoard 日志 (也不导入 tensorboard)
+RECORD_TRAJECTORIES = None # 例如 'runs/trajectories/ppo': 把每一步写到这个目录 (见 trajectory.py，不支持多进程环境)
+
+# --- PPO 超参数 (ALGORITHM = 'ppo' 时使用) ---
+NUM_ENVS = 64             # 同时运行的回合数
+NUM_WORKERS = 1           # >1 时使用多进程环境 (SubprocVecHideAndSeekEnv)
+ROLLOUT_STEPS = 128       # 每次更新前每个环境采样的步数 (T)
+NUM_UPDATES = 5000
+PPO_EPOCHS = 4
+MINIBATCH_SIZE = 1024
+CLIP_EPS = 0.2
+VALUE_CLIP = 0.2
+ENTROPY_COEF = 0.01
+VALUE_COEF = 0.5
+GAE_LAMBDA = 0.95
+MAX_GRAD_NORM = 0.5
+SAVE_EVERY_UPDATES = 20
+
+# --- 自我对弈 (ALGORITHM = 'selfplay' 时使用，其余沿用 PPO 的设置) ---
+OPPONENT_ENVS = 32        # 另外这么多个回合由对手池中的搜捕者控制，只用来训练躲藏者
+SNAPSHOT_EVERY_UPDATES = 10 # 每多少次更新把双方的当前策略加入对手池
 
 # 1. 定义检查点文件路径
-CHECKPOINT_PATH = 'seeker_ai_checkpoint.pth'
+CHECKPOINT_DIR = 'checkpoints'            # 每种算法最近 KEEP_LAST_CHECKPOINTS 个检查点 + <前缀>_best.pth
+KEEP_LAST_CHECKPOINTS = 3
+CHECKPOINT_PATH = 'seeker_ai_checkpoint.pth' # 旧版单文件检查点，REINFORCE 在 CHECKPOINT_DIR 为空时从这里恢复
+
+def load_training_state(manager, model, optimizer, env):
+    """恢复最新的检查点 (模型、优化器、随机数状态)，没有时返回 None"""
+    from checkpoint import load_checkpoint, restore_rng_state
+    checkpoint = manager.load_latest()
+    # 旧版单文件检查点是 REINFORCE 保存的，PPO / 自我对弈不能接着用它的优化器状态和回合数
+    if checkpoint is None and manager.prefix == 'ckpt' and os.path.exists(CHECKPOINT_PATH):
+        checkpoint = load_checkpoint(CHECKPOINT_PATH)
+    if checkpoint is None:
+        print("--- No checkpoint found, starting from scratch ---")
+        return None
+    model.load_state_dict(checkpoint['model_state_dict'])
+    optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+    if 'rng_state' in checkpoint:
+        restore_rng_state(checkpoint['rng_state'])
+    if checkpoint.get('env_rng_state') is not None and hasattr(env, 'set_rng_state'):
+        env.set_rng_state(checkpoint['env_rng_state'])
+    return checkpoint
+
+def make_histories(checkpoint):
+    """最近100个回合的指标队列 (从检查点恢复，保证恢复后曲线连续)"""
+    saved = checkpoint.get('history', {}) if checkpoint else {}
+    return {name: deque(saved.get(name, []), maxlen=100) for name in ('reward', 'success', 'steps_on_success', 'ammo_on_success')}
+
+def training_state(model, optimizer, env, history, **progress):
+    from checkpoint import capture_rng_state
+    return dict(progress,
+                model_state_dict=model.state_dict(),
+                optimizer_state_dict=optimizer.state_dict(),
+                rng_state=capture_rng_state(),
+                env_rng_state=env.get_rng_state() if hasattr(env, 'get_rng_state') else None,
+                history={name: list(values) for name, values in history.items()})
+
+class NullWriter:
+    """TENSORBOARD = False 时代替 SummaryWriter，丢弃所有日志"""
+    def add_scalar(self, *args, **kwargs):
+        pass
+
+    def close(self):
+        pass
+
+def make_writer(log_dir):
+    if not TENSORBOARD:
+        return NullWriter()
+    from torch.utils.tensorboard import SummaryWriter # 导入 tensorboard 需要一两秒
+    return SummaryWriter(log_dir)
+
+def startup_modules():
+    """按当前设置，训练开始前会导入的模块 (--import-profile 用)"""
+    modules = ['train', 'torch', 'model', 'ppo', 'checkpoint']
+    if TENSORBOARD:
+        modules.append('torch.utils.tensorboard')
+    if ALGORITHM == 'selfplay':
+        modules += ['selfplay', 'visibility']
+    if not HEADLESS and ALGORITHM == 'reinforce':
+        modules.append('ursina_backend')
+    if RECORD_TRAJECTORIES:
+        modules.append('trajectory')
+    return modules
+
+def record_trajectories(env):
+    """RECORD_TRAJECTORIES 不为空时用 RecordingEnv 包装环境"""
+    if not RECORD_TRAJECTORIES:
+        return env
+    from trajectory import RecordingEnv
+    print(f"--- Recording trajectories to {RECORD_TRAJECTORIES} ---")
+    return RecordingEnv(env, RECORD_TRAJECTORIES)
 
 def main():
+    profiler.enabled = PROFILE
+    if ALGORITHM == 'ppo':
+        train_ppo()
+    elif ALGORITHM == 'selfplay':
+        train_selfplay()
+    else:
+        train_reinforce()
+
+def train_reinforce():
+    import torch
+    import torch.optim as optim
+    from torch.distributions import Categorical
+    from model import ActorCritic
+    from checkpoint import CheckpointManager
+
     # 初始化环境和模型
-    env = HideAndSeekEnv()
+    env = record_trajectories(HideAndSeekEnv(headless=HEADLESS))
     model = ActorCritic(env.observation_space_n, env.action_space_n)
     optimizer = optim.Adam(model.parameters(), lr=LEARNING_RATE)
+    # 每个回合最多 max_steps 步，缓冲区只分配一次
+    buffer = RolloutBuffer(env.max_steps, 1, env.observation_space_n)
     
     start_episode = 0
 
     # --- 2. 加载检查点 (如果存在) ---
-    if os.path.exists(CHECKPOINT_PATH):
-        print(f"--- Loading checkpoint from {CHECKPOINT_PATH} ---")
-        checkpoint = torch.load(CHECKPOINT_PATH)
-        model.load_state_dict(checkpoint['model_state_dict'])
-        optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+    manager = CheckpointManager(CHECKPOINT_DIR, keep_last=KEEP_LAST_CHECKPOINTS)
+    checkpoint = load_training_state(manager, model, optimizer, env)
+    if checkpoint is not None:
         start_episode = checkpoint['episode'] + 1 # 从下一个回合开始
         print(f"--- Resuming training from episode {start_episode} ---")
-    else:
-        print("--- No checkpoint found, starting from scratch ---")
 
-    writer = SummaryWriter(f'runs/hide_and_seek_ai_v{start_episode}') # 以起始回合命名，方便区分
+    writer = make_writer(f'runs/hide_and_seek_ai_v{start_episode}') # 以起始回合命名，方便区分
 
     # 初始化用于计算动态指标的数据队列
-    reward_history = deque(maxlen=100)
-    success_history = deque(maxlen=100)
-    steps_on_success_history = deque(maxlen=100)
-    ammo_on_success_history = deque(maxlen=100)
+    history = make_histories(checkpoint)
+    reward_history = history['reward']
+    success_history = history['success']
+    steps_on_success_history = history['steps_on_success']
+    ammo_on_success_history = history['ammo_on_success']
+
+    trace = TraceWindow(TRACE_RANGE, f'runs/trace_ep{TRACE_RANGE[0]}-{TRACE_RANGE[1] - 1}.json' if TRACE_RANGE else None, profiler)
 
     print("--- Starting Training with Visualization ---")
     # 修改循环以从正确的起始点开始
     for episode in range(start_episode, NUM_EPISODES):
-        log_probs = []
-        values = []
-        rewards = []
+        trace.before(episode)
+        buffer.reset()
         done = False
         
-        state = env.reset()
+        with profiler.phase('env.reset'):
+            state = env.reset()
         
+        # 采样阶段不构建计算图
         while not done:
             state_tensor = torch.FloatTensor(state).unsqueeze(0)
-            action_probs, state_value = model(state_tensor)
-            
-            dist = Categorical(action_probs)
-            action = dist.sample()
-            log_prob = dist.log_prob(action)
+            with profiler.phase('model.act'), torch.no_grad():
+                action_probs, state_value = model(state_tensor)
+                dist = Categorical(action_probs)
+                action = dist.sample()
             
             new_state, reward, done, _ = env.step(action.item())
             
-            log_probs.append(log_prob)
-            values.append(state_value)
-            rewards.append(torch.tensor([reward], dtype=torch.float))
+            buffer.add(state, action.item(), reward, done, state_value.item(), dist.log_prob(action).item())
             
             state = new_state
         
-        # --- 训练网络 (与之前相同) ---
-        returns = []
-        R = 0
-        for r in reversed(rewards):
-            R = r + GAMMA * R
-            returns.insert(0, R)
-        returns = torch.tensor(returns)
-        log_probs = torch.cat(log_probs)
-        values = torch.cat(values).squeeze()
+        # --- 训练网络 ---
+        # 折扣回报一次反向遍历算完；log_prob 和 value 在整条轨迹上一次批量前向重新计算
+        returns = torch.from_numpy(buffer.compute_returns(GAMMA).reshape(-1))
+        with profiler.phase('update.forward'):
+            action_probs, values = model(torch.from_numpy(buffer.flat('obs')))
+            log_probs = Categorical(action_probs).log_prob(torch.from_numpy(buffer.flat('actions')))
+        values = values.squeeze(-1)
         advantage = returns - values
         actor_loss = -(log_probs * advantage.detach()).mean()
         critic_loss = advantage.pow(2).mean()
         loss = actor_loss + critic_loss
         optimizer.zero_grad()
-        loss.backward()
-        optimizer.step()
+        with profiler.phase('update.backward'):
+            loss.backward()
+        with profiler.phase('optimizer.step'):
+            optimizer.step()
+        profiler.count('episodes')
+        trace.after(episode)
 
         # --- 计算并记录指标 ---
-        total_reward_this_episode = sum(r.item() for r in rewards)
+        total_reward_this_episode = float(buffer.rewards[:buffer.size].sum())
         reward_history.append(total_reward_this_episode)
         is_success = env.hiders_found == NUM_HIDERS
         success_history.append(1 if is_success else 0)
@@ -115,20 +225,206 @@ def main():
             writer.add_scalar('Metrics/Success_Rate_100_Eps', success_rate, episode)
             if avg_steps > 0: writer.add_scalar('Performance/Avg_Steps_on_Success', avg_steps, episode)
             if avg_ammo > 0: writer.add_scalar('Performance/Avg_Ammo_on_Success', avg_ammo, episode)
+            profiler.flush(writer, episode)
 
-        # 定期保存模型
+        # 定期保存模型 (后台线程写盘，不阻塞训练)
         if episode % SAVE_EVERY_EPISODES == 0 and episode > 0:
-            torch.save({
-                'episode': episode,
-                'model_state_dict': model.state_dict(),
-                'optimizer_state_dict': optimizer.state_dict(),
-            }, CHECKPOINT_PATH)
-            print(f"--- Checkpoint saved at episode {episode} to {CHECKPOINT_PATH} ---")
+            manager.save(training_state(model, optimizer, env, history, episode=episode),
+                         step=episode, metric=float(np.mean(success_history)))
+            print(f"--- Checkpoint queued at episode {episode} to {CHECKPOINT_DIR} ---")
 
+    if RECORD_TRAJECTORIES:
+        env.close()
+    manager.close()
     writer.close()
     # 训练完全结束后，再保存一次最终模型
     torch.save(model.state_dict(), 'seeker_ai_final.pth')
     print(f"--- Training Finished. Final model saved to seeker_ai_final.pth ---")
 
+def train_ppo():
+    """PPO: 在 ROLLOUT_STEPS × NUM_ENVS 的轨迹上做多轮小批量更新"""
+    import torch
+    import torch.optim as optim
+    from model import ActorCritic
+    from ppo import collect_rollout, ppo_update
+    from checkpoint import CheckpointManager
+
+    if NUM_WORKERS > 1:
+        env = SubprocVecHideAndSeekEnv(NUM_ENVS, NUM_WORKERS)
+    else:
+        env = VecHideAndSeekEnv(NUM_ENVS)
+    env = record_trajectories(env)
+    model = ActorCritic(env.observation_space_n, env.action_space_n)
+    optimizer = optim.Adam(model.parameters(), lr=LEARNING_RATE)
+    buffer = RolloutBuffer(ROLLOUT_STEPS, NUM_ENVS, env.observation_space_n)
+
+    start_update = 0
+    episodes_done = 0
+    manager = CheckpointManager(CHECKPOINT_DIR, keep_last=KEEP_LAST_CHECKPOINTS, prefix='ppo')
+    checkpoint = load_training_state(manager, model, optimizer, env)
+    if checkpoint is not None:
+        start_update = checkpoint.get('update', -1) + 1
+        episodes_done = checkpoint['episode']
+        print(f"--- Resuming PPO training from update {start_update} ---")
+
+    writer = make_writer(f'runs/hide_and_seek_ai_ppo_u{start_update}')
+
+    history = make_histories(checkpoint)
+    reward_history = history['reward']
+    success_history = history['success']
+    steps_on_success_history = history['steps_on_success']
+    ammo_on_success_history = history['ammo_on_success']
+
+    print(f"--- Starting PPO Training ({NUM_ENVS} envs x {ROLLOUT_STEPS} steps) ---")
+    trace = TraceWindow(TRACE_RANGE, f'runs/trace_update{TRACE_RANGE[0]}-{TRACE_RANGE[1] - 1}.json' if TRACE_RANGE else None, profiler)
+    state = env.reset()
+    for update in range(start_update, NUM_UPDATES):
+        trace.before(update)
+        with profiler.phase('rollout'):
+            state, finished = collect_rollout(env, model, buffer, state)
+        with torch.no_grad():
+            _, last_value = model(torch.as_tensor(state, dtype=torch.float32))
+        buffer.compute_gae(GAMMA, GAE_LAMBDA, last_value.squeeze(-1).numpy())
+        with profiler.phase('ppo.update'):
+            stats = ppo_update(model, optimizer, buffer, PPO_EPOCHS, MINIBATCH_SIZE, CLIP_EPS, VALUE_CLIP,
+                               ENTROPY_COEF, VALUE_COEF, MAX_GRAD_NORM)
+        trace.after(update)
+
+        # --- 计算并记录指标 ---
+        for ep in finished:
+            reward_history.append(ep['reward'])
+            success_history.append(1 if ep['success'] else 0)
+            if ep['success']:
+                steps_on_success_history.append(ep['steps'])
+                ammo_on_success_history.append(ep['ammo_used'])
+        episodes_done += len(finished)
+        env_steps = (update + 1) * ROLLOUT_STEPS * NUM_ENVS
+
+        if update % 10 == 0 and reward_history:
+            avg_reward = np.mean(reward_history)
+            success_rate = np.mean(success_history)
+            avg_steps = np.mean(steps_on_success_history) if steps_on_success_history else 0
+            avg_ammo = np.mean(ammo_on_success_history) if ammo_on_success_history else 0
+
+            print(f"Update {update} | Episodes {episodes_done} | Avg Reward: {avg_reward:.2f} | Success Rate: {success_rate:.2f} | Loss: {stats['loss']:.4f}")
+
+            writer.add_scalar('Loss/total_loss', stats['loss'], env_steps)
+            for key in ('policy_loss', 'value_loss', 'entropy', 'approx_kl', 'clip_fraction'):
+                writer.add_scalar(f'PPO/{key}', stats[key], env_steps)
+            writer.add_scalar('Metrics/Average_Reward_100_Eps', avg_reward, env_steps)
+            writer.add_scalar('Metrics/Success_Rate_100_Eps', success_rate, env_steps)
+            if avg_steps > 0: writer.add_scalar('Performance/Avg_Steps_on_Success', avg_steps, env_steps)
+            if avg_ammo > 0: writer.add_scalar('Performance/Avg_Ammo_on_Success', avg_ammo, env_steps)
+            profiler.flush(writer, env_steps)
+
+        if update % SAVE_EVERY_UPDATES == 0 and update > 0:
+            manager.save(training_state(model, optimizer, env, history, episode=episodes_done, update=update),
+                         step=update, metric=float(np.mean(success_history)) if success_history else None)
+            print(f"--- Checkpoint queued at update {update} to {CHECKPOINT_DIR} ---")
+
+    if NUM_WORKERS > 1 or RECORD_TRAJECTORIES:
+        env.close()
+    manager.close()
+    writer.close()
+    torch.save(model.state_dict(), 'seeker_ai_final.pth')
+    print(f"--- Training Finished. Final model saved to seeker_ai_final.pth ---")
+
+def train_selfplay():
+    """自我对弈：PPO 训练搜捕者，REINFORCE 训练躲藏者 (准备阶段选躲藏位置)，双方都面对按回合抽样的过去快照"""
+    import torch
+    import torch.optim as optim
+    from model import ActorCritic
+    from ppo import collect_rollout, ppo_update
+    from checkpoint import CheckpointManager
+    from level import default_level
+    from selfplay import HiderPolicy, SeekerPool, SelfPlayEnv, hider_features
+    from visibility import visibility_field
+
+    level = default_level()
+    hider_policy = HiderPolicy(hider_features(level, visibility_field(level).group_exposure()), NUM_HIDERS)
+    seeker_pool = SeekerPool()
+    env = SelfPlayEnv(NUM_ENVS, OPPONENT_ENVS, hider_policy, seeker_pool, level=level)
+    model = ActorCritic(env.observation_space_n, env.action_space_n)
+    optimizer = optim.Adam(model.parameters(), lr=LEARNING_RATE)
+    buffer = RolloutBuffer(ROLLOUT_STEPS, NUM_ENVS, env.observation_space_n)
+
+    start_update = 0
+    episodes_done = 0
+    manager = CheckpointManager(CHECKPOINT_DIR, keep_last=KEEP_LAST_CHECKPOINTS, prefix='selfplay')
+    checkpoint = load_training_state(manager, model, optimizer, env)
+    if checkpoint is not None:
+        start_update = checkpoint.get('update', -1) + 1
+        episodes_done = checkpoint['episode']
+        if 'hider_weights' in checkpoint:
+            hider_policy.load_state_dict({'weights': checkpoint['hider_weights'].numpy(),
+                                          'baseline': checkpoint['hider_baseline']})
+        print(f"--- Resuming self-play from update {start_update} ---")
+    seeker_pool.add(model.state_dict()) # 对手池从当前搜捕者开始 (对手池本身不保存在检查点里)
+
+    writer = make_writer(f'runs/hide_and_seek_ai_selfplay_u{start_update}')
+    history = make_histories(checkpoint)
+    reward_history = history['reward']
+    success_history = history['success']
+    survival_history = deque(maxlen=100)
+
+    print(f"--- Starting self-play ({NUM_ENVS} learner + {OPPONENT_ENVS} opponent envs x {ROLLOUT_STEPS} steps) ---")
+    state = env.reset()
+    for update in range(start_update, NUM_UPDATES):
+        seeker_pool.set_learner(model.state_dict()) # 学习中的搜捕者和对手在同一次前向中选动作
+        with profiler.phase('rollout'):
+            state, finished = collect_rollout(env, model, buffer, state, act=env.act)
+        with torch.no_grad():
+            _, last_value = model(torch.as_tensor(state, dtype=torch.float32))
+        buffer.compute_gae(GAMMA, GAE_LAMBDA, last_value.squeeze(-1).numpy())
+        with profiler.phase('ppo.update'):
+            stats = ppo_update(model, optimizer, buffer, PPO_EPOCHS, MINIBATCH_SIZE, CLIP_EPS, VALUE_CLIP,
+                               ENTROPY_COEF, VALUE_COEF, MAX_GRAD_NORM)
+        with profiler.phase('hider.update'):
+            choices, survived = env.pop_hider_episodes()
+            hider_policy.update(choices, survived)
+        survival_history.extend(survived.tolist())
+        for ep in finished:
+            reward_history.append(ep['reward'])
+            success_history.append(1 if ep['success'] else 0)
+        episodes_done += len(finished)
+        env_steps = (update + 1) * ROLLOUT_STEPS * (NUM_ENVS + OPPONENT_ENVS)
+
+        if update % SNAPSHOT_EVERY_UPDATES == 0 and update > 0:
+            seeker_pool.add(model.state_dict())
+            hider_policy.snapshot()
+
+        if update % 10 == 0 and reward_history:
+            avg_reward = np.mean(reward_history)
+            success_rate = np.mean(success_history)
+            survival = np.mean(survival_history) if survival_history else 0
+            print(f"Update {update} | Episodes {episodes_done} | Seeker Success: {success_rate:.2f} | "
+                  f"Hider Survival: {survival:.2f} | Pools: {len(seeker_pool)} seekers, "
+                  f"{hider_policy.n_snapshots} hiders | Loss: {stats['loss']:.4f}")
+            writer.add_scalar('Loss/total_loss', stats['loss'], env_steps)
+            writer.add_scalar('Metrics/Average_Reward_100_Eps', avg_reward, env_steps)
+            writer.add_scalar('Metrics/Success_Rate_100_Eps', success_rate, env_steps)
+            writer.add_scalar('SelfPlay/Hider_Survival_100_Eps', survival, env_steps)
+            profiler.flush(writer, env_steps)
+
+        if update % SAVE_EVERY_UPDATES == 0 and update > 0:
+            hider_state = hider_policy.state_dict()
+            manager.save(training_state(model, optimizer, env, history, episode=episodes_done, update=update,
+                                        hider_weights=torch.from_numpy(hider_state['weights']),
+                                        hider_baseline=hider_state['baseline']),
+                         step=update, metric=float(np.mean(success_history)) if success_history else None)
+            print(f"--- Checkpoint queued at update {update} to {CHECKPOINT_DIR} ---")
+
+    manager.close()
+    writer.close()
+    torch.save(model.state_dict(), 'seeker_ai_final.pth')
+    print(f"--- Self-play Finished. Final model saved to seeker_ai_final.pth ---")
+
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Train the seeker AI')
+    parser.add_argument('--import-profile', action='store_true',
+                        help='report the import time of every module loaded before training starts, then exit')
+    args = parser.parse_args()
+    if args.import_profile:
+        print_import_profile(import_profile(startup_modules()))
+    else:
+        main()
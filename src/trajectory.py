@@ -0,0 +1,489 @@
+# trajectory.py
+# 轨迹记录和回放：每一步每个环境一条固定 dtype 的记录 (obs, 动作, 奖励, done, 搜捕者位置/朝向)。
+# 采样线程把每一步写进预先分配的列中，攒够一块后由后台线程写成一个文件；
+# 每个回合的躲藏者、长度、回报汇总到 episodes.bin。读取时直接 memmap，可以随机访问、按回合切片、
+# 在 Ursina 窗口里回放，也可以作为离线分析和行为克隆的数据。
+#
+#   python src/trajectory.py bench --steps 1000000           # 记录与不记录的采样速度对比
+#   python src/trajectory.py info runs/trajectories/ppo
+#   python src/trajectory.py replay runs/trajectories/ppo --episode 3
+import argparse
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+import numpy as np
+
+from level import as_level, default_level
+from ray_kernel import raycast_aabbs
+from sim_core import EYE_HEIGHT, FIRE_RANGE, SIM_DT
+
+FORMAT_VERSION = 1
+CHUNK_RECORDS = 1 << 16     # 每个文件大约的记录数 (64 个环境时 1024 步，约 5 MB)
+MAX_PENDING_CHUNKS = 4      # 后台还没写完的块超过这个数时采样线程等待 (内存有上限)
+META_NAME = 'meta.json'
+EPISODES_NAME = 'episodes.bin'
+
+
+def step_fields(obs_dim):
+    """每一步每个环境一条记录：(字段, dtype, 形状)。块文件里按列存放 (先是所有记录的 step，然后 episode ...)"""
+    return [('step', '<i8', ()), ('episode', '<i8', ()), ('env', '<i4', ()), ('obs', '<f4', (obs_dim,)),
+            ('action', '<i2', ()), ('reward', '<f4', ()), ('done', '|b1', ()), ('success', '|b1', ()),
+            ('seeker_pos', '<f4', (3,)), ('seeker_rot', '<f4', ())]
+
+
+def episode_fields(num_hiders):
+    """每个回合一条：complete=False 表示记录结束 (或 reset()) 时回合还没结束"""
+    return [('episode', '<i8', ()), ('env', '<i4', ()), ('first_step', '<i8', ()), ('length', '<i4', ()),
+            ('return', '<f4', ()), ('success', '|b1', ()), ('complete', '|b1', ()),
+            ('hider_groups', '<i4', (num_hiders,))]
+
+
+def _dtype(fields):
+    return np.dtype([(name, dtype, tuple(shape)) for name, dtype, shape in fields])
+
+
+def chunk_path(directory, index):
+    return os.path.join(directory, f'chunk_{index:06d}.bin')
+
+
+class TrajectoryRecorder:
+    """把轨迹写到 directory 中：meta.json、chunk_000000.bin ...、episodes.bin
+
+    begin() / record() 把一步写进当前块的列 (struct-of-arrays) 中，每步只有几次整行复制。
+    回合编号不在每一步维护：块写满后由 done 列算出 (编号按结束的先后连续分配)，再用 bincount 汇总
+    这一块中的回合 (回合可以跨块)，整块放进有上限的队列由后台线程写盘 (与 CheckpointManager 相同)，
+    后台线程只做文件 I/O，不和采样线程抢 GIL。
+    """
+    def __init__(self, directory, num_envs, obs_dim, num_hiders, level=None, chunk_records=CHUNK_RECORDS):
+        self.directory = directory
+        self.num_envs = num_envs
+        self.num_hiders = num_hiders
+        self.chunk_steps = max(1, chunk_records // num_envs) # 每块都是完整的步
+        self.fields = step_fields(obs_dim)
+        self.episode_dtype = _dtype(episode_fields(num_hiders))
+        os.makedirs(directory, exist_ok=True)
+        if glob.glob(os.path.join(directory, 'chunk_*.bin')):
+            raise FileExistsError(f'{directory} already contains a recording')
+
+        level = as_level(level)
+        meta = {'version': FORMAT_VERSION, 'num_envs': num_envs, 'sim_dt': SIM_DT,
+                'fields': self.fields, 'episode_fields': episode_fields(num_hiders),
+                'level': {'name': level.name, 'hash': level.hash, 'path': level.path}}
+        with open(os.path.join(directory, META_NAME), 'w') as f:
+            json.dump(meta, f, indent=1)
+
+        self._free = queue.SimpleQueue() # 写完的块的列还给采样线程复用，不用每块重新分配 (和缺页)
+        self._buffer, self._hiders = self._new_buffer()
+        self._rows = 0         # 当前块已经写完了几步
+        self._chunks = 0
+        self._next_step = 0
+        self.total_records = 0
+        # 每个环境当前回合的编号，下一个新回合的编号
+        self._current = np.arange(num_envs, dtype=np.int64)
+        self._next_episode = num_envs
+        # 每个环境跨块的未结束回合：编号 (-1 表示没有)、第一步、已有的长度和回报、躲藏者
+        self._open = np.full(num_envs, -1, dtype=np.int64)
+        self._open_first = np.zeros(num_envs, dtype=np.int64)
+        self._open_length = np.zeros(num_envs, dtype=np.int64)
+        self._open_return = np.zeros(num_envs)
+        self._open_hiders = np.zeros((num_envs, num_hiders), dtype=np.int64)
+
+        self.queue = queue.Queue(maxsize=MAX_PENDING_CHUNKS)
+        self.error = None
+        self.thread = threading.Thread(target=self._writer, name='trajectory-writer', daemon=True)
+        self.thread.start()
+
+    def _new_buffer(self):
+        # 每块一组列，第一维是 (步, 环境)；多一行放下一步执行之前的状态 (块写满时搬到下一块的第 0 行)。
+        # step 和 env 列在提交时生成，躲藏者只用来汇总回合，不写进块文件
+        if not self._free.empty():
+            return self._free.get()
+        rows = (self.chunk_steps + 1, self.num_envs)
+        buffer = {name: np.empty(rows + shape, dtype=dtype) for name, dtype, shape in self.fields
+                  if name not in ('step', 'env')}
+        return buffer, np.empty(rows + (self.num_hiders,), dtype=np.int64)
+
+    def begin(self, obs, seeker_pos, seeker_rot, hider_groups):
+        """reset() 之后：所有环境的新回合从这一步开始。还有回合没结束时先写出它们 (complete=False)"""
+        t = self._rows
+        running = ~self._buffer['done'][t - 1] if t else self._open >= 0
+        if running.any():
+            self._submit(abandon=True)
+            self._current = self._next_episode + np.arange(self.num_envs)
+            self._next_episode += self.num_envs
+        self._write_state(self._rows, obs, seeker_pos, seeker_rot, hider_groups)
+
+    def record(self, action, reward, done, success, obs, seeker_pos, seeker_rot, hider_groups):
+        """一步之后：这一步的动作、奖励、done、是否找到了所有躲藏者，以及下一步之前的观察、搜捕者位置和躲藏者
+        (批量环境自动重置后就是新回合的)。直接复制进当前块，调用者之后可以原地修改这些数组
+        """
+        b, t = self._buffer, self._rows
+        b['action'][t] = action
+        b['reward'][t] = reward
+        b['done'][t] = done
+        b['success'][t] = success
+        t += 1
+        self._write_state(t, obs, seeker_pos, seeker_rot, hider_groups)
+        self._rows = t
+        self.total_records += self.num_envs
+        if t == self.chunk_steps:
+            self._submit()
+
+    def _write_state(self, t, obs, seeker_pos, seeker_rot, hider_groups):
+        b = self._buffer
+        b['obs'][t] = obs
+        b['seeker_pos'][t] = seeker_pos
+        b['seeker_rot'][t] = seeker_rot
+        self._hiders[t] = hider_groups
+
+    def _submit(self, abandon=False):
+        if self.error is not None:
+            raise RuntimeError('trajectory writer failed') from self.error
+        t = self._rows
+        columns = rows = None
+        if t:
+            self._assign_episodes(t)
+            columns = self._columns()
+            rows = self._episodes(columns)
+        if abandon and np.any(self._open >= 0):
+            envs = np.flatnonzero(self._open >= 0)
+            stale = self._episode_rows(self._open[envs], envs, self._open_first[envs], self._open_length[envs],
+                                       self._open_return[envs], False, False, self._open_hiders[envs])
+            rows = stale if rows is None else np.concatenate([rows, stale])
+            self._open[:] = -1
+        if columns is None and rows is None:
+            return
+        if columns is None:
+            self.queue.put((self._chunks, None, None, rows))
+            return
+        old, old_hiders = self._buffer, self._hiders
+        self._buffer, self._hiders = self._new_buffer()
+        self._write_state(0, old['obs'][t], old['seeker_pos'][t], old['seeker_rot'][t], old_hiders[t])
+        self.queue.put((self._chunks, columns, (old, old_hiders), rows)) # 队列满时在这里等待
+        self._chunks += 1
+        self._next_step += t
+        self._rows = 0
+
+    def _assign_episodes(self, t):
+        """由 done 列给这一块的记录分配回合编号：第 s 步结束的回合，下一步起是按 (步, 环境) 顺序编号的新回合"""
+        done = self._buffer['done'][:t]
+        new = self._next_episode + np.cumsum(done.ravel()).reshape(done.shape) - 1
+        ids = self._buffer['episode'][:t]
+        ids[0] = self._current
+        ids[1:] = np.where(done[:-1], new[:-1], -1)
+        np.maximum.accumulate(ids, axis=0, out=ids) # 编号随时间递增
+        self._current = np.where(done[-1], new[-1], ids[-1])
+        self._next_episode += int(done.sum())
+
+    def _columns(self):
+        n, t = self.num_envs, self._rows
+        columns = {'step': np.repeat(np.arange(self._next_step, self._next_step + t), n),
+                   'env': np.tile(np.arange(n, dtype=np.int32), t)}
+        for name, column in self._buffer.items():
+            columns[name] = column[:t].reshape((t * n,) + column.shape[2:])
+        return columns
+
+    def _episodes(self, columns):
+        """把这一块的记录累加到各环境未结束的回合上，返回这一块中结束的回合 (回合编号是连续分配的，直接 bincount)"""
+        ids = columns['episode']
+        base = ids.min()
+        offset = ids - base
+        length = np.bincount(offset)
+        total = np.bincount(offset, weights=columns['reward'])
+        done = np.bincount(offset, weights=columns['done']) > 0
+        success = np.bincount(offset, weights=columns['success']) > 0
+        first = np.empty(len(length), dtype=np.int64)
+        first[offset[::-1]] = np.arange(len(offset) - 1, -1, -1) # 重复下标时最后一次赋值生效，即第一次出现的位置
+
+        present = np.flatnonzero(length)
+        episodes, envs = base + present, columns['env'][first[present]]
+        first_step, length, total = columns['step'][first[present]], length[present], total[present]
+        hiders = self._hiders[:self._rows].reshape(-1, self.num_hiders)[first[present]]
+        carried = self._open[envs] == episodes
+        first_step = np.where(carried, self._open_first[envs], first_step)
+        length = length + np.where(carried, self._open_length[envs], 0)
+        total = total + np.where(carried, self._open_return[envs], 0)
+        hiders = np.where(carried[:, None], self._open_hiders[envs], hiders)
+        done, success = done[present], success[present]
+
+        self._open[envs[done]] = -1
+        running = ~done
+        self._open[envs[running]] = episodes[running]
+        self._open_first[envs[running]] = first_step[running]
+        self._open_length[envs[running]] = length[running]
+        self._open_return[envs[running]] = total[running]
+        self._open_hiders[envs[running]] = hiders[running]
+        if not done.any():
+            return None
+        return self._episode_rows(episodes[done], envs[done], first_step[done], length[done], total[done],
+                                  success[done], True, hiders[done])
+
+    def _episode_rows(self, episodes, envs, first_step, length, total, success, complete, hider_groups):
+        rows = np.zeros(len(episodes), dtype=self.episode_dtype)
+        rows['episode'], rows['env'], rows['first_step'] = episodes, envs, first_step
+        rows['length'], rows['return'], rows['success'], rows['complete'] = length, total, success, complete
+        rows['hider_groups'] = hider_groups
+        return rows
+
+    def _writer(self):
+        while True:
+            item = self.queue.get()
+            try:
+                if item is None:
+                    return
+                index, columns, buffer, rows = item
+                if columns is not None:
+                    path = chunk_path(self.directory, index)
+                    with open(f'{path}.tmp', 'wb') as f:
+                        for name, _, _ in self.fields:
+                            columns[name].tofile(f)
+                    os.replace(f'{path}.tmp', path)
+                    self._free.put(buffer) # 已经写完，采样线程可以复用这些列
+                if rows is not None:
+                    with open(os.path.join(self.directory, EPISODES_NAME), 'ab') as f:
+                        rows.tofile(f)
+            except Exception as e: # 在下一次提交时报告给采样线程
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+    def close(self):
+        """写出最后一块 (可能不满) 和还没结束的回合 (complete=False)，等待后台线程结束"""
+        if self.thread is None:
+            return
+        self._submit(abandon=True)
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        if self.error is not None:
+            raise RuntimeError('trajectory writer failed') from self.error
+
+
+class RecordingEnv:
+    """包装 VecHideAndSeekEnv 或 headless 的 HideAndSeekEnv (需要 env.sim)，把每一步交给 TrajectoryRecorder
+
+    记录的是执行动作之前的观察和搜捕者位置，以及这一步的动作、奖励和 done。其他属性都转发给 env。
+    """
+    def __init__(self, env, directory, chunk_records=CHUNK_RECORDS):
+        if getattr(env, 'sim', None) is None:
+            raise ValueError('trajectory recording needs an env with a NumPy sim '
+                             '(VecHideAndSeekEnv or headless HideAndSeekEnv)')
+        self.env = env
+        sim = env.sim
+        self.recorder = TrajectoryRecorder(directory, sim.num_envs, env.observation_space_n, sim.num_hiders,
+                                           sim.level, chunk_records)
+
+    def __getattr__(self, name):
+        return getattr(self.env, name)
+
+    def reset(self, *args, **kwargs):
+        obs = self.env.reset(*args, **kwargs)
+        sim = self.env.sim
+        self.recorder.begin(obs, sim.seeker_pos, sim.seeker_rot, sim.hider_groups)
+        return obs
+
+    def step(self, actions):
+        obs, rewards, dones, info = self.env.step(actions)
+        sim = self.env.sim
+        if 'success' in info:
+            success = info['success']
+        else: # 单个环境的 info 是空的
+            success = bool(dones) and sim.hiders_found[0] == sim.num_hiders
+        # 执行动作之后 sim 的状态就是下一步之前的状态 (批量环境已经自动重置，单个环境等下一次 reset() 覆盖)
+        self.recorder.record(actions, rewards, dones, success, obs, sim.seeker_pos, sim.seeker_rot, sim.hider_groups)
+        return obs, rewards, dones, info
+
+    def close(self):
+        self.recorder.close()
+        if hasattr(self.env, 'close'):
+            self.env.close()
+
+
+class TrajectoryReader:
+    """memmap 方式读取 TrajectoryRecorder 写的目录 (写入过程中也可以读已经写完的块)
+
+    记录按 (步, 环境) 的顺序排列；读出来的记录是 {字段: 数组} 的 dict。
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, META_NAME)) as f:
+            self.meta = json.load(f)
+        if self.meta['version'] != FORMAT_VERSION:
+            raise ValueError(f"{directory}: unsupported trajectory format version {self.meta['version']}")
+        self.fields = [(name, dtype, tuple(shape)) for name, dtype, shape in self.meta['fields']]
+        self.episode_dtype = _dtype(self.meta['episode_fields'])
+
+        record_size = _dtype(self.fields).itemsize
+        self.chunks = []
+        for path in sorted(glob.glob(os.path.join(directory, 'chunk_*.bin'))):
+            count = os.path.getsize(path) // record_size
+            if not count:
+                continue
+            columns, offset = {}, 0
+            for name, dtype, shape in self.fields:
+                columns[name] = np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=(count,) + shape)
+                offset += columns[name].nbytes
+            self.chunks.append(columns)
+        self.offsets = np.cumsum([0] + [len(c['step']) for c in self.chunks])
+        episodes_path = os.path.join(directory, EPISODES_NAME)
+        if os.path.exists(episodes_path) and os.path.getsize(episodes_path):
+            self.episodes = np.memmap(episodes_path, dtype=self.episode_dtype, mode='r')
+        else:
+            self.episodes = np.zeros(0, dtype=self.episode_dtype)
+        self._episode_rows = {e: i for i, e in enumerate(self.episodes['episode'].tolist())}
+        self._episode_order = None
+
+    def __len__(self):
+        return int(self.offsets[-1])
+
+    def __getitem__(self, index):
+        """第 index 条记录，或 [start:stop] 的记录"""
+        if isinstance(index, slice):
+            return self.gather(np.arange(*index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        c = np.searchsorted(self.offsets, index, side='right') - 1
+        return {name: column[index - self.offsets[c]] for name, column in self.chunks[c].items()}
+
+    def gather(self, rows):
+        """按全局记录编号取记录，返回 {字段: 数组}"""
+        rows = np.asarray(rows, dtype=np.int64)
+        out = {name: np.zeros((len(rows),) + shape, dtype=dtype) for name, dtype, shape in self.fields}
+        c = np.searchsorted(self.offsets, rows, side='right') - 1
+        for chunk in np.unique(c).tolist():
+            sel = c == chunk
+            local = rows[sel] - self.offsets[chunk]
+            for name, column in self.chunks[chunk].items():
+                out[name][sel] = column[local]
+        return out
+
+    def column(self, name):
+        """某个字段的全部数据 (复制到内存)，例如行为克隆用 column('obs') 和 column('action')"""
+        _, dtype, shape = next(f for f in self.fields if f[0] == name)
+        if not self.chunks:
+            return np.zeros((0,) + shape, dtype=dtype)
+        return np.concatenate([c[name] for c in self.chunks])
+
+    def episode(self, episode):
+        """某个回合的全部记录 (按步排序)"""
+        if self._episode_order is None:
+            # 同一个回合的记录被其他环境的记录隔开，按 episode 稳定排序后二分查找
+            ids = self.column('episode')
+            self._episode_order = np.argsort(ids, kind='stable')
+            self._sorted_ids = ids[self._episode_order]
+        lo, hi = np.searchsorted(self._sorted_ids, [episode, episode + 1])
+        return self.gather(self._episode_order[lo:hi])
+
+    def episode_info(self, episode):
+        """episodes.bin 中的一行 (回合结束后写入)，没有时返回 None"""
+        row = self._episode_rows.get(int(episode))
+        return None if row is None else self.episodes[row]
+
+    def level(self):
+        """记录时使用的关卡 (按文件路径或默认关卡找回，并检查哈希)"""
+        info = self.meta['level']
+        level = as_level(info['path']) if info['path'] and os.path.exists(info['path']) else default_level()
+        if level.hash != info['hash']:
+            raise ValueError(f"recorded level {info['name']} ({info['hash']}) is not available")
+        return level
+
+
+class _ReplayState:
+    """SimViewer 需要的 NumpySim 字段 (一个环境)"""
+    def __init__(self, level):
+        self.level = level
+        self.n_props = level.n_props
+        self.seeker_pos = np.zeros((1, 3))
+        self.seeker_rot = np.zeros(1)
+        self.shot = np.zeros((1, level.n_props), dtype=bool)
+
+
+def replay(reader, episode, speed=1.0):
+    """在 Ursina 窗口中回放一个回合；开火的那一步从记录的位置重新投射射线，找出被打中的躲藏者"""
+    from ursina_backend import SimViewer
+
+    level = reader.level()
+    rows = reader.episode(episode)
+    info = reader.episode_info(episode)
+    hiders = np.isin(level.group, info['hider_groups']) if info is not None else np.zeros(level.n_props, dtype=bool)
+    state = _ReplayState(level)
+    viewer = SimViewer(state)
+    eye = np.array([0, EYE_HEIGHT, 0])
+    for t in range(len(rows['step'])):
+        state.seeker_pos[0] = rows['seeker_pos'][t]
+        state.seeker_rot[0] = rows['seeker_rot'][t]
+        if rows['action'][t] == 4:
+            rad = np.radians(float(rows['seeker_rot'][t]))
+            direction = np.array([[np.sin(rad), 0, np.cos(rad)]])
+            hit, _ = raycast_aabbs(state.seeker_pos + eye, direction, level.lo, level.hi, FIRE_RANGE)
+            if hit[0] >= 0 and hiders[hit[0]]:
+                state.shot[0] |= level.group == level.group[hit[0]]
+        viewer.sync()
+        time.sleep(reader.meta['sim_dt'] / speed)
+    return rows
+
+
+def benchmark(steps, num_envs, directory, block=200, seed=0):
+    """随机动作采样，记录和不记录的环境交替各跑 block 步 (两者受到相同的机器负载波动)，
+    返回 (不记录的步数/秒, 记录的步数/秒)，都取各段耗时的中位数
+    """
+    from vec_env import VecHideAndSeekEnv
+
+    plain = VecHideAndSeekEnv(num_envs, seed=seed)
+    recorded = RecordingEnv(VecHideAndSeekEnv(num_envs, seed=seed), directory)
+    actions = np.random.default_rng(seed).integers(0, plain.action_space_n, (block, num_envs))
+    times = [[], []]
+    plain.reset()
+    recorded.reset()
+    for _ in range(max(1, steps // (block * num_envs))):
+        for i, env in enumerate((plain, recorded)):
+            start = time.perf_counter()
+            for a in actions:
+                env.step(a)
+            times[i].append(time.perf_counter() - start)
+    recorded.close()
+    return block * num_envs / np.median(times[0]), block * num_envs / np.median(times[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record, inspect and replay seeker trajectories')
+    sub = parser.add_subparsers(dest='command', required=True)
+    bench = sub.add_parser('bench', help='rollout speed with and without recording')
+    bench.add_argument('--steps', type=int, default=1_000_000, help='recorded env steps')
+    bench.add_argument('--envs', type=int, default=64)
+    bench.add_argument('--out', default='runs/trajectories/bench')
+    info = sub.add_parser('info', help='summarize a recording')
+    info.add_argument('directory')
+    play = sub.add_parser('replay', help='replay an episode in the Ursina viewer')
+    play.add_argument('directory')
+    play.add_argument('--episode', type=int, default=0)
+    play.add_argument('--speed', type=float, default=1.0)
+    args = parser.parse_args()
+
+    if args.command == 'bench':
+        plain, recorded = benchmark(args.steps, args.envs, args.out)
+        reader = TrajectoryReader(args.out)
+        size = sum(os.path.getsize(p) for p in glob.glob(os.path.join(args.out, '*.bin')))
+        print(f'--- {len(reader)} records, {len(reader.episodes)} episodes, {size / 1e6:.1f} MB in {args.out} ---')
+        print(f'--- {plain:.0f} steps/s without recording, {recorded:.0f} steps/s recording '
+              f'({(plain / recorded - 1) * 100:+.1f}% time) ---')
+    elif args.command == 'info':
+        reader = TrajectoryReader(args.directory)
+        episodes = reader.episodes[reader.episodes['complete']]
+        print(f"--- {args.directory}: level {reader.meta['level']['name']}, {reader.meta['num_envs']} envs, "
+              f"{len(reader)} records in {len(reader.chunks)} chunks ---")
+        if len(episodes):
+            print(f"--- {len(episodes)} complete episodes: success rate {episodes['success'].mean():.1%}, "
+                  f"mean return {episodes['return'].mean():.2f}, mean length {episodes['length'].mean():.1f} ---")
+    else:
+        replay(TrajectoryReader(args.directory), args.episode, args.speed)
+
+
+if __name__ == '__main__':
+    main()
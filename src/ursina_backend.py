@@ -0,0 +1,50 @@
+# ursina_backend.py
+# HideAndSeekEnv 的渲染后端 (Ursina 实体和只用来显示的窗口)
+# 单独放在一个模块里，只有选择了渲染模式时 game_env 才会导入它 (导入 Ursina 本身就要约 0.3 秒)
+from ursina import *
+
+from scene_batch import create_prop_entity
+from sim_core import SEEKER_SPEED, SEEKER_TURN_SPEED
+
+class Prop(Entity):
+    # ... (Prop类的定义与之前相同)
+    def __init__(self, is_hider=False, **kwargs):
+        super().__init__(collider='box', **kwargs)
+        self.base_color = self.color
+        self.reset_state(is_hider)
+    def reset_state(self, is_hider):
+        """复用道具时只重置每局的状态 (不重新创建模型和碰撞体)"""
+        self.is_hider = is_hider
+        self.shot = False
+        self.checked_by_ai = False
+        self.color = self.base_color
+    def get_shot(self):
+        if self.shot: return False
+        if self.is_hider:
+            self.color = color.red; self.shot = True; return True
+        return False
+
+class SeekerAI(Entity):
+    def __init__(self, **kwargs):
+        super().__init__(model='cube', scale=(1, 2, 1), color=color.red, **kwargs)
+        self.speed = SEEKER_SPEED # 单位/秒，配合固定的 dt 使用
+        self.turn_speed = SEEKER_TURN_SPEED
+
+class SimViewer:
+    """只负责显示的Ursina窗口：把 NumpySim 第 env_index 个回合的状态画出来"""
+    def __init__(self, sim, env_index=0):
+        self.sim = sim
+        self.env_index = env_index
+        self.app = Ursina(borderless=False, development_mode=False, window_title="AI Training Environment (viewer)")
+        camera.position = (0, 30, -35)
+        camera.rotation_x = 45
+        self.props = [create_prop_entity(Entity, sim.level, i) for i in range(sim.n_props)]
+        self.seeker = Entity(model='cube', scale=(1, 2, 1), color=color.red)
+
+    def sync(self):
+        e = self.env_index
+        self.seeker.position = tuple(self.sim.seeker_pos[e])
+        self.seeker.rotation_y = self.sim.seeker_rot[e]
+        for entity, shot in zip(self.props, self.sim.shot[e]):
+            entity.color = color.red if shot else entity.base_color
+        self.app.step()
@@ -0,0 +1,288 @@
+# vec_env.py
+# 批量环境：一次 step 同时推进 N 个独立的躲猫猫回合
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+
+import numpy as np
+
+from game_env import NUM_HIDERS
+from level import as_level
+from sim_core import NumpySim, OBSERVATION_N, ACTION_N, MAX_STEPS, STARTING_AMMO, SIM_DT
+from profiling import profiler
+
+
+class VecHideAndSeekEnv:
+    """N个 HideAndSeekEnv 回合的向量化版本 (struct-of-arrays)
+
+    step(actions) 接收形状为 (N,) 的动作，返回堆叠后的 (obs, rewards, dones, info)。
+    某个回合结束时会自动重置该位置，返回的 obs 已经是新回合的第一帧，
+    结束时的最后一帧放在 info['final_observation'] 中。
+    info['truncated'] 标出只是因为到了 max_steps 才结束的回合 (没赢、弹药也没用完)，
+    训练时应该用 final_observation 的价值自举，而不是把它当成终止状态。
+    """
+    def __init__(self, num_envs, max_steps=MAX_STEPS, dt=SIM_DT, frame_skip=1, seed=None, level=None,
+                 hider_weights=None):
+        self.num_envs = num_envs
+        self.observation_space_n = OBSERVATION_N
+        self.action_space_n = ACTION_N
+        self.max_steps = max_steps
+        self.level = as_level(level)
+        self.sim = NumpySim(self.level, NUM_HIDERS, num_envs=num_envs, max_steps=max_steps,
+                            dt=dt, frame_skip=frame_skip, seed=seed, hider_weights=hider_weights)
+        self.episode_returns = np.zeros(num_envs)
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.sim.seed(seed)
+        self.sim.reset()
+        self.episode_returns[:] = 0
+        return self.sim.observe()
+
+    def get_rng_state(self):
+        return self.sim.rng.bit_generator.state
+
+    def set_rng_state(self, state):
+        self.sim.rng.bit_generator.state = state
+
+    def step(self, actions):
+        actions = np.asarray(actions).reshape(self.num_envs)
+        profiler.count('env_steps', self.num_envs)
+        with profiler.phase('env.sim_step'):
+            rewards, dones = self.sim.step(actions)
+        self.episode_returns += rewards
+        with profiler.phase('env.observation'):
+            obs = self.sim.observe()
+
+        # 记录结束回合的统计信息 (在自动重置之前)
+        info = {
+            'final_observation': obs.copy(),
+            'episode_return': np.where(dones, self.episode_returns, 0.0),
+            'episode_length': np.where(dones, self.sim.step_count, 0),
+            'hiders_found': self.sim.hiders_found.copy(),
+            'ammo_used': STARTING_AMMO - self.sim.ammo,
+            'success': dones & (self.sim.hiders_found == NUM_HIDERS),
+            'truncated': dones & (self.sim.step_count >= self.max_steps) & (self.sim.hiders_found < NUM_HIDERS)
+                         & (self.sim.ammo > 0),
+        }
+
+        done_ids = np.flatnonzero(dones)
+        if len(done_ids):
+            self.sim.reset(done_ids)
+            self.episode_returns[done_ids] = 0
+            obs[done_ids] = self.sim.observe()[done_ids]
+        return obs, rewards, dones, info
+
+
+# --- 多进程版本 (multi-process rollout workers) ---
+# 每个字段: (dtype, 每个回合的形状)。step 的输入输出都放在共享内存里，管道只传很短的命令
+SHARED_FIELDS = {
+    'obs': (np.float64, (OBSERVATION_N,)),
+    'actions': (np.int64, ()),
+    'rewards': (np.float64, ()),
+    'dones': (np.bool_, ()),
+    'final_observation': (np.float64, (OBSERVATION_N,)),
+    'episode_return': (np.float64, ()),
+    'episode_length': (np.int64, ()),
+    'hiders_found': (np.int64, ()),
+    'ammo_used': (np.int64, ()),
+    'success': (np.bool_, ()),
+    'truncated': (np.bool_, ()),
+}
+INFO_FIELDS = ('final_observation', 'episode_return', 'episode_length', 'hiders_found', 'ammo_used', 'success',
+               'truncated')
+RESTART_ATTEMPTS = 3 # 一个子进程连续重启失败这么多次就放弃
+
+
+def _attach_shared(shm_names, num_envs):
+    """按名字连接共享内存，返回 (SharedMemory 列表, {字段: ndarray})"""
+    shms, arrays = [], {}
+    for name, (dtype, shape) in SHARED_FIELDS.items():
+        shm = shared_memory.SharedMemory(name=shm_names[name])
+        shms.append(shm)
+        arrays[name] = np.ndarray((num_envs,) + shape, dtype=dtype, buffer=shm.buf)
+    return shms, arrays
+
+
+def _worker(conn, shm_names, num_envs, slot, env_kwargs):
+    """子进程：负责 slot 范围内的回合，结果直接写进共享内存"""
+    shms, arrays = _attach_shared(shm_names, num_envs)
+    view = {name: array[slot] for name, array in arrays.items()}
+    env = VecHideAndSeekEnv(slot.stop - slot.start, **env_kwargs)
+    try:
+        while True:
+            cmd, arg = conn.recv()
+            if cmd == 'reset':
+                view['obs'][:] = env.reset(seed=arg)
+            elif cmd == 'step':
+                obs, rewards, dones, info = env.step(view['actions'])
+                view['obs'][:] = obs
+                view['rewards'][:] = rewards
+                view['dones'][:] = dones
+                for name in INFO_FIELDS:
+                    view[name][:] = info[name]
+            elif cmd == 'close':
+                break
+            conn.send(cmd)
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del view, arrays
+        for shm in shms:
+            shm.close()
+
+
+class SubprocVecHideAndSeekEnv:
+    """把 num_envs 个回合平均分给 num_workers 个子进程的批量环境
+
+    接口与 VecHideAndSeekEnv 相同。使用 spawn 启动子进程 (训练进程通常已经导入了 torch，
+    它的线程池在 fork 出的子进程里不可用；spawn 在各个平台上行为也一致)；
+    观察、动作、奖励和 done 都通过共享内存的 NumPy 数组交换。
+    子进程崩溃 (或超过 step_timeout 秒没有响应) 时会被重启，它负责的回合会以 done=True
+    结束，info['worker_restarted'] 中对应位置为 True。这些回合按截断处理 (truncated=True)，
+    final_observation 是出错那一步之前的观察。重启 RESTART_ATTEMPTS 次仍然失败时抛出 RuntimeError。
+    """
+    def __init__(self, num_envs, num_workers, seed=None, step_timeout=None, **env_kwargs):
+        assert num_envs >= num_workers > 0
+        self.num_envs = num_envs
+        self.num_workers = num_workers
+        self.observation_space_n = OBSERVATION_N
+        self.action_space_n = ACTION_N
+        self.seed = seed
+        self.step_timeout = step_timeout
+        self.env_kwargs = env_kwargs
+        self.ctx = mp.get_context('spawn')
+
+        self.shms = {}
+        self.arrays = {}
+        for name, (dtype, shape) in SHARED_FIELDS.items():
+            nbytes = max(1, int(np.prod((num_envs,) + shape)) * np.dtype(dtype).itemsize)
+            shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.shms[name] = shm
+            self.arrays[name] = np.ndarray((num_envs,) + shape, dtype=dtype, buffer=shm.buf)
+
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        self.slots = [slice(a, b) for a, b in zip(bounds[:-1], bounds[1:])]
+        self.processes = [None] * num_workers
+        self.conns = [None] * num_workers
+        self.restarts = 0
+        for i in range(num_workers):
+            self._start_worker(i)
+
+    def _worker_seed(self, i, seed):
+        return None if seed is None else seed * self.num_workers + i
+
+    def _start_worker(self, i):
+        parent_conn, child_conn = self.ctx.Pipe()
+        kwargs = dict(self.env_kwargs, seed=self._worker_seed(i, self.seed))
+        shm_names = {name: shm.name for name, shm in self.shms.items()}
+        process = self.ctx.Process(target=_worker, args=(child_conn, shm_names, self.num_envs, self.slots[i], kwargs),
+                                   daemon=True)
+        process.start()
+        child_conn.close()
+        self.processes[i], self.conns[i] = process, parent_conn
+
+    def _stop_worker(self, i):
+        process = self.processes[i]
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        self.conns[i].close()
+
+    def _restart_worker(self, i):
+        """重启崩溃的子进程，并把它负责的回合重置 (等待确认同样受 step_timeout 限制)"""
+        for _ in range(RESTART_ATTEMPTS):
+            self._stop_worker(i)
+            self.restarts += 1
+            self._start_worker(i)
+            conn = self.conns[i]
+            try:
+                conn.send(('reset', None))
+                # 子进程退出时管道关闭，poll 返回 True，recv 抛出 EOFError
+                if conn.poll(self.step_timeout):
+                    conn.recv()
+                    return
+            except (EOFError, BrokenPipeError, OSError):
+                pass
+        self._stop_worker(i)
+        raise RuntimeError(f'worker {i} failed to restart {RESTART_ATTEMPTS} times')
+
+    def _send_all(self, cmd, args):
+        """给所有子进程发命令并等待确认，返回崩溃后被重启的子进程编号"""
+        pending = {}
+        for i, arg in enumerate(args):
+            try:
+                self.conns[i].send((cmd, arg))
+                pending[self.conns[i]] = i
+            except (BrokenPipeError, OSError):
+                pending[self.processes[i].sentinel] = i
+        failed = []
+        while pending:
+            ready = wait(list(pending), timeout=self.step_timeout)
+            if not ready: # 超时：剩下的子进程都视为卡死
+                failed.extend(pending.values())
+                break
+            for handle in ready:
+                i = pending.pop(handle, None)
+                if i is None:
+                    continue
+                if handle is self.conns[i]:
+                    try:
+                        handle.recv()
+                        pending.pop(self.processes[i].sentinel, None)
+                        continue
+                    except (EOFError, OSError):
+                        pass
+                # 进程已经退出 (sentinel 就绪) 或管道断开
+                pending = {h: j for h, j in pending.items() if j != i}
+                failed.append(i)
+        for i in failed:
+            self._restart_worker(i)
+        return failed
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seed = seed
+        self._send_all('reset', [self._worker_seed(i, seed) for i in range(self.num_workers)])
+        return self.arrays['obs'].copy()
+
+    def step(self, actions):
+        self.arrays['actions'][:] = np.asarray(actions).reshape(self.num_envs)
+        # 崩溃的子进程可能写了一半，重启后又会写入新回合的第一帧，所以先留一份这一步之前的观察
+        last_obs = self.arrays['obs'].copy()
+        profiler.count('env_steps', self.num_envs)
+        with profiler.phase('env.step'):
+            failed = self._send_all('step', [None] * self.num_workers)
+
+        restarted = np.zeros(self.num_envs, dtype=bool)
+        for i in failed:
+            slot = self.slots[i]
+            restarted[slot] = True
+            # 崩溃的回合按截断处理：没有奖励，没有统计，从出错那一步之前的观察自举
+            self.arrays['rewards'][slot] = 0
+            self.arrays['dones'][slot] = True
+            self.arrays['truncated'][slot] = True
+            self.arrays['final_observation'][slot] = last_obs[slot]
+            for name in ('episode_return', 'episode_length', 'hiders_found', 'ammo_used', 'success'):
+                self.arrays[name][slot] = 0
+
+        info = {name: self.arrays[name].copy() for name in INFO_FIELDS}
+        info['worker_restarted'] = restarted
+        return self.arrays['obs'].copy(), self.arrays['rewards'].copy(), self.arrays['dones'].copy(), info
+
+    def close(self):
+        for conn, process in zip(self.conns, self.processes):
+            try:
+                conn.send(('close', None))
+            except (BrokenPipeError, OSError):
+                pass
+        for conn, process in zip(self.conns, self.processes):
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+            conn.close()
+        self.arrays = {}
+        for shm in self.shms.values():
+            shm.close()
+            shm.unlink()
+        self.shms = {}
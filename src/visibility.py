@@ -0,0 +1,248 @@
+# visibility.py
+# 预计算的可见性场：把地面划分成格子，在每个空地格子的视线高度上，对附近每个道具的几个采样点各投一条射线，
+# 没有先被别的道具挡住就算看得见。结果按关卡哈希缓存到 levels/，用来给道具打“暴露度”分数，
+# 让 AI 躲藏者挑看不见的位置 (DEV_DOC Phase 2)，训练时每回合只需要按分数加权抽样。
+#
+#   python src/visibility.py [--props 5000] [--cell-size 1] [--view-distance 20] [--top 5]
+import argparse
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+
+from level import LEVEL_CACHE_DIR, as_level, generate_office_level
+from ray_kernel import raycast_aabbs
+from sim_core import EYE_HEIGHT, SEEKER_START
+
+FORMAT_VERSION = 1
+CELL_SIZE = 1.0
+VIEW_DISTANCE = 20.0        # 超过这个距离的道具算看不见
+EYE_Y = SEEKER_START[1] + EYE_HEIGHT
+TILE_CELLS = 16             # 每次处理 16×16 个格子，只和附近的道具求交
+BOUNDS_MARGIN = 2.0         # 默认地面范围 = 道具的 xz 范围向外扩 2 个单位
+SAMPLE_INSET = 0.25         # 顶面采样点向中心收缩的比例
+
+
+def sample_points(lo, hi):
+    """每个道具的采样点 (P,S,3)：中心和顶面稍微内缩的四个角"""
+    center = (lo + hi) / 2
+    half = (hi - lo) / 2 * (1 - SAMPLE_INSET)
+    top = np.minimum(hi[:, 1], EYE_Y + 1) - 0.05 * (hi[:, 1] - lo[:, 1])
+    points = [center]
+    for sx, sz in ((-1, -1), (-1, 1), (1, -1), (1, 1)):
+        p = center.copy()
+        p[:, 0] += sx * half[:, 0]
+        p[:, 1] = top
+        p[:, 2] += sz * half[:, 2]
+        points.append(p)
+    return np.stack(points, axis=1)
+
+
+class VisibilityField:
+    """地面格子 × 道具的可见性 (稀疏 COO)
+
+    cell_xz (C,2): 空地格子的中心 (不在任何道具的占地范围内)
+    pair_cell, pair_prop (V,): 看得见的 (格子, 道具) 对；pair_count (V,) 其中看得见的采样点数
+    """
+    def __init__(self, arrays, params):
+        self.params = params
+        self.n_samples = params['n_samples']
+        self.cell_xz = arrays['cell_xz']
+        self.pair_cell = arrays['pair_cell']
+        self.pair_prop = arrays['pair_prop']
+        self.pair_count = arrays['pair_count']
+        self.group = arrays['group']
+        self.hider_groups = arrays['hider_groups']
+
+    @property
+    def n_cells(self):
+        return len(self.cell_xz)
+
+    @property
+    def n_props(self):
+        return len(self.group)
+
+    @classmethod
+    def compute(cls, level, cell_size=CELL_SIZE, view_distance=VIEW_DISTANCE, bounds=None):
+        """bounds: ((x0, z0), (x1, z1)) 地面范围，默认由道具范围决定"""
+        lo, hi = np.asarray(level.lo, dtype=np.float64), np.asarray(level.hi, dtype=np.float64)
+        group = np.asarray(level.group)
+        if bounds is None:
+            bounds = (lo[:, [0, 2]].min(axis=0) - BOUNDS_MARGIN, hi[:, [0, 2]].max(axis=0) + BOUNDS_MARGIN)
+        origin = np.asarray(bounds[0], dtype=np.float64)
+        shape = np.maximum(np.ceil((np.asarray(bounds[1]) - origin) / cell_size).astype(np.int64), 1)
+
+        # 道具占地范围内的格子不能站人
+        free = np.ones(shape, dtype=bool)
+        first = np.ceil((lo[:, [0, 2]] - origin) / cell_size - 0.5).astype(np.int64).clip(0, shape)
+        last = np.floor((hi[:, [0, 2]] - origin) / cell_size - 0.5).astype(np.int64).clip(-1, shape - 1)
+        for (a, b), (c, d) in zip(first.tolist(), last.tolist()):
+            free[a:c + 1, b:d + 1] = False
+
+        samples = sample_points(lo, hi)
+        n_samples = samples.shape[1]
+        center_xz = ((lo + hi) / 2)[:, [0, 2]]
+        cells, pairs, n_cells = [], [], 0
+        for tx in range(0, shape[0], TILE_CELLS):
+            for tz in range(0, shape[1], TILE_CELLS):
+                ix, iz = np.nonzero(free[tx:tx + TILE_CELLS, tz:tz + TILE_CELLS])
+                if not len(ix):
+                    continue
+                xz = origin + (np.column_stack([ix + tx, iz + tz]) + 0.5) * cell_size
+                cell_ids = n_cells + np.arange(len(xz))
+                n_cells += len(xz)
+                cells.append(xz)
+                pairs.append(_tile_pairs(xz, cell_ids, lo, hi, group, samples, center_xz, view_distance))
+
+        cell_xz = np.concatenate(cells) if cells else np.zeros((0, 2))
+        pair_cell, pair_prop, pair_count = (np.concatenate(a) for a in zip(*pairs)) if pairs else \
+            (np.zeros(0, np.int32), np.zeros(0, np.int32), np.zeros(0, np.uint8))
+        arrays = {'cell_xz': cell_xz, 'pair_cell': pair_cell, 'pair_prop': pair_prop, 'pair_count': pair_count,
+                  'group': group.astype(np.int32), 'hider_groups': np.asarray(level.hider_groups, dtype=np.int32)}
+        params = {'level_hash': level.hash, 'cell_size': cell_size, 'view_distance': view_distance,
+                  'bounds': np.asarray(bounds, dtype=np.float64).tolist(), 'n_samples': n_samples}
+        return cls(arrays, params)
+
+    def save(self, path):
+        # 与关卡文件一样先写临时文件再 rename
+        arrays = {'cell_xz': self.cell_xz, 'pair_cell': self.pair_cell, 'pair_prop': self.pair_prop,
+                  'pair_count': self.pair_count, 'group': self.group, 'hider_groups': self.hider_groups,
+                  'format_version': np.array(FORMAT_VERSION), 'params': np.array(json.dumps(self.params))}
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            version = int(data['format_version'])
+            if version != FORMAT_VERSION:
+                raise ValueError(f'{path}: unsupported visibility format version {version}')
+            params = json.loads(str(data['params']))
+            arrays = {name: data[name] for name in data.files if name not in ('format_version', 'params')}
+        return cls(arrays, params)
+
+    def exposure(self, cells=None):
+        """每个道具的暴露度 (P,)：从随机一个空地格子 (或 cells 中的格子) 看过去，看得见的采样点比例的平均值"""
+        counts = self.pair_count.astype(np.float64) / self.n_samples
+        if cells is None:
+            n = self.n_cells
+            prop = self.pair_prop
+        else:
+            cells = np.asarray(cells)
+            n = len(cells)
+            mask = np.isin(self.pair_cell, cells)
+            prop, counts = self.pair_prop[mask], counts[mask]
+        return np.bincount(prop, weights=counts, minlength=self.n_props) / max(n, 1)
+
+    def group_exposure(self, cells=None):
+        """每个布局条目的暴露度：取它各个部件中最大的 (盆栽的叶子露出来就算露出来)"""
+        result = np.zeros(self.group.max() + 1 if self.n_props else 0)
+        np.maximum.at(result, self.group, self.exposure(cells))
+        return result
+
+    def cells_near(self, point, radius):
+        """以 (x, z) 为中心、radius 为半径的空地格子编号"""
+        d = self.cell_xz - np.asarray(point, dtype=np.float64)
+        return np.flatnonzero((d * d).sum(axis=1) <= radius * radius)
+
+    def best_hiding_spots(self, k, cells=None, groups=None):
+        """暴露度最低的 k 个躲藏者条目，返回 (条目编号 (k,), 暴露度 (k,))"""
+        groups = self.hider_groups if groups is None else np.asarray(groups)
+        scores = self.group_exposure(cells)[groups]
+        k = min(k, len(groups))
+        best = np.argpartition(scores, k - 1)[:k] if k else np.zeros(0, dtype=np.int64)
+        best = best[np.argsort(scores[best], kind='stable')]
+        return groups[best], scores[best]
+
+    def hider_weights(self, temperature=0.1, cells=None):
+        """hider_groups 的抽样权重 exp(-暴露度 / temperature)，越隐蔽越容易被选中"""
+        scores = self.group_exposure(cells)[self.hider_groups]
+        return np.exp(-(scores - scores.min()) / temperature)
+
+
+def sample_hider_groups(hider_groups, k, weights=None, rng=None):
+    """不放回地抽 k 个躲藏者条目；weights 不为 None 时按权重抽样 (与 NumpySim.reset 相同的 Efraimidis-Spirakis 方法)"""
+    rng = rng if rng is not None else np.random.default_rng()
+    keys = rng.random(len(hider_groups))
+    if weights is not None:
+        keys = -np.log1p(-keys) / weights
+    return np.asarray(hider_groups)[np.argsort(keys)[:k]]
+
+
+def _tile_pairs(xz, cell_ids, lo, hi, group, samples, center_xz, view_distance):
+    """一块格子的可见 (格子, 道具, 采样点数)，只和这块周围 view_distance 内的道具求交"""
+    tile_lo, tile_hi = xz.min(axis=0) - view_distance, xz.max(axis=0) + view_distance
+    near = np.flatnonzero(np.all((hi[:, [0, 2]] >= tile_lo) & (lo[:, [0, 2]] <= tile_hi), axis=1))
+    empty = (np.zeros(0, np.int32), np.zeros(0, np.int32), np.zeros(0, np.uint8))
+    if not len(near):
+        return empty
+    d = center_xz[near][None] - xz[:, None]
+    cell_idx, target = np.nonzero((d * d).sum(axis=2) <= view_distance * view_distance)
+    if not len(cell_idx):
+        return empty
+
+    n_samples = samples.shape[1]
+    eyes = np.column_stack([xz[:, 0], np.full(len(xz), EYE_Y), xz[:, 1]])[cell_idx]
+    targets = samples[near[target]] # (pairs, S, 3)
+    origins = np.repeat(eyes, n_samples, axis=0)
+    # 方向 = 采样点 - 眼睛，距离以方向长度为单位，所以射程为 1 (到采样点为止)
+    hit, _ = raycast_aabbs(origins, targets.reshape(-1, 3) - origins, lo[near], hi[near], 1.0)
+    hit_group = np.where(hit >= 0, group[near[np.maximum(hit, 0)]], -1)
+    visible = (hit_group == np.repeat(group[near[target]], n_samples)).reshape(-1, n_samples).sum(axis=1)
+    keep = visible > 0
+    return (cell_ids[cell_idx[keep]].astype(np.int32), near[target[keep]].astype(np.int32),
+            visible[keep].astype(np.uint8))
+
+
+def cache_path(level, cell_size=CELL_SIZE, view_distance=VIEW_DISTANCE, bounds=None, cache_dir=LEVEL_CACHE_DIR):
+    key = hashlib.sha1(repr((FORMAT_VERSION, cell_size, view_distance, EYE_Y,
+                             None if bounds is None else np.asarray(bounds, dtype=np.float64).tolist())).encode())
+    return os.path.join(cache_dir, f'{level.name}_{level.hash}_vis_{key.hexdigest()[:12]}.npz')
+
+
+def visibility_field(level=None, cell_size=CELL_SIZE, view_distance=VIEW_DISTANCE, bounds=None,
+                     cache_dir=LEVEL_CACHE_DIR):
+    """计算并缓存到 cache_dir (文件名包含关卡哈希和参数)，之后直接读取"""
+    level = as_level(level)
+    path = cache_path(level, cell_size, view_distance, bounds, cache_dir)
+    if os.path.exists(path):
+        return VisibilityField.load(path)
+    field = VisibilityField.compute(level, cell_size, view_distance, bounds)
+    os.makedirs(cache_dir, exist_ok=True)
+    field.save(path)
+    return field
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute the visibility field of a level and list the best hiding spots')
+    parser.add_argument('--props', type=int, default=None, help='generated office level size (default: the office level)')
+    parser.add_argument('--level', help='compiled .level file')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--cell-size', type=float, default=CELL_SIZE)
+    parser.add_argument('--view-distance', type=float, default=VIEW_DISTANCE)
+    parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args()
+
+    level = generate_office_level(args.props, args.seed) if args.props else as_level(args.level)
+    # 没有缓存时第一次计算并写缓存，第二次从缓存读取
+    cached = os.path.exists(cache_path(level, args.cell_size, args.view_distance))
+    for attempt in ('loaded from cache' if cached else 'computed', 'loaded from cache'):
+        start = time.perf_counter()
+        field = visibility_field(level, args.cell_size, args.view_distance)
+        print(f'--- {level}: {field.n_cells} free cells, {len(field.pair_cell)} visible pairs, '
+              f'{attempt} in {time.perf_counter() - start:.3f}s ---')
+
+    start = time.perf_counter()
+    groups, scores = field.best_hiding_spots(args.top)
+    print(f'--- Best {len(groups)} hiding spots ({(time.perf_counter() - start) * 1000:.2f} ms) ---')
+    for g, score in zip(groups.tolist(), scores.tolist()):
+        print(f'  {level.type_names[level.entry_kind[g]]:>10} at {tuple(level.entry_pos[g].tolist())}: exposure {score:.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,10 @@
+# conftest.py
+# test_hide_and_seek.py 和 ursina_test_wsad.py 在模块级创建 Ursina 窗口，没有显示器时不收集它们
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+
+collect_ignore = ['ursina_test_wsad.py']
+if sys.platform.startswith('linux') and not os.environ.get('DISPLAY'):
+    collect_ignore.append('test_hide_and_seek.py')
@@ -0,0 +1,82 @@
+# test_checkpoint.py
+# CheckpointManager 的保存/读取、保留最近 K 个、最好的检查点和从目录恢复
+#   python -m pytest test/test_checkpoint.py
+import os
+import random
+
+import numpy as np
+import torch
+
+from checkpoint import CheckpointManager, capture_rng_state, restore_rng_state
+
+
+def make_state(seed):
+    torch.manual_seed(seed)
+    return {'model_state_dict': {'w': torch.randn(4, 3), 'b': torch.randn(4)}, 'episode': seed,
+            'history': {'reward': [1.0, 2.0]}}
+
+
+def test_round_trip_and_keep_last(tmp_path):
+    manager = CheckpointManager(str(tmp_path), keep_last=2)
+    states = [make_state(step) for step in range(5)]
+    for step, state in enumerate(states):
+        manager.save(state, step)
+    manager.close()
+    assert [os.path.basename(p) for p in manager.checkpoints()] == ['ckpt_000000003.pth', 'ckpt_000000004.pth']
+    assert not [f for f in os.listdir(tmp_path) if f.endswith('.tmp')]
+    latest = manager.load_latest()
+    assert latest['step'] == 4 and latest['episode'] == 4
+    assert latest['history'] == {'reward': [1.0, 2.0]}
+    for name, value in states[4]['model_state_dict'].items():
+        torch.testing.assert_close(latest['model_state_dict'][name], value)
+
+
+def test_save_snapshots_the_state(tmp_path):
+    """save() 之后继续修改参数不影响写出的检查点"""
+    manager = CheckpointManager(str(tmp_path))
+    state = make_state(0)
+    expected = state['model_state_dict']['w'].clone()
+    manager.save(state, 1)
+    state['model_state_dict']['w'].add_(1.0)
+    manager.close()
+    torch.testing.assert_close(manager.load_latest()['model_state_dict']['w'], expected)
+
+
+def test_best_and_resume(tmp_path):
+    manager = CheckpointManager(str(tmp_path), keep_last=1)
+    for step, metric in enumerate([0.2, 0.5, 0.3]):
+        manager.save(make_state(step), step, metric)
+    manager.close()
+    assert manager.best_metric == 0.5
+    assert manager.load_best()['step'] == 1
+
+    resumed = CheckpointManager(str(tmp_path), keep_last=1)
+    assert resumed.best_metric == 0.5
+    assert resumed.load_latest()['step'] == 2
+    resumed.save(make_state(3), 3, 0.4) # 不比恢复前的最好结果好
+    resumed.save(make_state(4), 4, 0.6)
+    resumed.close()
+    assert resumed.load_best()['step'] == 4 and resumed.load_best()['best_metric'] == 0.6
+
+
+def test_prefixes_keep_separate_best(tmp_path):
+    reinforce = CheckpointManager(str(tmp_path), prefix='ckpt')
+    reinforce.save(make_state(0), 0, 0.9)
+    reinforce.close()
+    ppo = CheckpointManager(str(tmp_path), prefix='ppo')
+    assert ppo.best_metric is None and ppo.load_best() is None and ppo.load_latest() is None
+    ppo.save(make_state(1), 1, 0.1)
+    ppo.close()
+    assert reinforce.load_best()['metric'] == 0.9
+    assert ppo.load_best()['metric'] == 0.1
+    assert len(ppo.checkpoints()) == 1
+
+
+def test_rng_state_round_trip(tmp_path):
+    manager = CheckpointManager(str(tmp_path))
+    random.seed(1), np.random.seed(1), torch.manual_seed(1)
+    manager.save({'rng_state': capture_rng_state()}, 0)
+    manager.close()
+    expected = (random.random(), np.random.rand(), torch.rand(1).item())
+    restore_rng_state(manager.load_latest()['rng_state'])
+    assert (random.random(), np.random.rand(), torch.rand(1).item()) == expected
@@ -1,47 +1,21 @@
+import os
 import random
+import sys
 import time
 from ursina import *
 from ursina.prefabs.first_person_controller import FirstPersonController
 # 1. 导入光照
 from ursina.lights import DirectionalLight
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from level import default_level
+
 
 # --- 游戏设置 (与之前相同) ---
 STARTING_AMMO = 80
 GAME_TIME_SECONDS = 90
 NUM_HIDERS = 1
 
-# --- 道具与关卡定义 (已更新) ---
-PROP_TYPES = {
-    'desk': {'model': 'cube', 'scale': (4, 1, 2), 'color': color.brown},
-    'chair': {'model': 'cube', 'scale': (1, 2, 1), 'color': color.black},
-    # 4. 更新盆栽，让它由圆柱体组成
-    'plant_pot': {'model': 'cylinder', 'scale': (1.5, 0.8, 1.5), 'color': color.orange},
-    'plant_leaves': {'model': 'cylinder', 'scale': (1.2, 2.5, 1.2), 'color': color.green},
-    'monitor': {'model': 'cube', 'scale': (1.5, 1, 0.2), 'color': color.dark_gray},
-    # 3. 新增隔断墙
-    'partition': {'model': 'cube', 'scale': (0.2, 4, 8), 'color': color.rgba(200, 200, 200, 200)},
-}
-
-# 3. 全新设计的“办公室”布局
-LEVEL_LAYOUT = [
-    # 办公区1 (左侧)
-    ('desk', (-12, 0, 10)), ('monitor', (-12, 0.5, 10)), ('chair', (-12, 0, 8)),
-    ('desk', (-12, 0, 0)), ('monitor', (-12, 0.5, 0)), ('chair', (-12, 0, -2)),
-    ('desk', (-12, 0, -10)), ('monitor', (-12, 0.5, -10)), ('chair', (-12, 0, -12)),
-    ('partition', (-8, 0, 5)), # 隔断
-
-    # 办公区2 (右侧)
-    ('desk', (12, 0, 10)), ('monitor', (12, 0.5, 10)), ('chair', (12, 0, 8)),
-    ('desk', (12, 0, 0)), ('monitor', (12, 0.5, 0)), ('chair', (12, 0, -2)),
-    ('desk', (12, 0, -10)), ('monitor', (12, 0.5, -10)), ('chair', (12, 0, -12)),
-    ('partition', (8, 0, 5)), # 隔断
-    
-    # 中央装饰区
-    ('plant_pot', (0, 0, 0)),
-    ('plant_pot', (0, 0, 5)),
-]
-
 # --- 道具类 (与之前相同) ---
 class Prop(Entity):
     def __init__(self, **kwargs):
@@ -76,28 +50,16 @@ sky = Sky()
 light = DirectionalLight(y=10, z=5, shadows=True, rotation=(30, -45, 0))
 
 # --- 道具和躲藏者创建 ---
+# 道具来自编译好的关卡 (level.py)：盆栽的盆和叶子属于同一个条目 (group)，算一个躲藏者
+level = default_level()
 all_entities = [ground, wall_1, wall_2, wall_3, wall_4]
-hider_choices = random.sample(LEVEL_LAYOUT, NUM_HIDERS)
-
-for prop_type, pos in LEVEL_LAYOUT:
-    prop_info = PROP_TYPES[prop_type]
-    
-    # 4. 特殊处理复合道具“盆栽”
-    if prop_type == 'plant_pot':
-        pot = Prop(model=prop_info['model'], scale=prop_info['scale'], color=prop_info['color'], position=pos)
-        leaves_info = PROP_TYPES['plant_leaves']
-        leaves = Prop(model=leaves_info['model'], scale=leaves_info['scale'], color=leaves_info['color'], position=pos+(0, prop_info['scale'][1], 0))
-        # 决定盆栽是否是躲藏者 (锅和叶子算一体)
-        is_hider = (prop_type, pos) in hider_choices
-        pot.is_hider = is_hider
-        leaves.is_hider = is_hider
-        all_entities.extend([pot, leaves])
-    else:
-        # 普通道具
-        entity = Prop(model=prop_info['model'], scale=prop_info['scale'], color=prop_info['color'], position=pos)
-        if prop_type == 'monitor': entity.y += 0.5
-        entity.is_hider = (prop_type, pos) in hider_choices
-        all_entities.append(entity)
+hider_groups = set(random.sample(level.hider_groups.tolist(), NUM_HIDERS))
+
+for i in range(level.n_props):
+    entity = Prop(model=level.model(i), scale=tuple(level.scale[i].tolist()), color=color.rgba32(*level.color[i].tolist()),
+                  position=tuple(level.pos[i].tolist()))
+    entity.is_hider = int(level.group[i]) in hider_groups
+    all_entities.append(entity)
 
 # 2. 为所有实体启用阴影
 for e in all_entities:
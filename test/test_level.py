@@ -0,0 +1,35 @@
+# test_level.py
+# 编译好的关卡：保存/读取往返，缓存目录与工作目录无关，多个进程同时写同一个文件不会互相覆盖临时文件
+#   python -m pytest test/test_level.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import level as level_module
+from level import LEVEL_CACHE_DIR, LEVEL_LAYOUT, PROP_TYPES, cached_level, compile_level, load_level, save_level
+
+
+def test_save_load_round_trip(tmp_path):
+    level = compile_level(LEVEL_LAYOUT, PROP_TYPES, 'office')
+    loaded = load_level(save_level(level, str(tmp_path / 'office.level')))
+    assert loaded.hash == level.hash and loaded.n_props == level.n_props
+    for name, array in level.arrays.items():
+        np.testing.assert_array_equal(loaded.arrays[name], array)
+
+
+def test_concurrent_saves_leave_one_complete_file(tmp_path):
+    level = compile_level(LEVEL_LAYOUT, PROP_TYPES, 'office')
+    path = str(tmp_path / 'office.level')
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda _: save_level(level, path), range(32)))
+    assert os.listdir(tmp_path) == ['office.level'] # 没有残留的临时文件
+    assert load_level(path).hash == level.hash
+
+
+def test_cache_dir_does_not_depend_on_cwd(tmp_path, monkeypatch):
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(level_module.__file__)))
+    assert LEVEL_CACHE_DIR == os.path.join(repo, 'levels')
+    monkeypatch.chdir(tmp_path)
+    assert cached_level(LEVEL_LAYOUT, PROP_TYPES, 'office').path.startswith(LEVEL_CACHE_DIR)
+    assert not os.path.exists(tmp_path / 'levels')
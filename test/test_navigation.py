@@ -0,0 +1,104 @@
+# test_navigation.py
+# 办公室关卡的占用栅格上 JPS 与 A* 比较 (路径长度相同、展开后是合法的 8 邻接不切角路径) 以及路径缓存 (LRU 淘汰、关卡修改后的失效)
+#   python -m pytest test/test_navigation.py
+import math
+
+import numpy as np
+import pytest
+
+from level import LEVEL_LAYOUT, PROP_TYPES, compile_level, default_level
+from navigation import Navigator, OccupancyGrid
+
+
+@pytest.fixture(scope='module')
+def grid():
+    return OccupancyGrid(default_level())
+
+
+def random_free_cells(grid, n, rng):
+    i, j = np.nonzero(~grid.blocked)
+    pick = rng.choice(len(i), n)
+    return ((i[pick] + 1) * grid.stride + j[pick] + 1).tolist()
+
+
+def assert_valid_path(grid, path, start, goal):
+    assert path[0] == start and path[-1] == goal
+    neighbors = lambda c: {nb for nb, _ in grid._neighbors(c)}
+    for a, b in zip(path, path[1:]):
+        assert b in neighbors(a)
+
+
+def test_jps_matches_astar_on_office_grid(grid):
+    rng = np.random.default_rng(0)
+    starts, goals = random_free_cells(grid, 200, rng), random_free_cells(grid, 200, rng)
+    for start, goal in zip(starts, goals):
+        astar, jps = grid.astar(start, goal), grid.jps(start, goal)
+        assert (astar is None) == (jps is None)
+        if astar is None:
+            continue
+        assert math.isclose(grid.path_length(jps), grid.path_length(astar), rel_tol=1e-9)
+        expanded = grid.expand(jps)
+        assert_valid_path(grid, expanded, start, goal)
+        assert math.isclose(grid.path_length(expanded), grid.path_length(astar), rel_tol=1e-9)
+
+
+def test_blocked_endpoints_have_no_path(grid):
+    blocked = (np.argwhere(grid.blocked)[0] + 1) @ (grid.stride, 1)
+    free = random_free_cells(grid, 1, np.random.default_rng(1))[0]
+    assert grid.astar(int(blocked), free) is None and grid.jps(int(blocked), free) is None
+
+
+def test_navigator_cache_reuses_paths(grid):
+    navigator = Navigator(default_level())
+    start, goal = random_free_cells(navigator.grid, 2, np.random.default_rng(2))
+    path = navigator.find_path(start, goal)
+    assert_valid_path(navigator.grid, list(path), start, goal)
+    assert navigator.find_path(start, goal) is path and navigator.hits == 1
+    # 起点在缓存的路径上：直接取后半段
+    assert navigator.find_path(path[len(path) // 2], goal) == path[len(path) // 2:]
+    assert navigator.misses == 1
+
+
+def test_lru_eviction_keeps_other_paths_to_the_same_goal():
+    navigator = Navigator(default_level(), cache_size=2)
+    grid = navigator.grid
+    goal, start_a, start_b, start_c = random_free_cells(grid, 4, np.random.default_rng(3))
+    path_a = navigator.find_path(start_a, goal)
+    path_b = navigator.find_path(start_b, goal)
+    navigator.find_path(start_c, goal) # 挤掉最旧的 path_a
+    assert (start_a, goal) not in navigator._cache
+    middle = path_b[len(path_b) // 2]
+    misses = navigator.misses
+    assert navigator.find_path(middle, goal) == path_b[len(path_b) // 2:]
+    assert navigator.misses == misses
+    # path_a 独有的格子不再指向被删掉的路径
+    assert all(p is not path_a for p, _ in navigator._through[goal].values())
+
+
+def test_level_change_evicts_only_paths_through_changed_cells():
+    level = default_level()
+    navigator = Navigator(level)
+    grid = navigator.grid
+    rng = np.random.default_rng(4)
+    paths = {}
+    for start, goal in zip(random_free_cells(grid, 40, rng), random_free_cells(grid, 40, rng)):
+        paths[start, goal] = navigator.find_path(start, goal)
+    # 在第一条路径的中间放一把椅子 (格子范围不变)
+    crossed = next(key for key, path in paths.items() if path is not None and len(path) > 10)
+    x, z = grid.position(paths[crossed][len(paths[crossed]) // 2])
+    changed = compile_level(LEVEL_LAYOUT + [('chair', (x, 0, z))], PROP_TYPES, 'office_chair')
+    navigator.update_level(changed)
+    new_grid = navigator.grid
+    assert new_grid.shape == grid.shape and navigator.grid.level_hash == changed.hash
+
+    near = set()
+    for i, j in np.argwhere(new_grid.blocked & ~grid.blocked):
+        near.update((i + 1 + di) * grid.stride + j + 1 + dj for di in (-1, 0, 1) for dj in (-1, 0, 1))
+    kept = [key for key, path in paths.items() if path is not None and near.isdisjoint(path)]
+    assert crossed not in navigator._cache and kept
+    for key in kept: # 没经过新挡住的格子的路径原样保留
+        assert navigator._cache[key] is paths[key]
+    start, goal = crossed
+    new_path = navigator.find_path(start, goal)
+    assert new_path is not None and new_path != paths[crossed]
+    assert_valid_path(new_grid, list(new_path), start, goal)
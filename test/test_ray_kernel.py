@@ -0,0 +1,103 @@
+# test_ray_kernel.py
+# 批量射线求交和 BVH 与逐个盒子的暴力求交比较
+#   python -m pytest test/test_ray_kernel.py
+import numpy as np
+
+from level import default_level
+from ray_kernel import BVH, raycast_aabbs
+from sim_core import EYE_HEIGHT, FIRE_RANGE, SEEKER_START
+
+
+def brute_force(origin, direction, lo, hi, max_distance):
+    """逐个盒子做 slab 求交，返回最近的 (编号, 距离)，距离相同取编号小的"""
+    best, best_t = -1, np.inf
+    for i in range(len(lo)):
+        t_enter, t_exit = 0.0, np.inf
+        for axis in range(3):
+            o, d = origin[axis], direction[axis]
+            if d == 0:
+                if not lo[i, axis] <= o <= hi[i, axis]:
+                    t_enter, t_exit = np.inf, -np.inf
+                continue
+            t1, t2 = sorted(((lo[i, axis] - o) / d, (hi[i, axis] - o) / d))
+            t_enter, t_exit = max(t_enter, t1), min(t_exit, t2)
+        if t_enter <= t_exit and t_enter <= max_distance and t_enter < best_t:
+            best, best_t = i, t_enter
+    return best, best_t
+
+
+def random_scene(rng, n_boxes=200, n_rays=300):
+    lo = rng.uniform(-20, 20, (n_boxes, 3))
+    hi = lo + rng.uniform(0.2, 3, (n_boxes, 3))
+    origins = rng.uniform(-25, 25, (n_rays, 3))
+    directions = rng.normal(size=(n_rays, 3))
+    directions[: n_rays // 4, 1] = 0 # 水平射线 (方向分量为 0 的 slab)
+    directions[n_rays // 4: n_rays // 3, [0, 2]] = 0 # 竖直射线
+    return lo, hi, origins, directions
+
+
+def test_raycast_aabbs_matches_brute_force():
+    lo, hi, origins, directions = random_scene(np.random.default_rng(0))
+    for max_distance in (5.0, np.inf):
+        idx, dist = raycast_aabbs(origins, directions, lo, hi, max_distance)
+        for r in range(len(origins)):
+            expected, expected_t = brute_force(origins[r], directions[r], lo, hi, max_distance)
+            assert idx[r] == expected
+            np.testing.assert_allclose(dist[r], expected_t)
+        assert (idx >= 0).any() and (idx < 0).any()
+
+
+def test_raycast_aabbs_ignore_and_inside():
+    lo = np.array([[-1.0, -1, -1], [3, -1, -1]])
+    hi = np.array([[1.0, 1, 1], [5, 1, 1]])
+    origins = np.zeros((2, 3))
+    directions = np.array([[1.0, 0, 0], [1, 0, 0]])
+    idx, dist = raycast_aabbs(origins, directions, lo, hi, 10, ignore=np.array([-1, 0]))
+    assert idx.tolist() == [0, 1] # 起点在盒子内部：距离为 0
+    assert dist.tolist() == [0.0, 3.0]
+
+
+def test_bvh_matches_raycast_aabbs():
+    rng = np.random.default_rng(1)
+    lo, hi, origins, directions = random_scene(rng, n_boxes=500)
+    # 一排一样的盒子：同一距离上有多个交点时取编号小的
+    lo[:4] = [[30, 0, 0]] * 4
+    hi[:4] = [[31, 1, 1]] * 4
+    origins[:10] = [29, 0.5, 0.5]
+    directions[:10] = [1, 0, 0]
+    bvh = BVH(lo, hi, leaf_size=4)
+    idx, dist = raycast_aabbs(origins, directions, lo, hi, 30.0)
+    for r in range(len(origins)):
+        hit, t = bvh.raycast(origins[r], directions[r], 30.0)
+        assert hit == idx[r]
+        np.testing.assert_allclose(t, dist[r])
+    assert idx[0] == 0
+
+
+def test_bvh_empty():
+    bvh = BVH(np.zeros((0, 3)), np.zeros((0, 3)))
+    assert bvh.raycast((0, 0, 0), (1, 0, 0)) == (-1, np.inf)
+
+
+def test_bvh_shots_from_spawn_hit_props():
+    # hide_and_seek_3d 的拾取树只有道具 (墙和地面不在树里)：从出生点 (AI 的眼睛高度和玩家的相机高度)
+    # 朝各个方向开枪，结果与训练环境的射线核相同，编号都是道具编号，不会在 t=0 被出生点周围的东西挡住
+    level = default_level()
+    bvh = BVH(level.lo, level.hi)
+    hits = 0
+    for height in (SEEKER_START[1] + EYE_HEIGHT, 3.6):
+        origin = np.array([SEEKER_START[0], height, SEEKER_START[2]])
+        for angle in np.radians(np.arange(0, 360, 5)):
+            for pitch in (0.0, -0.3):
+                direction = np.array([np.sin(angle), pitch, np.cos(angle)])
+                for max_distance in (FIRE_RANGE, np.inf): # AI 搜捕者有射程，玩家的点击没有
+                    i, t = bvh.raycast(origin, direction, max_distance)
+                    idx, dist = raycast_aabbs(origin[None], direction[None], level.lo, level.hi, max_distance)
+                    assert i == idx[0] and -1 <= i < level.n_props
+                    if i >= 0:
+                        assert t > 1 and np.isclose(t, dist[0])
+                        hits += 1
+    assert hits > 0
+    # 第一枪朝正前方：打中正前方的道具
+    i, _ = bvh.raycast((0, SEEKER_START[1] + EYE_HEIGHT, SEEKER_START[2]), (0, 0, 1))
+    assert 0 <= i < level.n_props
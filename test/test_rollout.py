@@ -0,0 +1,78 @@
+# test_rollout.py
+# RolloutBuffer 的折扣回报和 GAE 与手算的结果比较
+#   python -m pytest test/test_rollout.py
+import numpy as np
+
+from rollout import RolloutBuffer
+
+GAMMA, LAM = 0.9, 0.8
+
+
+def filled_buffer():
+    """T=3 步 × 2 个环境：环境 0 没有结束，环境 1 在第 1 步之后结束"""
+    buffer = RolloutBuffer(capacity=4, num_envs=2, obs_dim=1)
+    rewards = [(1, 1), (0, 1), (2, 1)]
+    values = [(0.5, 0), (1.0, 0), (1.5, 0)]
+    dones = [(0, 0), (0, 1), (0, 0)]
+    for r, v, d in zip(rewards, values, dones):
+        buffer.add(np.zeros((2, 1)), (0, 0), r, d, v, (0, 0))
+    return buffer
+
+
+def test_gae_matches_hand_computed_example():
+    buffer = filled_buffer()
+    advantages, returns = buffer.compute_gae(GAMMA, LAM, last_value=np.array([2.0, 1.0]))
+    # 环境 0: delta = (1 + .9*1 - .5, 0 + .9*1.5 - 1, 2 + .9*2 - 1.5) = (1.4, 0.35, 2.3)，
+    #         A2 = 2.3, A1 = 0.35 + .72*2.3 = 2.006, A0 = 1.4 + .72*2.006 = 2.84432
+    # 环境 1: delta = (1, 1, 1 + .9*1) (第 1 步之后结束，不用下一步的价值)，A = (1 + .72*1, 1, 1.9)
+    np.testing.assert_allclose(advantages[:, 0], [2.84432, 2.006, 2.3], rtol=1e-6)
+    np.testing.assert_allclose(advantages[:, 1], [1.72, 1.0, 1.9], rtol=1e-6)
+    np.testing.assert_allclose(returns[:, 0], [3.34432, 3.006, 3.8], rtol=1e-6)
+    np.testing.assert_allclose(returns[:, 1], advantages[:, 1], rtol=1e-6)
+
+
+def test_discounted_returns_match_hand_computed_example():
+    buffer = filled_buffer()
+    returns = buffer.compute_returns(GAMMA, last_value=np.array([2.0, 1.0]))
+    np.testing.assert_allclose(returns[:, 0], [1 + .9 * 3.42, 3.42, 3.8], rtol=1e-6)
+    np.testing.assert_allclose(returns[:, 1], [1.9, 1.0, 1.9], rtol=1e-6)
+
+
+def test_gae_with_lambda_one_equals_discounted_returns():
+    rng = np.random.default_rng(0)
+    buffer = RolloutBuffer(capacity=50, num_envs=8, obs_dim=1)
+    for _ in range(50):
+        buffer.add(np.zeros((8, 1)), np.zeros(8), rng.normal(size=8), rng.random(8) < 0.1, rng.normal(size=8),
+                   np.zeros(8))
+    last_value = rng.normal(size=8)
+    _, gae_returns = buffer.compute_gae(GAMMA, 1.0, last_value)
+    gae_returns = gae_returns.copy()
+    np.testing.assert_allclose(gae_returns, buffer.compute_returns(GAMMA, last_value), rtol=1e-4, atol=1e-5)
+
+
+def test_flat_only_covers_filled_steps():
+    buffer = filled_buffer()
+    assert buffer.flat('obs').shape == (6, 1)
+    assert buffer.flat('rewards').tolist() == [1, 1, 0, 1, 2, 1]
+
+
+def test_truncated_episode_bootstraps_from_final_value():
+    """到 max_steps 截断的回合：最后一步的目标是 r + gamma * V(final_observation)，而不是 r"""
+    buffer = RolloutBuffer(capacity=2, num_envs=2, obs_dim=1)
+    buffer.add(np.zeros((2, 1)), (0, 0), (1, 1), (0, 0), (0.5, 0.5), (0, 0))
+    buffer.add(np.zeros((2, 1)), (0, 0), (1, 1), (1, 1), (0.5, 0.5), (0, 0), bootstrap=(0, 3.0)) # 环境 1 被截断
+    advantages, returns = buffer.compute_gae(GAMMA, LAM, last_value=np.array([7.0, 7.0]))
+    np.testing.assert_allclose(advantages[1], [1 - 0.5, 1 + 0.9 * 3 - 0.5], rtol=1e-6)
+    np.testing.assert_allclose(advantages[0, 1], (1 + 0.9 * 0.5 - 0.5) + GAMMA * LAM * 3.2, rtol=1e-6)
+    np.testing.assert_allclose(buffer.compute_returns(GAMMA)[:, 1], [1 + 0.9 * 3.7, 3.7], rtol=1e-6)
+
+
+def test_vec_env_marks_only_max_steps_endings_as_truncated():
+    from vec_env import VecHideAndSeekEnv
+    env = VecHideAndSeekEnv(3, max_steps=4, seed=0)
+    env.reset()
+    env.sim.ammo[1] = 1 # 第 4 步开火用完弹药：真正的失败
+    for step in range(4):
+        _, _, dones, info = env.step([2, 4 if step == 3 else 2, 2])
+    assert dones.all()
+    assert info['truncated'].tolist() == [True, False, True]
@@ -0,0 +1,62 @@
+# test_selfplay.py
+# 自我对弈的对手池：快照不能和正在训练的模型共用内存，学习中的搜捕者和对手在一次前向中选动作
+#   python -m pytest test/test_selfplay.py
+import os
+import sys
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from model import ActorCritic
+from level import as_level
+from numpy_policy import LAYERS
+from selfplay import HiderPolicy, SeekerPool, SelfPlayEnv, hider_features
+
+
+def test_seeker_pool_snapshot_is_not_aliased_to_model():
+    torch.manual_seed(0)
+    model = ActorCritic(9, 5)
+    pool = SeekerPool(pool_size=4)
+    pool.add(model.state_dict())
+    before = {name: (pool.weights[name].copy(), pool.biases[name].copy()) for name in LAYERS}
+    obs = np.random.default_rng(0).normal(size=(8, 9)).astype(np.float32)
+    probs_before = pool.probs(obs, np.zeros(8, dtype=np.int64))
+
+    with torch.no_grad(): # 模拟一次优化器更新
+        for p in model.parameters():
+            p.add_(1.0)
+    for name in LAYERS:
+        np.testing.assert_array_equal(pool.weights[name], before[name][0])
+        np.testing.assert_array_equal(pool.biases[name], before[name][1])
+
+    pool.add(model.state_dict())
+    np.testing.assert_allclose(pool.probs(obs, np.zeros(8, dtype=np.int64)), probs_before, rtol=1e-5, atol=1e-7)
+    assert not np.array_equal(pool.weights['fc1'][0], pool.weights['fc1'][1])
+
+
+def test_learner_and_opponents_share_one_forward():
+    torch.manual_seed(0)
+    snapshot, learner = ActorCritic(9, 5), ActorCritic(9, 5)
+    pool = SeekerPool(pool_size=4)
+    pool.add(snapshot.state_dict())
+    pool.set_learner(learner.state_dict())
+    assert len(pool) == 1 and pool.learner_member == 1
+
+    level = as_level(None)
+    env = SelfPlayEnv(6, 4, HiderPolicy(hider_features(level), 1), pool, seed=0, level=level)
+    obs = env.reset()
+    actions, values, log_probs = env.act(obs)
+    with torch.no_grad():
+        probs, expected_values = learner(torch.as_tensor(obs, dtype=torch.float32))
+    np.testing.assert_allclose(values, expected_values.squeeze(-1).numpy(), rtol=1e-4, atol=1e-5)
+    np.testing.assert_allclose(np.exp(log_probs), probs.numpy()[np.arange(6), actions], rtol=1e-4, atol=1e-6)
+
+    # 对手的动作已经在同一次前向中算好，step() 不再单独调用对手池
+    opponent = env._opponent_actions.copy()
+    pool.act = None
+    sent = []
+    step = env.env.step
+    env.env.step = lambda a: sent.append(a) or step(a)
+    env.step(actions)
+    np.testing.assert_array_equal(sent[0], np.concatenate([actions, opponent]))
@@ -0,0 +1,101 @@
+# test_sim_core.py
+# NumpySim 的奖励和结束规则 (命中、未命中、胜利、弹药、最大步数) 以及 frame_skip
+#   python -m pytest test/test_sim_core.py
+import numpy as np
+import pytest
+
+from level import compile_level
+from sim_core import (FIRE_RANGE, REWARD_FIRE, REWARD_HIT, REWARD_MISS, REWARD_STEP, REWARD_WIN, SEEKER_START,
+                      STARTING_AMMO, NumpySim)
+
+FORWARD, BACKWARD, LEFT, RIGHT, FIRE = range(5)
+# seeker 从 SEEKER_START 朝 +z 看：正前方 4.5 个单位一把椅子 (条目 0)，旁边一把 (条目 1)，射程外一把 (条目 2)
+LAYOUT = [('chair', (0, 1, -10.5)), ('chair', (5, 1, -10.5)), ('chair', (0, 1, SEEKER_START[2] + FIRE_RANGE + 5))]
+
+
+def make_sim(hiders, num_envs=1, **kwargs):
+    sim = NumpySim(compile_level(LAYOUT, name='test'), num_hiders=len(hiders), num_envs=num_envs, seed=0, **kwargs)
+    sim.reset()
+    sim.set_hiders(np.arange(num_envs), np.tile(hiders, (num_envs, 1)))
+    return sim
+
+
+def test_hit_then_repeat_hit_is_a_miss():
+    sim = make_sim([0, 1])
+    reward, done = sim.step([FIRE])
+    assert reward[0] == pytest.approx(REWARD_STEP + REWARD_FIRE + REWARD_HIT)
+    assert not done[0]
+    assert sim.hiders_found[0] == 1 and sim.ammo[0] == STARTING_AMMO - 1
+    assert sim.shot[0, 0] and sim.checked[0, 0]
+    reward, done = sim.step([FIRE]) # 已经被射中的躲藏者不再算命中
+    assert reward[0] == pytest.approx(REWARD_STEP + REWARD_FIRE + REWARD_MISS)
+    assert sim.hiders_found[0] == 1 and not done[0]
+
+
+def test_miss_on_a_prop_that_is_not_a_hider():
+    sim = make_sim([1])
+    reward, done = sim.step([FIRE])
+    assert reward[0] == pytest.approx(REWARD_STEP + REWARD_FIRE + REWARD_MISS)
+    assert sim.checked[0, 0] and not sim.shot[0, 0] and not done[0]
+
+
+def test_shot_out_of_range_hits_nothing():
+    sim = make_sim([2])
+    sim.seeker_rot[0] = 180 # 背对椅子
+    reward, _ = sim.step([FIRE])
+    assert reward[0] == pytest.approx(REWARD_STEP + REWARD_FIRE)
+    assert not sim.checked.any()
+
+
+def test_finding_every_hider_wins():
+    sim = make_sim([0])
+    reward, done = sim.step([FIRE])
+    assert reward[0] == pytest.approx(REWARD_STEP + REWARD_FIRE + REWARD_HIT + REWARD_WIN)
+    assert done[0]
+
+
+def test_running_out_of_ammo_ends_the_episode():
+    sim = make_sim([1])
+    sim.ammo[0] = 2
+    _, done = sim.step([FIRE])
+    assert not done[0]
+    reward, done = sim.step([FIRE])
+    assert done[0] and sim.ammo[0] == 0
+    assert reward[0] == pytest.approx(REWARD_STEP + REWARD_FIRE + REWARD_MISS) # 输了没有额外惩罚
+
+
+def test_max_steps_ends_the_episode():
+    sim = make_sim([0], max_steps=3)
+    for _ in range(2):
+        reward, done = sim.step([LEFT])
+        assert reward[0] == pytest.approx(REWARD_STEP) and not done[0]
+    reward, done = sim.step([LEFT])
+    assert done[0] and sim.step_count[0] == 3
+    assert reward[0] == pytest.approx(REWARD_STEP)
+
+
+def test_movement_and_turning():
+    sim = make_sim([0])
+    sim.step([FORWARD])
+    np.testing.assert_allclose(sim.seeker_pos[0], (0, 0.5, SEEKER_START[2] + 0.5))
+    sim.step([RIGHT])
+    assert sim.seeker_rot[0] == pytest.approx(7.2)
+
+
+def test_frame_skip_fires_only_on_the_first_tick():
+    sim = make_sim([1], frame_skip=4)
+    reward, done = sim.step([FIRE])
+    assert sim.ammo[0] == STARTING_AMMO - 1
+    assert sim.step_count[0] == 4
+    assert reward[0] == pytest.approx(4 * REWARD_STEP + REWARD_FIRE + REWARD_MISS)
+    assert not done[0]
+
+
+def test_frame_skip_stops_a_finished_episode():
+    sim = make_sim([0], num_envs=2, frame_skip=4)
+    reward, done = sim.step([FIRE, LEFT])
+    assert done.tolist() == [True, False]
+    assert sim.step_count.tolist() == [1, 4] # 赢了之后剩下的 tick 不再推进
+    assert reward[0] == pytest.approx(REWARD_STEP + REWARD_FIRE + REWARD_HIT + REWARD_WIN)
+    assert reward[1] == pytest.approx(4 * REWARD_STEP)
+    assert sim.seeker_rot[1] == pytest.approx(-4 * 7.2)
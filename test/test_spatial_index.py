@@ -0,0 +1,64 @@
+# test_spatial_index.py
+# NearestPropIndex.nearest 与 "按距离稳定排序后取前 k 个" 比较 (距离相同按道具编号)
+#   python -m pytest test/test_spatial_index.py
+import numpy as np
+
+from spatial_index import NearestPropIndex
+
+
+def brute_force(positions, checked, point, k):
+    dist = np.hypot(*(positions - point).T)
+    order = [i for i in np.lexsort((np.arange(len(positions)), dist)) if not checked[i]]
+    return order[:k]
+
+
+def check(index, points, k):
+    idx, valid = index.nearest(points, k)
+    for e, point in enumerate(points):
+        expected = brute_force(index.positions, index.checked[e], point, k)
+        assert idx[e][valid[e]].tolist() == expected
+        assert valid[e].sum() == len(expected)
+
+
+def test_nearest_matches_sort_on_random_props():
+    rng = np.random.default_rng(0)
+    positions = rng.uniform(-50, 50, (1000, 2))
+    index = NearestPropIndex(positions, num_envs=16)
+    points = rng.uniform(-60, 60, (16, 2))
+    for k in (1, 5, 32):
+        check(index, points, k)
+    for _ in range(20): # 逐步标记为已检查
+        index.mark_checked(rng.integers(0, 16, 40), rng.integers(0, 1000, 40))
+        check(index, points, 8)
+    index.reset(np.arange(8))
+    check(index, points, 8)
+
+
+def test_nearest_ties_use_prop_order():
+    # 整数网格上的道具：查询点在格点或格子中心时有很多距离相同的道具
+    xs, zs = np.meshgrid(np.arange(20.0), np.arange(20.0), indexing='ij')
+    positions = np.column_stack([xs.ravel(), zs.ravel()])
+    rng = np.random.default_rng(1)
+    positions = positions[rng.permutation(len(positions))] # 编号顺序和网格顺序无关
+    index = NearestPropIndex(positions, num_envs=4, cell_size=3.0)
+    points = np.array([[10.0, 10.0], [4.5, 4.5], [0.0, 0.0], [19.5, 0.5]])
+    for k in (4, 9, 13):
+        check(index, points, k)
+
+
+def test_nearest_with_few_unchecked_props():
+    rng = np.random.default_rng(2)
+    positions = rng.uniform(0, 30, (100, 2))
+    index = NearestPropIndex(positions, num_envs=2)
+    index.mark_checked(np.zeros(97, dtype=np.int64), np.arange(97))
+    idx, valid = index.nearest(np.array([[15.0, 15.0], [0.0, 0.0]]), 5)
+    assert valid[0].tolist() == [True] * 3 + [False] * 2
+    assert sorted(idx[0, :3].tolist()) == [97, 98, 99]
+    check(index, np.array([[15.0, 15.0], [0.0, 0.0]]), 5)
+
+
+def test_small_level_uses_brute_force():
+    positions = np.array([[0.0, 0], [1, 0], [-1, 0], [0, 1]])
+    index = NearestPropIndex(positions, num_envs=1)
+    idx, valid = index.nearest(np.zeros((1, 2)), 3)
+    assert idx[0].tolist() == [0, 1, 2] and valid.all()
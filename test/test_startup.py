@@ -0,0 +1,53 @@
+# test_startup.py
+# 启动时间预算 (见 DEV_DOC.md 的 Startup budget)：在新的解释器中导入，检查耗时和没有被提前加载的重模块
+#   python -m pytest test/test_startup.py    或    python test/test_startup.py
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src')
+HEAVY_MODULES = ('torch', 'ursina', 'tensorboard', 'panda3d')
+# 子进程环境 (vec_env) 和训练脚本本身只需要 numpy 和项目里的纯 Python 模块
+BUDGETS = {
+    'vec_env': 0.5,
+    'game_env': 0.5,
+    'train': 1.0,
+}
+REPEATS = 3 # 取最快的一次，减少机器负载带来的波动
+
+
+def startup(code):
+    """在新的解释器中执行 code，返回 (耗时秒, 已加载的重模块)"""
+    script = ('import sys, time\n'
+              f'sys.path.insert(0, {SRC!r})\n'
+              't = time.perf_counter()\n'
+              f'{code}\n'
+              'print(time.perf_counter() - t)\n'
+              f'print(",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n')
+    best, loaded = float('inf'), None
+    for _ in range(REPEATS):
+        result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+        seconds, loaded = result.stdout.splitlines()[-2:]
+        best = min(best, float(seconds))
+    return best, [m for m in loaded.split(',') if m]
+
+
+def test_import_budgets():
+    for module, budget in BUDGETS.items():
+        seconds, loaded = startup(f'import {module}')
+        assert not loaded, f'importing {module} loaded {loaded}'
+        assert seconds < budget, f'importing {module} took {seconds:.3f}s (budget {budget}s)'
+
+
+def test_env_construction_does_not_open_window():
+    # 渲染模式和 viewer 在第一次 reset() 时才导入 Ursina 并创建窗口
+    _, loaded = startup('from game_env import HideAndSeekEnv\n'
+                        'HideAndSeekEnv(headless=False)\n'
+                        'HideAndSeekEnv(headless=True, viewer=True)')
+    assert 'ursina' not in loaded, loaded
+
+
+if __name__ == '__main__':
+    test_import_budgets()
+    test_env_construction_does_not_open_window()
+    print('startup budgets ok')
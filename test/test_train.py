@@ -0,0 +1,21 @@
+# test_train.py
+# 恢复训练状态：旧版单文件检查点只给 REINFORCE 用
+#   python -m pytest test/test_train.py
+import torch
+
+import train
+from checkpoint import CheckpointManager, atomic_save
+from model import ActorCritic
+
+
+def test_legacy_checkpoint_only_resumes_reinforce(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    model = ActorCritic(9, 5)
+    optimizer = torch.optim.Adam(model.parameters())
+    atomic_save({'model_state_dict': model.state_dict(), 'optimizer_state_dict': optimizer.state_dict(),
+                 'episode': 123}, train.CHECKPOINT_PATH)
+    for prefix, expected in (('ppo', None), ('selfplay', None), ('ckpt', 123)):
+        manager = CheckpointManager(str(tmp_path / 'checkpoints'), prefix=prefix)
+        checkpoint = train.load_training_state(manager, model, optimizer, env=None)
+        manager.close()
+        assert (checkpoint and checkpoint['episode']) == expected
@@ -0,0 +1,80 @@
+# test_trajectory.py
+# 轨迹记录：读出来的每一步和回合表与环境实际返回的一致 (回合跨块、中途 reset、单个环境)
+#   python -m pytest test/test_trajectory.py
+import numpy as np
+
+from game_env import HideAndSeekEnv
+from trajectory import RecordingEnv, TrajectoryReader
+from vec_env import VecHideAndSeekEnv
+
+NUM_ENVS = 8
+
+
+def test_vec_env_recording_matches_env(tmp_path):
+    directory = str(tmp_path / 'vec')
+    env = RecordingEnv(VecHideAndSeekEnv(NUM_ENVS, seed=0, max_steps=40), directory, chunk_records=NUM_ENVS * 13)
+    rng = np.random.default_rng(0)
+    obs = env.reset()
+    expected = {name: [] for name in ('obs', 'action', 'reward', 'done', 'seeker_pos', 'hiders')}
+    finished = [] # (env, 长度, 回报, 是否成功, 躲藏者)
+    hiders = env.sim.hider_groups.copy()
+    for t in range(150):
+        actions = rng.integers(0, 5, NUM_ENVS)
+        expected['obs'].append(obs)
+        expected['seeker_pos'].append(env.sim.seeker_pos.copy())
+        obs, rewards, dones, info = env.step(actions)
+        expected['action'].append(actions)
+        expected['reward'].append(rewards)
+        expected['done'].append(dones)
+        for e in np.flatnonzero(dones):
+            finished.append((e, info['episode_length'][e], info['episode_return'][e], info['success'][e], hiders[e]))
+        hiders = env.sim.hider_groups.copy()
+        if t == 100: # 中途 reset：没结束的回合记为 complete=False
+            obs = env.reset()
+            hiders = env.sim.hider_groups.copy()
+    env.close()
+
+    reader = TrajectoryReader(directory)
+    assert len(reader) == 150 * NUM_ENVS and len(reader.chunks) > 2
+    np.testing.assert_allclose(reader.column('obs'), np.concatenate(expected['obs']), rtol=1e-6, atol=1e-6)
+    np.testing.assert_allclose(reader.column('seeker_pos'), np.concatenate(expected['seeker_pos']), atol=1e-5)
+    np.testing.assert_array_equal(reader.column('action'), np.concatenate(expected['action']))
+    np.testing.assert_allclose(reader.column('reward'), np.concatenate(expected['reward']), rtol=1e-6)
+    np.testing.assert_array_equal(reader.column('done'), np.concatenate(expected['done']))
+    np.testing.assert_array_equal(reader.column('step'), np.repeat(np.arange(150), NUM_ENVS))
+
+    episodes = reader.episodes
+    assert len(set(episodes['episode'].tolist())) == len(episodes)
+    complete = episodes[episodes['complete']]
+    order = np.lexsort((complete['env'], complete['first_step'] + complete['length']))
+    assert len(complete) == len(finished)
+    for row, (e, length, total, success, hider_groups) in zip(complete[order], finished):
+        assert (row['env'], row['length'], bool(row['success'])) == (e, length, success)
+        assert abs(row['return'] - total) < 1e-4 # 按 float32 的奖励累加
+        assert row['hider_groups'].tolist() == hider_groups.tolist()
+        steps = reader.episode(row['episode'])
+        assert len(steps['step']) == length and steps['done'][-1] and not steps['done'][:-1].any()
+    # reset 时没结束的回合 + 记录结束时没结束的回合
+    ends = complete['first_step'] + complete['length']
+    assert (~episodes['complete']).sum() == 2 * NUM_ENVS - np.isin(ends, (101, 150)).sum()
+
+
+def test_single_env_recording(tmp_path):
+    directory = str(tmp_path / 'single')
+    env = RecordingEnv(HideAndSeekEnv(headless=True, seed=1), directory, chunk_records=50)
+    rng = np.random.default_rng(1)
+    lengths = []
+    for _ in range(5):
+        env.reset()
+        for t in range(60):
+            _, _, done, _ = env.step(int(rng.integers(0, 5)))
+            if done:
+                break
+        lengths.append((t + 1, bool(done)))
+    env.close()
+
+    reader = TrajectoryReader(directory)
+    assert len(reader) == sum(n for n, _ in lengths)
+    rows = reader.episodes[np.argsort(reader.episodes['episode'])]
+    assert [(int(r['length']), bool(r['complete'])) for r in rows] == lengths
+    assert np.all(np.diff(rows['episode']) > 0)
@@ -0,0 +1,38 @@
+# test_vec_env.py
+# 多进程批量环境：子进程崩溃后重启并截断它的回合，无法重启时抛出异常而不是卡住
+#   python -m pytest test/test_vec_env.py
+import numpy as np
+import pytest
+
+from vec_env import SubprocVecHideAndSeekEnv
+
+
+def test_crashed_worker_is_restarted():
+    env = SubprocVecHideAndSeekEnv(4, 2, seed=0, step_timeout=30)
+    try:
+        env.reset()
+        before, _, _, _ = env.step(np.zeros(4, dtype=np.int64))
+        env.processes[1].kill()
+        env.processes[1].join()
+        obs, rewards, dones, info = env.step(np.zeros(4, dtype=np.int64))
+        # 截断的回合从崩溃前最后的观察自举，而不是重启后新回合的第一帧
+        np.testing.assert_array_equal(info['final_observation'][2:], before[2:])
+        assert not np.array_equal(obs[2:], before[2:])
+        np.testing.assert_array_equal(info['worker_restarted'], [False, False, True, True])
+        np.testing.assert_array_equal(dones, [False, False, True, True])
+        assert info['truncated'][2:].all() and env.restarts == 1
+        assert (rewards[2:] == 0).all()
+        env.step(np.zeros(4, dtype=np.int64)) # 重启后的子进程正常工作
+        assert env.restarts == 1
+    finally:
+        env.close()
+
+
+def test_worker_that_cannot_start_raises():
+    # 关卡文件不存在，子进程每次都在创建环境时退出
+    env = SubprocVecHideAndSeekEnv(2, 1, step_timeout=30, level='missing.level')
+    try:
+        with pytest.raises(RuntimeError, match='failed to restart'):
+            env.reset()
+    finally:
+        env.close()
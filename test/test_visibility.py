@@ -0,0 +1,62 @@
+# test_visibility.py
+# 可见性场：分块计算的结果与对所有道具逐条求交的结果一致，被隔断墙挡住的道具看不见，缓存读写不改变结果
+#   python -m pytest test/test_visibility.py
+import numpy as np
+
+from level import compile_level
+from ray_kernel import raycast_aabbs
+from visibility import EYE_Y, VisibilityField, sample_points, visibility_field
+
+# 两面隔断墙 (x = ±1.5，沿 z 方向 8 个单位长) 中间夹着一把椅子，另外几个道具分散在 40×40 的范围里
+LAYOUT = [('chair', (0, 1, 0)), ('partition', (-1.5, 2, 0)), ('partition', (1.5, 2, 0)),
+          ('desk', (12, 0.5, 10)), ('chair', (12, 1, 12)), ('plant_pot', (-15, 0, 14)),
+          ('desk', (-12, 0.5, -16)), ('chair', (18, 1, -18)), ('monitor', (12, 1, 10))]
+VIEW_DISTANCE = 10.0
+
+
+def brute_force_pairs(field, level):
+    """每个格子对 view_distance 内的每个道具的每个采样点，和所有道具求交"""
+    lo, hi = level.lo, level.hi
+    samples = sample_points(lo, hi)
+    center_xz = ((lo + hi) / 2)[:, [0, 2]]
+    pairs = {}
+    for c, (x, z) in enumerate(field.cell_xz):
+        eye = np.array([x, EYE_Y, z])
+        for p in np.flatnonzero(((center_xz - (x, z)) ** 2).sum(axis=1) <= VIEW_DISTANCE ** 2):
+            hit, _ = raycast_aabbs(np.tile(eye, (len(samples[p]), 1)), samples[p] - eye, lo, hi, 1.0)
+            visible = int((level.group[np.maximum(hit, 0)][hit >= 0] == level.group[p]).sum())
+            if visible:
+                pairs[(c, p)] = visible
+    return pairs
+
+
+def test_tiled_field_matches_brute_force():
+    level = compile_level(LAYOUT, name='test')
+    field = VisibilityField.compute(level, cell_size=1.0, view_distance=VIEW_DISTANCE)
+    computed = {(c, p): n for c, p, n in zip(field.pair_cell.tolist(), field.pair_prop.tolist(),
+                                             field.pair_count.tolist())}
+    assert computed == brute_force_pairs(field, level)
+
+
+def test_partitions_hide_the_chair_from_the_side():
+    level = compile_level(LAYOUT, name='test')
+    field = VisibilityField.compute(level, cell_size=1.0, view_distance=VIEW_DISTANCE)
+    x, z = field.cell_xz.T
+    side = np.flatnonzero((np.abs(x) > 2) & (np.abs(x) < 8) & (np.abs(z) < 2))
+    front = np.flatnonzero((np.abs(x) < 1) & (np.abs(z) > 5))
+    assert len(side) and len(front)
+    assert field.exposure(side)[0] == 0
+    assert field.exposure(front)[0] > 0
+    assert field.exposure(side)[1] > 0 # 隔断墙本身看得见
+
+
+def test_cache_round_trip(tmp_path):
+    level = compile_level(LAYOUT, name='test')
+    first = visibility_field(level, view_distance=VIEW_DISTANCE, cache_dir=str(tmp_path))
+    assert len(list(tmp_path.iterdir())) == 1
+    cached = visibility_field(level, view_distance=VIEW_DISTANCE, cache_dir=str(tmp_path))
+    np.testing.assert_array_equal(cached.exposure(), first.exposure())
+    groups, scores = cached.best_hiding_spots(3)
+    assert np.all(np.diff(scores) >= 0) and len(set(groups.tolist())) == 3
+    weights = cached.hider_weights()
+    assert weights.max() == 1.0 and np.all(weights > 0)